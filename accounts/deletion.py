@@ -0,0 +1,97 @@
+"""
+Family and account deletion.
+
+Deleting is split in two: scheduling hides the family (or user) at once by
+deactivating memberships, and a background job then removes the rows with
+``family_budget.deletion.delete_queryset``. Run the jobs with
+``run_worker``; ``delete_family`` and ``delete_user`` can also be called
+directly. Families left hidden because their job failed or was lost are
+queued again by ``requeue_family_deletions`` (the ``requeue_deletions``
+command).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import IntegerField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from family_budget.deletion import BATCH_SIZE, delete_queryset
+from jobs.models import Job
+from jobs.queue import enqueue
+from .models import Family, FamilyMember, User
+
+# Minutes a hidden family may wait for its deletion before it is queued again
+REQUEUE_AFTER_MINUTES = getattr(settings, 'ACCOUNT_DELETION_REQUEUE_AFTER_MINUTES', 60)
+
+
+def _hide_families(family_ids, now):
+    Family.objects.filter(id__in=family_ids).update(deleted_at=now, updated_at=now)
+    FamilyMember.objects.filter(family_id__in=family_ids, is_active=True).update(is_active=False, updated_at=now)
+
+
+def schedule_family_deletion(family, requested_by=None):
+    """Hide ``family`` from all of its members and queue its deletion"""
+    with transaction.atomic():
+        _hide_families([family.id], timezone.now())
+        return enqueue('accounts.delete_family', {'family_id': family.id}, created_by=requested_by)
+
+
+def schedule_user_deletion(user):
+    """
+    Deactivate ``user``, revoke their token, hide the families they created
+    (which are deleted with them) and queue the deletion
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False, updated_at=now)
+        Token.objects.filter(user=user).delete()
+        _hide_families(list(Family.objects.filter(created_by=user).values_list('id', flat=True)), now)
+        FamilyMember.objects.filter(user=user, is_active=True).update(is_active=False, updated_at=now)
+        return enqueue('accounts.delete_user', {'user_id': user.pk})
+
+
+def delete_family(family_id, batch_size=BATCH_SIZE):
+    """Delete a family and everything in it; returns {model label: rows}"""
+    return dict(delete_queryset(Family.objects.filter(pk=family_id), batch_size, family_ids={family_id}))
+
+
+def delete_user(user_id, batch_size=BATCH_SIZE):
+    """
+    Delete a user the way the ORM cascade would: their families, and the
+    expenses, categories and budgets they own in other families.
+    """
+    family_ids = set(Family.objects.filter(created_by_id=user_id).values_list('id', flat=True))
+    counts = delete_queryset(Family.objects.filter(id__in=family_ids), batch_size, family_ids)
+    counts.update(delete_queryset(User.objects.filter(pk=user_id), batch_size, family_ids))
+    return dict(counts)
+
+
+def requeue_family_deletions(minutes=None):
+    """
+    Queue the deletion of families hidden for more than ``minutes`` that no
+    queued or running job is deleting any more; returns the jobs queued.
+    """
+    minutes = REQUEUE_AFTER_MINUTES if minutes is None else minutes
+    live = Job.objects.filter(status__in=(Job.STATUS_QUEUED, Job.STATUS_RUNNING))
+
+    def payload_ids(name, key):
+        return live.filter(name=name).annotate(
+            object_id=Cast(KT(f'payload__{key}'), IntegerField())
+        ).values('object_id')
+
+    stranded = Family.objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(minutes=minutes)
+    ).exclude(
+        id__in=payload_ids('accounts.delete_family', 'family_id')
+    ).exclude(
+        # Deleted with their creator
+        created_by_id__in=payload_ids('accounts.delete_user', 'user_id')
+    )
+    return [
+        enqueue('accounts.delete_family', {'family_id': family_id})
+        for family_id in stranded.order_by('id').values_list('id', flat=True)
+    ]
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.deletion import REQUEUE_AFTER_MINUTES, requeue_family_deletions
+
+
+class Command(BaseCommand):
+    help = 'Queue again the deletion of hidden families whose deletion job failed or was lost'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutes', type=int, default=REQUEUE_AFTER_MINUTES,
+            help='Only families hidden for longer than N minutes'
+        )
+
+    def handle(self, *args, **options):
+        jobs = requeue_family_deletions(options['minutes'])
+        self.stdout.write(self.style.SUCCESS(f'Queued {len(jobs)} family deletion(s)'))
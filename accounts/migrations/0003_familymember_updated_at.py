@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_currency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='familymember',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='familymember',
+            index=models.Index(fields=['family', 'updated_at'], name='member_family_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_familymember_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='family',
+            name='archive_after_months',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
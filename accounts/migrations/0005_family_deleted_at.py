@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_family_archive_after_months'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='family',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -82,6 +82,11 @@ class Family(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_families')
+    # Expenses older than this many months move to archive segments; empty
+    # falls back to the EXPENSE_ARCHIVE_AFTER_MONTHS setting
+    archive_after_months = models.PositiveSmallIntegerField(blank=True, null=True)
+    # Set when deletion is scheduled; a background job removes the rows
+    deleted_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -101,10 +106,14 @@ class FamilyMember(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='family_memberships')
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='member')
     joined_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
     class Meta:
         unique_together = ['family', 'user']
+        indexes = [
+            models.Index(fields=['family', 'updated_at'], name='member_family_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} - {self.family.name} ({self.role})"
\ No newline at end of file
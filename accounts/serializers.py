@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from .models import User, Family, FamilyMember
+from family_budget.fieldsets import SparseFieldsetSerializerMixin
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -43,7 +44,7 @@ class FamilySerializer(serializers.ModelSerializer):
         return obj.members.filter(is_active=True).count()
 
 
-class FamilyMemberSerializer(serializers.ModelSerializer):
+class FamilyMemberSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     family = FamilySerializer(read_only=True)
 
@@ -0,0 +1,18 @@
+from jobs.queue import task
+
+from . import deletion
+
+
+@task('accounts.delete_family')
+def delete_family_task(job, family_id):
+    return deletion.delete_family(family_id)
+
+
+@task('accounts.delete_user')
+def delete_user_task(job, user_id):
+    return deletion.delete_user(user_id)
+
+
+@task('accounts.requeue_deletions')
+def requeue_deletions_task(job, minutes=None):
+    return {'queued': len(deletion.requeue_family_deletions(minutes))}
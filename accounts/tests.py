@@ -1,3 +1,130 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from budgets.models import Budget, Category
+from expenses.models import Expense
+from jobs.models import Job
+from jobs.queue import claim_job, run_job
+from sync.models import Tombstone
+from . import deletion
+from .models import Family, FamilyMember, User
+
+
+class BulkInviteTests(TestCase):
+    """The bulk invitation endpoint reports every email and runs a fixed number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.admin)
+        FamilyMember.objects.create(family=cls.family, user=cls.admin, role='admin')
+        cls.users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(60)
+        ])
+
+    def invite(self, emails):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return client.post(f'/api/auth/families/{self.family.pk}/invite/bulk/', {'emails': emails}, format='json')
+
+    def test_outcomes(self):
+        FamilyMember.objects.create(family=self.family, user=self.users[1], is_active=False)
+        FamilyMember.objects.create(family=self.family, user=self.users[2])
+        response = self.invite([
+            'user0@example.com', 'user1@example.com', 'user2@example.com',
+            'nobody@example.com', 'not-an-email', 'user0@example.com',
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['added', 'reactivated', 'already_member', 'not_found', 'invalid', 'duplicate']
+        )
+        self.assertEqual(
+            FamilyMember.objects.filter(family=self.family, is_active=True).count(), 4
+        )
+
+    def test_query_count_does_not_grow_with_emails(self):
+        counts = []
+        for emails in (self.users[:5], self.users[5:60]):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.invite([user.email for user in emails])
+            self.assertEqual(response.data['summary']['added'], len(emails))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class DeletionTests(TestCase):
+    """Families and accounts are hidden at once, deleted in batches and never left behind"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+        cls.member = User.objects.create_user(username='member', email='member@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.owner)
+        FamilyMember.objects.create(family=cls.family, user=cls.owner, role='admin')
+        FamilyMember.objects.create(family=cls.family, user=cls.member)
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.owner)
+        Budget.objects.create(
+            name='Food', family=cls.family, category=cls.category, amount=Decimal('100'),
+            start_date=date(2024, 1, 1), end_date=date(2024, 1, 31), created_by=cls.owner
+        )
+        cls.expense = Expense.objects.create(
+            title='Shop', amount=Decimal('10'), category=cls.category, family=cls.family,
+            paid_by=cls.member, date=date(2024, 1, 5)
+        )
+
+    def test_family_deletion(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.delete(f'/api/auth/families/{self.family.pk}/')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(FamilyMember.objects.filter(family=self.family, is_active=True).exists())
+        self.assertEqual(client.get(f'/api/budgets/categories/?family={self.family.pk}').data['count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(run_job(claim_job('worker-1')))
+        self.assertFalse(Family.objects.filter(pk=self.family.pk).exists())
+        self.assertFalse(Expense.objects.filter(pk=self.expense.pk).exists())
+        self.assertFalse(Category.objects.filter(pk=self.category.pk).exists())
+        # Only memberships get tombstones: the family's rows go with it
+        self.assertEqual(
+            set(Tombstone.objects.values_list('collection', 'user_id')),
+            {('memberships', self.owner.pk), ('memberships', self.member.pk)}
+        )
+
+    def test_user_deletion_removes_their_rows_in_other_families(self):
+        other = Family.objects.create(name='Other', created_by=self.owner)
+        FamilyMember.objects.create(family=other, user=self.owner, role='admin')
+        own = Family.objects.create(name='Own', created_by=self.member)
+        with self.captureOnCommitCallbacks(execute=True):
+            deletion.schedule_user_deletion(self.member)
+            self.assertTrue(run_job(claim_job('worker-1')))
+        self.assertFalse(User.objects.filter(pk=self.member.pk).exists())
+        self.assertFalse(Family.objects.filter(pk=own.pk).exists())
+        self.assertTrue(Family.objects.filter(pk=self.family.pk).exists())
+        self.assertFalse(Expense.objects.filter(pk=self.expense.pk).exists())
+        self.assertTrue(Tombstone.objects.filter(collection='expenses', object_id=self.expense.pk).exists())
+
+    def test_stranded_families_are_queued_again(self):
+        job = deletion.schedule_family_deletion(self.family)
+        self.assertEqual(deletion.requeue_family_deletions(minutes=0), [])
+
+        # The job gave up, and the family has been hidden for a while
+        Job.objects.filter(pk=job.pk).update(status=Job.STATUS_FAILED)
+        Family.objects.filter(pk=self.family.pk).update(deleted_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(deletion.requeue_family_deletions(minutes=120 + 1), [])
+        requeued = deletion.requeue_family_deletions()
+        self.assertEqual([job.payload for job in requeued], [{'family_id': self.family.pk}])
+        self.assertEqual(deletion.requeue_family_deletions(), [])
 
-# Create your tests here.
+        # Families deleted along with their creator wait for that job
+        Job.objects.filter(pk=requeued[0].pk).update(status=Job.STATUS_FAILED)
+        deletion.schedule_user_deletion(self.owner)
+        Family.objects.filter(pk=self.family.pk).update(deleted_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(deletion.requeue_family_deletions(), [])
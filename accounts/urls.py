@@ -16,5 +16,6 @@ urlpatterns = [
     path('families/<int:family_id>/members/', views.FamilyMemberListCreateView.as_view(), name='family-member-list-create'),
     path('families/<int:family_id>/members/<int:pk>/', views.FamilyMemberDetailView.as_view(), name='family-member-detail'),
     path('families/<int:family_id>/invite/', views.invite_family_member, name='invite-family-member'),
+    path('families/<int:family_id>/invite/bulk/', views.bulk_invite_family_members, name='bulk-invite-family-members'),
 ]
 
@@ -2,14 +2,24 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth import login, logout
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
+from family_budget.fieldsets import SparseFieldsetMixin
+from .deletion import schedule_family_deletion, schedule_user_deletion
 from .models import User, Family, FamilyMember
 from .serializers import (
     UserRegistrationSerializer, UserSerializer, FamilySerializer,
     FamilyMemberSerializer, FamilyCreateSerializer, LoginSerializer
 )
 
+# Upper bound on the emails accepted by one bulk invitation
+MAX_BULK_INVITES = getattr(settings, 'FAMILY_MAX_BULK_INVITES', 500)
+
 
 class UserRegistrationView(generics.CreateAPIView):
     """User registration endpoint"""
@@ -56,14 +66,23 @@ def logout_view(request):
     return Response({'message': 'Successfully logged out'})
 
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
-    """User profile view and update"""
+class UserProfileView(generics.RetrieveUpdateDestroyAPIView):
+    """User profile view, update, and account deletion"""
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         return self.request.user
 
+    def destroy(self, request, *args, **kwargs):
+        # The account is deactivated now and deleted by a background job
+        job = schedule_user_deletion(request.user)
+        logout(request)
+        return Response(
+            {'detail': 'Account deletion scheduled.', 'job': job.id},
+            status=status.HTTP_202_ACCEPTED
+        )
+
 
 class FamilyListCreateView(generics.ListCreateAPIView):
     """List and create families"""
@@ -113,32 +132,37 @@ class FamilyDetailView(generics.RetrieveUpdateDestroyAPIView):
         return super().get_permissions()
 
     def destroy(self, request, *args, **kwargs):
-        try:
-            return super().destroy(request, *args, **kwargs)
-        except Exception as e:
-            # If the family doesn't exist, return 404
-            if 'DoesNotExist' in str(type(e)) or 'not found' in str(e).lower():
-                from rest_framework.response import Response
-                from rest_framework import status
-                return Response(
-                    {'detail': 'Family not found.'}, 
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            raise e
+        # The family disappears for its members now; a background job
+        # deletes its rows in batches
+        family = self.get_object()
+        job = schedule_family_deletion(family, request.user)
+        return Response(
+            {'detail': 'Family deletion scheduled.', 'job': job.id},
+            status=status.HTTP_202_ACCEPTED
+        )
 
 
-class FamilyMemberListCreateView(generics.ListCreateAPIView):
+class FamilyMemberListCreateView(SparseFieldsetMixin, generics.ListCreateAPIView):
     """List and add family members"""
     serializer_class = FamilyMemberSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         family_id = self.kwargs['family_id']
-        return FamilyMember.objects.filter(
+        queryset = FamilyMember.objects.filter(
             family_id=family_id,
             family__members__user=self.request.user,
             family__members__is_active=True
         ).distinct()
+        if self.request.method == 'GET':
+            related = [
+                name for name, wanted in (
+                    ('user', self.wants('user')),
+                    ('family__created_by', self.wants('family')),
+                ) if wanted
+            ]
+            queryset = queryset.select_related(*related)
+        return queryset
 
     def perform_create(self, serializer):
         family_id = self.kwargs['family_id']
@@ -245,4 +269,103 @@ def invite_family_member(request, family_id):
         return Response(
             {'error': 'Family not found'},
             status=status.HTTP_404_NOT_FOUND
-        )
\ No newline at end of file
+        )
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_invite_family_members(request, family_id):
+    """
+    Invite many users to a family by email in one request.
+
+    Users and existing memberships are each resolved with a single query and
+    new or reactivated members are written in bulk, so the number of queries
+    does not depend on the number of emails. Every email gets an outcome:
+    added, reactivated, already_member, not_found, invalid or duplicate.
+    """
+    admin_member = FamilyMember.objects.filter(
+        family_id=family_id,
+        user=request.user,
+        role='admin',
+        is_active=True
+    ).first()
+    if not admin_member:
+        if not Family.objects.filter(id=family_id).exists():
+            return Response({'error': 'Family not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(
+            {'error': 'Only family admins can invite members'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    emails = request.data.get('emails')
+    if not isinstance(emails, list) or not emails:
+        return Response(
+            {'error': 'emails must be a non-empty list'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(emails) > MAX_BULK_INVITES:
+        return Response(
+            {'error': f'At most {MAX_BULK_INVITES} emails can be invited at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    outcomes = []
+    valid = []
+    seen = set()
+    for email in emails:
+        email = email.strip() if isinstance(email, str) else email
+        outcome = {'email': email, 'status': None}
+        outcomes.append(outcome)
+        try:
+            validate_email(email)
+        except (ValidationError, TypeError):
+            outcome['status'] = 'invalid'
+            continue
+        if email in seen:
+            outcome['status'] = 'duplicate'
+            continue
+        seen.add(email)
+        valid.append(outcome)
+
+    users = {user.email: user for user in User.objects.filter(email__in=seen)}
+    existing = {
+        member.user_id: member
+        for member in FamilyMember.objects.filter(family_id=family_id, user__in=users.values())
+    }
+
+    now = timezone.now()
+    reactivated, created = [], []
+    for outcome in valid:
+        user = users.get(outcome['email'])
+        if user is None:
+            outcome['status'] = 'not_found'
+            continue
+        outcome['user'] = UserSerializer(user).data
+        member = existing.get(user.pk)
+        if member is None:
+            member = FamilyMember(family_id=family_id, user=user, role='member')
+            created.append(member)
+            outcome['status'] = 'added'
+        elif member.is_active:
+            outcome['status'] = 'already_member'
+        else:
+            member.is_active = True
+            member.updated_at = now
+            reactivated.append(member)
+            outcome['status'] = 'reactivated'
+        outcome['member'] = member
+
+    with transaction.atomic():
+        FamilyMember.objects.bulk_update(reactivated, ['is_active', 'updated_at'])
+        FamilyMember.objects.bulk_create(created)
+
+    summary = dict.fromkeys(['added', 'reactivated', 'already_member', 'not_found', 'invalid', 'duplicate'], 0)
+    for outcome in outcomes:
+        summary[outcome['status']] += 1
+        member = outcome.pop('member', None)
+        if member is not None:
+            outcome['member_id'] = member.pk
+    return Response(
+        {'results': outcomes, 'summary': summary},
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    )
@@ -0,0 +1,267 @@
+"""
+Synthetic data at production scale.
+
+Everything is created with bulk inserts in batches, so generating millions of
+expenses needs constant memory. Generated users share an email prefix, which
+is how ``clear`` and the load test find them again. The same seed always
+produces the same data.
+"""
+import itertools
+import math
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from rest_framework.authtoken.models import Token
+
+from accounts.models import Family, FamilyMember, User
+from family_budget.deletion import delete_queryset
+from budgets import tree
+from budgets.models import Budget, Category
+from expenses import recurrence
+from expenses.models import Expense, ExpenseShare, RecurringExpense
+from budgets.rollover import add_months
+
+# name, color, icon, expenses per month, median amount, spread, titles, tags
+CATEGORIES = [
+    ('Groceries', '#4CAF50', 'shopping-cart', 9, 55, 0.6,
+     ['Weekly shop', 'Supermarket', 'Farmers market', 'Bakery', 'Corner shop'], ['food', 'weekly', 'household']),
+    ('Rent', '#795548', 'home', 1, 1400, 0.02, ['Rent'], ['home', 'fixed']),
+    ('Utilities', '#FF9800', 'bolt', 2, 75, 0.3,
+     ['Electricity bill', 'Water bill', 'Gas bill', 'Internet'], ['bills', 'home']),
+    ('Dining out', '#E91E63', 'utensils', 5, 32, 0.5,
+     ['Pizza night', 'Lunch', 'Coffee', 'Takeaway', 'Birthday dinner'], ['food', 'fun']),
+    ('Transport', '#2196F3', 'bus', 8, 12, 0.8,
+     ['Train ticket', 'Fuel', 'Bus pass', 'Taxi', 'Parking'], ['commute', 'car']),
+    ('Entertainment', '#9C27B0', 'film', 3, 25, 0.6,
+     ['Cinema', 'Concert tickets', 'Board game', 'Museum'], ['fun', 'weekend']),
+    ('Healthcare', '#F44336', 'heartbeat', 1, 60, 0.7,
+     ['Pharmacy', 'Dentist', 'Doctor visit', 'Glasses'], ['health']),
+    ('Shopping', '#00BCD4', 'shopping-bag', 3, 55, 0.8,
+     ['Clothes', 'Shoes', 'Electronics', 'Home decor'], ['personal', 'gifts']),
+    ('Education', '#3F51B5', 'book', 0.5, 120, 0.6,
+     ['School supplies', 'Course fee', 'Books'], ['kids', 'school']),
+    ('Travel', '#009688', 'plane', 0.3, 450, 0.7,
+     ['Flights', 'Hotel', 'Holiday rental', 'Car hire'], ['holiday']),
+    ('Insurance', '#607D8B', 'shield', 1, 110, 0.05, ['Home insurance', 'Car insurance'], ['fixed', 'bills']),
+    ('Subscriptions', '#FFC107', 'repeat', 2, 11, 0.4,
+     ['Streaming service', 'Music subscription', 'Cloud storage', 'Newspaper'], ['fixed', 'online']),
+]
+
+# Categories that get a monthly budget, with headroom over typical spend
+BUDGETED = {'Groceries': 1.1, 'Dining out': 0.9, 'Transport': 1.2, 'Entertainment': 1.0, 'Shopping': 1.0, 'Utilities': 1.2}
+
+# (category, title, frequency) of the standing orders every family gets first
+RECURRING = [
+    ('Rent', 'Rent', 'monthly'),
+    ('Utilities', 'Internet', 'monthly'),
+    ('Insurance', 'Home insurance', 'monthly'),
+    ('Subscriptions', 'Streaming service', 'monthly'),
+    ('Subscriptions', 'Cloud storage', 'yearly'),
+    ('Transport', 'Bus pass', 'monthly'),
+    ('Groceries', 'Vegetable box', 'weekly'),
+]
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn', 'Robin', 'Kai']
+LAST_NAMES = ['Smith', 'Garcia', 'Nguyen', 'Müller', 'Rossi', 'Kowalski', 'Okafor', 'Tanaka', 'Silva', 'Larsen']
+PAYMENT_METHODS = [('debit_card', 40), ('credit_card', 25), ('cash', 15), ('bank_transfer', 12), ('digital_wallet', 8)]
+
+DEFAULT_PREFIX = 'loadtest'
+DEFAULT_PASSWORD = 'loadtest-password'
+
+
+def generated_users(prefix=DEFAULT_PREFIX):
+    return User.objects.filter(email__startswith=f'{prefix}+', email__endswith='@example.com')
+
+
+def clear(prefix=DEFAULT_PREFIX):
+    """Delete users created with ``prefix`` and the families they created"""
+    users = generated_users(prefix)
+    family_ids = set(Family.objects.filter(created_by__in=users).values_list('id', flat=True))
+    counts = delete_queryset(Family.objects.filter(id__in=family_ids), family_ids=family_ids)
+    counts.update(delete_queryset(users, family_ids=family_ids))
+    return sum(counts.values())
+
+
+def _amount(rng, median, spread):
+    return Decimal(str(round(median * math.exp(rng.gauss(0, spread)), 2))).max(Decimal('0.50'))
+
+
+def _random_date(rng, start, days):
+    # Weekends see more spending
+    while True:
+        day = start + timedelta(days=rng.randrange(days))
+        if day.weekday() >= 5 or rng.random() < 0.75:
+            return day
+
+
+class Generator:
+    def __init__(self, expenses, families=None, members=3, years=3, seed=42, batch_size=5000,
+                 share_ratio=0.25, recurring=5, prefix=DEFAULT_PREFIX, password=DEFAULT_PASSWORD,
+                 end_date=None, stdout=None):
+        self.expenses = expenses
+        self.families = families or max(1, expenses // 2000)
+        self.members = max(1, members)
+        self.years = years
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.share_ratio = share_ratio
+        self.recurring = min(recurring, len(RECURRING))
+        self.prefix = prefix
+        self.password = password
+        self.end_date = end_date or date.today()
+        self.start_date = add_months(self.end_date.replace(day=1), -12 * years)
+        self.days = (self.end_date - self.start_date).days + 1
+        self.stdout = stdout
+        self.counts = {}
+        self.category_weights = list(itertools.accumulate(category[3] for category in CATEGORIES))
+        self.methods, method_weights = zip(*PAYMENT_METHODS)
+        self.method_weights = list(itertools.accumulate(method_weights))
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def count(self, name, created):
+        self.counts[name] = self.counts.get(name, 0) + len(created)
+
+    def run(self):
+        users = self.create_users()
+        per_family, remainder = divmod(self.expenses, self.families)
+        for index in range(self.families):
+            members = users[index * self.members:(index + 1) * self.members]
+            count = per_family + (1 if index < remainder else 0)
+            with transaction.atomic():
+                family, categories = self.create_family(index, members)
+                self.create_budgets(family, categories, members[0])
+                self.create_recurring(family, categories, members)
+            self.create_expenses(family, categories, members, count)
+            if (index + 1) % 10 == 0 or index + 1 == self.families:
+                self.log(f'{index + 1}/{self.families} families, {self.counts.get("expenses", 0)} expenses')
+        return self.counts
+
+    def create_users(self):
+        # Hashing is deliberately slow; every generated user shares one hash
+        password = make_password(self.password)
+        start = generated_users(self.prefix).count()
+        users = []
+        for i in range(start, start + self.families * self.members):
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            users.append(User(
+                email=f'{self.prefix}+{i}@example.com',
+                username=f'{self.prefix}{i}',
+                first_name=first,
+                last_name=last,
+                password=password,
+                currency=self.rng.choice(['USD', 'EUR', 'GBP']),
+            ))
+        users = User.objects.bulk_create(users, batch_size=self.batch_size)
+        if not users or users[0].pk is None:
+            users = list(generated_users(self.prefix).order_by('id')[start:])
+        Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users], batch_size=self.batch_size)
+        self.count('users', users)
+        return users
+
+    def create_family(self, index, members):
+        family = Family.objects.create(
+            name=f'{members[0].last_name} household {index + 1}',
+            created_by=members[0],
+        )
+        memberships = [
+            FamilyMember(family=family, user=user, role='admin' if position == 0 else 'member')
+            for position, user in enumerate(members)
+        ]
+        self.count('memberships', FamilyMember.objects.bulk_create(memberships))
+        categories = Category.objects.bulk_create([
+            Category(name=name, color=color, icon=icon, family=family, created_by=members[0])
+            for name, color, icon, *_ in CATEGORIES
+        ])
+        if categories[0].pk is None:
+            by_name = {category.name: category for category in Category.objects.filter(family=family)}
+            categories = [by_name[category[0]] for category in CATEGORIES]
+        tree.rebuild(Category.objects.filter(family=family))
+        self.count('categories', categories)
+        return family, categories
+
+    def create_budgets(self, family, categories, owner):
+        budgets = []
+        month = self.start_date
+        while month <= self.end_date:
+            end = add_months(month, 1) - timedelta(days=1)
+            for category, spec in zip(categories, CATEGORIES):
+                factor = BUDGETED.get(spec[0])
+                if factor is None:
+                    continue
+                amount = Decimal(round(spec[3] * spec[4] * factor, -1) or 10)
+                budgets.append(Budget(
+                    name=f'{spec[0]} {month:%b %Y}',
+                    family=family,
+                    category=category,
+                    amount=amount,
+                    period='monthly',
+                    start_date=month,
+                    end_date=end,
+                    created_by=owner,
+                    is_active=True,
+                ))
+            month = add_months(month, 1)
+        self.count('budgets', Budget.objects.bulk_create(budgets, batch_size=self.batch_size))
+
+    def create_recurring(self, family, categories, members):
+        by_name = dict(zip((spec[0] for spec in CATEGORIES), zip(categories, CATEGORIES)))
+        rules = []
+        for name, title, frequency in RECURRING[:self.recurring]:
+            category, spec = by_name[name]
+            rules.append(RecurringExpense(
+                title=title,
+                amount=_amount(self.rng, spec[4], spec[5]),
+                category=category,
+                family=family,
+                paid_by=self.rng.choice(members),
+                frequency=frequency,
+                start_date=self.start_date,
+                payment_method='bank_transfer',
+            ))
+            # Expenses are generated up to end_date; the rule is due after it
+            recurrence.schedule(rules[-1], self.end_date + timedelta(days=1))
+        self.count('recurring_expenses', RecurringExpense.objects.bulk_create(rules))
+
+    def create_expenses(self, family, categories, members, count):
+        rng = self.rng
+        can_share = connection.features.can_return_rows_from_bulk_insert and len(members) > 1
+        while count > 0:
+            size = min(count, self.batch_size)
+            count -= size
+            batch = []
+            for _ in range(size):
+                index = rng.choices(range(len(CATEGORIES)), cum_weights=self.category_weights)[0]
+                name, _, _, _, median, spread, titles, tags = CATEGORIES[index]
+                batch.append(Expense(
+                    title=rng.choice(titles),
+                    description=rng.choice([None, None, None, '', 'Paid with the shared card', 'Split later']),
+                    amount=_amount(rng, median, spread),
+                    category=categories[index],
+                    family=family,
+                    paid_by=rng.choice(members),
+                    date=_random_date(rng, self.start_date, self.days),
+                    payment_method=rng.choices(self.methods, cum_weights=self.method_weights)[0],
+                    tags=', '.join(rng.sample(tags, rng.randint(0, min(2, len(tags))))) or None,
+                ))
+            with transaction.atomic():
+                created = Expense.objects.bulk_create(batch)
+                self.count('expenses', created)
+                if can_share:
+                    self.create_shares(created, members)
+
+    def create_shares(self, expenses, members):
+        shares = []
+        for expense in expenses:
+            if self.rng.random() >= self.share_ratio:
+                continue
+            part = (expense.amount / len(members)).quantize(Decimal('0.01'))
+            for user in members:
+                paid = user.pk == expense.paid_by_id or self.rng.random() < 0.6
+                shares.append(ExpenseShare(expense=expense, user=user, amount=part, is_paid=paid))
+        self.count('shares', ExpenseShare.objects.bulk_create(shares, batch_size=self.batch_size))
@@ -0,0 +1,239 @@
+"""
+HTTP load test against a running server.
+
+Worker threads hold one keep-alive connection each and pick weighted
+scenarios hitting the real API as generated users (see ``generator``). Every
+response's latency, status and ``X-Query-Count`` header (sent when
+``QueryCountMiddleware`` is enabled on the server) is recorded once the
+warmup is over. Throughput is measured over the span from the first
+measured request to the last measured response.
+"""
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts.models import FamilyMember
+from budgets.models import Category
+from expenses.models import Expense
+from .generator import DEFAULT_PREFIX, generated_users
+
+# Expense ids sampled per family for detail requests
+SAMPLE_SIZE = 200
+
+
+class Session:
+    """What one generated user may request"""
+
+    def __init__(self, token, family_id, category_ids, expense_ids):
+        self.token = token
+        self.family_id = family_id
+        self.category_ids = category_ids
+        self.expense_ids = expense_ids
+
+
+def load_sessions(prefix=DEFAULT_PREFIX, limit=50):
+    """Sessions for up to ``limit`` generated users, each with one family"""
+    users = generated_users(prefix).order_by('id')[:limit]
+    tokens = dict(Token.objects.filter(user__in=users).values_list('user_id', 'key'))
+    memberships = FamilyMember.objects.filter(user__in=users, is_active=True).values_list('user_id', 'family_id')
+    families = {}
+    sessions = []
+    for user_id, family_id in memberships:
+        if user_id not in tokens:
+            continue
+        if family_id not in families:
+            families[family_id] = (
+                list(Category.objects.filter(family_id=family_id).values_list('id', flat=True)),
+                list(Expense.objects.filter(family_id=family_id).order_by().values_list('id', flat=True)[:SAMPLE_SIZE]),
+            )
+        category_ids, expense_ids = families[family_id]
+        sessions.append(Session(tokens[user_id], family_id, category_ids, expense_ids))
+    return sessions
+
+
+def _since():
+    return (timezone.now() - timedelta(hours=1)).isoformat()
+
+
+# name -> (weight, method, path builder)
+SCENARIOS = {
+    'expenses.list': (20, 'GET', lambda s, rng: ('/api/expenses/expenses/', {'family': s.family_id, 'page': rng.randint(1, 5)})),
+    'expenses.filter': (8, 'GET', lambda s, rng: ('/api/expenses/expenses/', {'family': s.family_id, 'category': rng.choice(s.category_ids)})),
+    'expenses.search': (4, 'GET', lambda s, rng: ('/api/expenses/expenses/', {'family': s.family_id, 'search': rng.choice(['shop', 'bill', 'ticket', 'pizza'])})),
+    'expenses.sparse': (6, 'GET', lambda s, rng: ('/api/expenses/expenses/', {'family': s.family_id, 'fields': 'id,title,amount,date,category'})),
+    'expenses.detail': (10, 'GET', lambda s, rng: (f'/api/expenses/expenses/{rng.choice(s.expense_ids)}/', {})),
+    'expenses.recent': (6, 'GET', lambda s, rng: ('/api/expenses/recent/', {'family_id': s.family_id})),
+    'expenses.statistics': (8, 'GET', lambda s, rng: ('/api/expenses/statistics/', {'family_id': s.family_id, 'period': rng.choice(['week', 'month', 'year'])})),
+    'expenses.trends': (5, 'GET', lambda s, rng: ('/api/expenses/trends/', {'family_id': s.family_id, 'granularity': rng.choice(['week', 'month']), 'group_by': 'category'})),
+    'budgets.list': (8, 'GET', lambda s, rng: ('/api/budgets/budgets/', {'family': s.family_id})),
+    'budgets.active': (8, 'GET', lambda s, rng: ('/api/budgets/budgets/active/', {})),
+    'budgets.categories': (5, 'GET', lambda s, rng: ('/api/budgets/categories/', {'family': s.family_id})),
+    'accounts.members': (3, 'GET', lambda s, rng: (f'/api/auth/families/{s.family_id}/members/', {})),
+    'sync.delta': (4, 'GET', lambda s, rng: ('/api/sync/', {'since': _since()})),
+    'expenses.create': (0, 'POST', lambda s, rng: ('/api/expenses/expenses/', {})),
+}
+
+WRITE_SCENARIOS = {'expenses.create'}
+
+
+def _create_body(session, rng):
+    return {
+        'title': rng.choice(['Load test coffee', 'Load test groceries']),
+        'amount': f'{rng.uniform(1, 80):.2f}',
+        'category': rng.choice(session.category_ids),
+        'family': session.family_id,
+        'date': timezone.now().date().isoformat(),
+        'payment_method': 'debit_card',
+    }
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted ``values``"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class LoadTest:
+    def __init__(self, base_url, sessions, concurrency=10, duration=30, requests=None,
+                 warmup=5, scenarios=None, writes=0, seed=42, compress=True):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.sessions = sessions
+        self.concurrency = concurrency
+        self.duration = duration
+        self.max_requests = requests
+        self.warmup = warmup
+        self.seed = seed
+        self.compress = compress
+        weights = {name: spec[0] for name, spec in SCENARIOS.items()}
+        if writes:
+            weights['expenses.create'] = writes
+        if scenarios:
+            weights = {name: weights[name] or 1 for name in scenarios}
+        self.scenarios = [name for name, weight in weights.items() if weight > 0]
+        self.weights = [weights[name] for name in self.scenarios]
+        self.samples = []
+        # (first measured request sent, last measured response read), monotonic
+        self.window = None
+        self.lock = threading.Lock()
+        self.issued = 0
+
+    def connection(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=60)
+
+    def request(self, connection, session, name, rng):
+        _, method, build = SCENARIOS[name]
+        path, params = build(session, rng)
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        headers = {'Authorization': f'Token {session.token}', 'Accept': 'application/json'}
+        if self.compress:
+            headers['Accept-Encoding'] = 'br, gzip'
+        body = None
+        if method == 'POST':
+            body = json.dumps(_create_body(session, rng))
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        payload = response.read()
+        elapsed = time.perf_counter() - started
+        queries = response.getheader('X-Query-Count')
+        return elapsed, response.status, int(queries) if queries else None, len(payload)
+
+    def take_ticket(self):
+        with self.lock:
+            if self.max_requests is not None and self.issued >= self.max_requests:
+                return False
+            self.issued += 1
+            return True
+
+    def worker(self, index, warmup_until, deadline):
+        rng = random.Random(self.seed + index)
+        connection = self.connection()
+        samples = []
+        first = last = None
+        try:
+            while time.monotonic() < deadline:
+                sent = time.monotonic()
+                measuring = sent >= warmup_until
+                if measuring and not self.take_ticket():
+                    break
+                session = self.sessions[rng.randrange(len(self.sessions))]
+                name = rng.choices(self.scenarios, weights=self.weights)[0]
+                try:
+                    elapsed, status, queries, size = self.request(connection, session, name, rng)
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    connection = self.connection()
+                    elapsed, status, queries, size = 0.0, 0, None, 0
+                if measuring:
+                    samples.append((name, elapsed, status, queries, size))
+                    first = sent if first is None else first
+                    last = time.monotonic()
+        finally:
+            connection.close()
+        with self.lock:
+            self.samples.extend(samples)
+            if first is not None:
+                self.window = (first, last) if self.window is None else (
+                    min(first, self.window[0]), max(last, self.window[1])
+                )
+
+    def run(self):
+        start = time.monotonic()
+        warmup_until = start + self.warmup
+        deadline = warmup_until + self.duration if self.duration else float('inf')
+        threads = [
+            threading.Thread(target=self.worker, args=(index, warmup_until, deadline), daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = self.window[1] - self.window[0] if self.window else 0.0
+        return summarize(self.samples, elapsed)
+
+
+def _stats(samples, elapsed):
+    latencies = sorted(sample[1] * 1000 for sample in samples if sample[2])
+    queries = [sample[3] for sample in samples if sample[3] is not None]
+    errors = sum(1 for sample in samples if not 200 <= sample[2] < 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput': len(samples) / elapsed if elapsed > 0 else 0,
+        'mean_ms': sum(latencies) / len(latencies) if latencies else None,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1] if latencies else None,
+        'queries_per_request': sum(queries) / len(queries) if queries else None,
+        'mean_bytes': sum(sample[4] for sample in samples) / len(samples) if samples else 0,
+    }
+
+
+def summarize(samples, elapsed):
+    by_scenario = defaultdict(list)
+    for sample in samples:
+        by_scenario[sample[0]].append(sample)
+    return {
+        'elapsed': elapsed,
+        'total': _stats(samples, elapsed),
+        'scenarios': {name: _stats(items, elapsed) for name, items in sorted(by_scenario.items())},
+    }
@@ -0,0 +1,100 @@
+import warnings
+from datetime import date
+
+from django.core.paginator import UnorderedObjectListWarning
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from accounts.models import Family
+from benchmarks import plans, results
+from benchmarks.generator import DEFAULT_PREFIX, Generator, generated_users
+from benchmarks.micro import FIXTURE_SEED
+
+
+class Command(BaseCommand):
+    help = 'Explain the queries behind every API endpoint and report scans, sorts, missing indexes and N+1 queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=20000,
+                            help='Size of the generated dataset in the throwaway database')
+        parser.add_argument('--existing', action='store_true',
+                            help='Audit the configured database, as the first user from generate_data')
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX, help='Email prefix of generated users (with --existing)')
+        parser.add_argument('--endpoint', help='Only audit routes containing this text')
+        parser.add_argument('--verbose', action='store_true', help='Print the plan of every query')
+        parser.add_argument('--label', help='Name of the saved report')
+        parser.add_argument('--no-save', action='store_true', help='Do not store the report')
+
+    def handle(self, *args, **options):
+        if options['existing']:
+            report = self.audit(options)
+        else:
+            setup_test_environment()
+            old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+            try:
+                self.stdout.write(f"Generating {options['expenses']} expenses...")
+                Generator(expenses=options['expenses'], seed=FIXTURE_SEED, end_date=date.today()).run()
+                # Give the planner (and the SQLite cost estimate) statistics like a long-lived database has
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                report = self.audit(options)
+            finally:
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+        self.print_report(report, options['verbose'])
+        if not options['no_save']:
+            path = results.save('plans', options['label'], report, {
+                'expenses': None if options['existing'] else options['expenses'],
+                'endpoint': options['endpoint'],
+            })
+            self.stdout.write(f'Report saved to {path}')
+
+    def audit(self, options):
+        user = generated_users(options['prefix']).order_by('id').first()
+        if user is None:
+            raise CommandError('No generated users found; run generate_data first')
+        family = Family.objects.filter(members__user=user, members__is_active=True).first()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UnorderedObjectListWarning)
+            return plans.audit(user, family, options['endpoint'])
+
+    def print_report(self, report, verbose):
+        self.stdout.write(f"\n{'endpoint':<72}{'status':>7}{'queries':>8}{'ms':>9}{'cost':>10}  findings")
+        problems = []
+        for result in report:
+            findings = [finding for query in result['plans'] for finding in query['findings']]
+            counts = {}
+            for finding in findings:
+                counts[finding['kind']] = counts.get(finding['kind'], 0) + 1
+            summary = ', '.join(f'{count} {kind}' for kind, count in sorted(counts.items())) or '-'
+            self.stdout.write(
+                f"{result['url']:<72}{result['status']:>7}{result['queries']:>8}"
+                f"{result['ms']:>9.1f}{result['cost']:>10.0f}  {summary}"
+            )
+            for query in result['plans']:
+                if query['findings']:
+                    problems.append((result, query))
+                if verbose:
+                    for line in query['plan']:
+                        self.stdout.write(f'    {line}')
+
+        if not problems:
+            self.stdout.write(self.style.SUCCESS('\nNo scans, sorts, missing indexes or repeated queries found'))
+            return
+        self.stdout.write('\nQueries with findings, most expensive first:')
+        for result, query in sorted(problems, key=lambda item: (-item[1]['cost'], -item[1]['ms'])):
+            self.stdout.write(
+                f"\n{result['url']}  (cost {query['cost']:.0f}, {query['ms']:.2f} ms, run {query['executions']}x)"
+            )
+            self.stdout.write(f"  {query['sql'][:200]}{'...' if len(query['sql']) > 200 else ''}")
+            for finding in query['findings']:
+                line = f"  {finding['kind']:<14}"
+                if finding.get('table'):
+                    line += f"{finding['table']} "
+                if finding.get('columns'):
+                    line += f"({', '.join(finding['columns'])}) "
+                if finding.get('rows') is not None:
+                    line += f"[{finding['rows']} rows] "
+                self.stdout.write(line + finding['detail'])
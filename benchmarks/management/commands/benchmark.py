@@ -0,0 +1,83 @@
+import warnings
+
+from django.conf import settings
+from django.core.paginator import UnorderedObjectListWarning
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from benchmarks import micro, results
+
+TOLERANCE = getattr(settings, 'BENCHMARK_TOLERANCE', 0.25)
+
+
+class Command(BaseCommand):
+    help = 'Run ORM and serializer micro-benchmarks and check endpoint query budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmark', action='append', choices=[b.name for b in micro.BENCHMARKS],
+                            help='Only run these benchmarks')
+        parser.add_argument('--repeat', type=int, default=7, help='Timed repeats; the fastest is kept')
+        parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                            help='Allowed slowdown against the baseline, as a fraction')
+        parser.add_argument('--compare', default='baseline',
+                            help="Saved run to compare against: a path, a label or 'latest'")
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument('--no-save', action='store_true', help='Do not store the results')
+
+    def handle(self, *args, **options):
+        # A throwaway test database keeps the fixture identical between runs
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            user, family = micro.build_fixture()
+            over_budget = self.check_query_budgets(user, family)
+            current = micro.run_benchmarks(user, family, options['repeat'], options['benchmark'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        baseline = results.load('micro', options['compare'])
+        baseline_results = baseline['results'] if baseline else {}
+        self.print_report(current, baseline_results)
+
+        if not options['no_save']:
+            label = 'baseline' if options['save_baseline'] else None
+            saved_options = {'repeat': options['repeat'], 'tolerance': options['tolerance']}
+            path = results.save('micro', label, current, saved_options)
+            self.stdout.write(f'Results saved to {path}')
+
+        failures = [f'{url}: {count} queries, budget {budget}' for url, count, budget in over_budget]
+        if not options['save_baseline']:
+            failures += [
+                f'{name}: {metric} {value:.2f} vs {previous:.2f}'
+                for name, metric, value, previous in micro.compare(current, baseline_results, options['tolerance'])
+            ]
+        if failures:
+            raise CommandError('Performance regressions:\n  ' + '\n  '.join(failures))
+        if not baseline and not options['save_baseline']:
+            self.stdout.write(self.style.WARNING('No baseline found; run with --save-baseline to record one'))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def check_query_budgets(self, user, family):
+        over_budget = []
+        self.stdout.write(f"{'endpoint':<70}{'queries':>8}{'budget':>8}")
+        for template, url in micro.endpoint_urls(family).items():
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UnorderedObjectListWarning)
+                status, count = micro.measure_queries(user, url)
+            budget = micro.QUERY_BUDGETS[template]
+            if status != 200:
+                raise CommandError(f'{url} returned {status}')
+            if count > budget:
+                over_budget.append((url, count, budget))
+            self.stdout.write(f'{template:<70}{count:>8}{budget:>8}')
+        return over_budget
+
+    def print_report(self, current, baseline):
+        self.stdout.write(f"\n{'benchmark':<30}{'ms':>10}{'queries':>9}{'baseline':>10}{'change':>9}")
+        for name, result in current.items():
+            previous = baseline.get(name)
+            line = f"{name:<30}{result['ms']:>10.2f}{result['queries']:>9}"
+            if previous:
+                line += f"{previous['ms']:>10.2f}{results.change(result['ms'], previous['ms']):>+8.1f}%"
+            self.stdout.write(line)
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from benchmarks.generator import DEFAULT_PASSWORD, DEFAULT_PREFIX, Generator, clear
+
+
+class Command(BaseCommand):
+    help = 'Generate realistic families, budgets and expenses for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=10000, help='Total number of expenses (1k to 10M)')
+        parser.add_argument('--families', type=int, help='Number of families (default: one per 2000 expenses)')
+        parser.add_argument('--members', type=int, default=3, help='Members per family')
+        parser.add_argument('--years', type=int, default=3, help='Years of history')
+        parser.add_argument('--recurring', type=int, default=5, help='Recurring expenses per family')
+        parser.add_argument('--share-ratio', type=float, default=0.25, help='Fraction of expenses split between members')
+        parser.add_argument('--end-date', help='Last day of generated history (YYYY-MM-DD, default today)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX, help='Email prefix of generated users')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of every generated user')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        end_date = None
+        if options['end_date']:
+            end_date = parse_date(options['end_date'])
+            if not end_date:
+                raise CommandError('--end-date must use the YYYY-MM-DD format')
+        if options['expenses'] < 0:
+            raise CommandError('--expenses must not be negative')
+
+        if options['clear']:
+            deleted = clear(options['prefix'])
+            self.stdout.write(f'Deleted {deleted} previously generated row(s)')
+
+        started = time.monotonic()
+        counts = Generator(
+            expenses=options['expenses'],
+            families=options['families'],
+            members=options['members'],
+            years=options['years'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            share_ratio=options['share_ratio'],
+            recurring=options['recurring'],
+            prefix=options['prefix'],
+            password=options['password'],
+            end_date=end_date,
+            stdout=self.stdout,
+        ).run()
+        elapsed = time.monotonic() - started
+
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {elapsed:.1f}s'))
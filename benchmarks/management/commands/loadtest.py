@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import results
+from benchmarks.generator import DEFAULT_PREFIX
+from benchmarks.loadtest import SCENARIOS, LoadTest, load_sessions
+
+COLUMNS = ('requests', 'errors', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f'{value:.1f}'
+    return str(value)
+
+
+class Command(BaseCommand):
+    help = 'Drive the API of a running server concurrently and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to test')
+        parser.add_argument('--concurrency', type=int, default=10, help='Concurrent connections')
+        parser.add_argument('--duration', type=float, default=30, help='Measured seconds (0 for no limit)')
+        parser.add_argument('--requests', type=int, help='Stop after this many measured requests')
+        parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before the run')
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Only run these scenarios')
+        parser.add_argument('--writes', type=int, default=0, help='Weight of expense creation (0 for read-only)')
+        parser.add_argument('--users', type=int, default=50, help='Generated users to act as')
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX, help='Email prefix of generated users')
+        parser.add_argument('--no-compression', action='store_true', help='Do not send Accept-Encoding')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--label', help='Name stored with the results')
+        parser.add_argument('--compare', help="Saved run to compare against: a path, a label or 'latest'")
+        parser.add_argument('--no-save', action='store_true', help='Do not store the results')
+
+    def handle(self, *args, **options):
+        if not options['duration'] and not options['requests']:
+            raise CommandError('Pass --duration or --requests')
+        sessions = load_sessions(options['prefix'], options['users'])
+        if not sessions:
+            raise CommandError('No generated users found; run generate_data first')
+
+        baseline = None
+        if options['compare']:
+            baseline = results.load('loadtest', options['compare'])
+            if baseline is None:
+                raise CommandError(f"No saved load test matches {options['compare']!r}")
+
+        self.stdout.write(
+            f"{options['concurrency']} connections against {options['base_url']} as {len(sessions)} users"
+        )
+        report = LoadTest(
+            options['base_url'],
+            sessions,
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            requests=options['requests'],
+            warmup=options['warmup'],
+            scenarios=options['scenario'],
+            writes=options['writes'],
+            seed=options['seed'],
+            compress=not options['no_compression'],
+        ).run()
+
+        self.print_report(report, baseline['results'] if baseline else None)
+        if not options['no_save']:
+            saved_options = {key: options[key] for key in (
+                'base_url', 'concurrency', 'duration', 'requests', 'warmup', 'scenario', 'writes', 'users', 'seed'
+            )}
+            path = results.save('loadtest', options['label'], report, saved_options)
+            self.stdout.write(f'Results saved to {path}')
+
+    def print_report(self, report, baseline):
+        header = f"{'scenario':<22}" + ''.join(f'{column:>21}' if column == 'queries_per_request' else f'{column:>12}' for column in COLUMNS)
+        self.stdout.write(header)
+        rows = list(report['scenarios'].items()) + [('total', report['total'])]
+        for name, stats in rows:
+            line = f'{name:<22}'
+            for column in COLUMNS:
+                width = 21 if column == 'queries_per_request' else 12
+                line += f'{_format(stats[column]):>{width}}'
+            self.stdout.write(line)
+            if baseline is None:
+                continue
+            previous = baseline['total'] if name == 'total' else baseline['scenarios'].get(name)
+            if previous is None:
+                continue
+            deltas = []
+            for column in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'):
+                change = results.change(stats[column] or 0, previous.get(column) or 0)
+                if change is not None:
+                    deltas.append(f'{column} {change:+.1f}%')
+            self.stdout.write(f"{'':<22}vs baseline: {', '.join(deltas)}")
@@ -0,0 +1,217 @@
+"""
+Micro-benchmarks of ORM and serializer hot paths, plus per-endpoint query
+budgets.
+
+Everything runs against a fixture generated from a fixed seed and end date
+(see ``build_fixture``), and is measured as if that end date were today, so
+timings and query counts only move when the code does. Timings are the fastest of several repeats, which is what stays
+stable on a laptop.
+"""
+import timeit
+from contextlib import contextmanager
+from datetime import date, datetime, time, timezone as dt_timezone
+from unittest import mock
+
+from django.db import connection
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from accounts.models import Family
+from budgets.models import Budget
+from expenses.models import Expense
+from expenses.serializers import ExpenseSerializer
+from expenses.views import expense_statistics
+from .generator import Generator, generated_users
+
+FIXTURE_SEED = 1234
+FIXTURE_EXPENSES = 4000
+FIXTURE_FAMILIES = 2
+# Last day of generated data; fixed so the dataset does not shift daily
+FIXTURE_END_DATE = date(2024, 12, 31)
+
+# Upper bounds on the queries behind one request. Lower a number when an
+# optimisation lands; raising one needs a reason.
+QUERY_BUDGETS = {
+    '/api/expenses/expenses/?family={family}': 3,
+    '/api/expenses/expenses/?family={family}&fields=id,title,amount,date': 3,
+    '/api/expenses/expenses/{expense}/': 1,
+    '/api/expenses/recent/?family_id={family}': 1,
+    '/api/expenses/statistics/?family_id={family}&period=year': 5,
+    '/api/expenses/trends/?family_id={family}&group_by=category': 2,
+    '/api/expenses/recurring-expenses/?family={family}': 3,
+    '/api/budgets/categories/?family={family}': 3,
+    '/api/budgets/budgets/?family={family}': 4,
+    '/api/budgets/budgets/?family={family}&exclude=category': 3,
+    '/api/budgets/budgets/active/': 3,
+    '/api/budgets/alerts/': 1,
+    '/api/auth/families/': 4,
+    '/api/auth/families/{family}/members/': 5,
+    '/api/sync/?since=2000-01-01T00:00:00Z': 4,
+}
+
+
+def build_fixture():
+    """Create the benchmark dataset; returns (user, family)"""
+    with fixture_clock():
+        Generator(
+            expenses=FIXTURE_EXPENSES,
+            families=FIXTURE_FAMILIES,
+            seed=FIXTURE_SEED,
+            years=2,
+            end_date=FIXTURE_END_DATE,
+        ).run()
+    user = generated_users().order_by('id').first()
+    return user, Family.objects.filter(members__user=user).first()
+
+
+def endpoint_urls(family):
+    expense = Expense.objects.filter(family=family).order_by('id').first()
+    values = {'family': family.pk, 'expense': expense.pk}
+    return {template: template.format(**values) for template in QUERY_BUDGETS}
+
+
+@contextmanager
+def fixture_clock():
+    """Make ``FIXTURE_END_DATE`` today for views and benchmarks that look at the current date"""
+    now = datetime.combine(FIXTURE_END_DATE, time(12), tzinfo=dt_timezone.utc)
+    with mock.patch('django.utils.timezone.now', return_value=now):
+        yield
+
+
+@contextmanager
+def count_queries():
+    """Yield a list whose length is the number of queries run inside"""
+    executed = []
+
+    def wrapper(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield executed
+
+
+def measure_queries(user, url):
+    client = APIClient()
+    client.force_authenticate(user)
+    with fixture_clock(), count_queries() as queries:
+        response = client.get(url, HTTP_ACCEPT='application/json')
+    return response.status_code, len(queries)
+
+
+class Benchmark:
+    """
+    A timed callable; ``setup`` runs once and its result is passed in.
+
+    Each repeat calls the function enough times to take at least 0.2s, so
+    fast benchmarks are not dominated by timer resolution.
+    """
+
+    def __init__(self, name, func, setup=None, description=''):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.description = description
+
+    def run(self, user, family, repeat):
+        state = self.setup(user, family) if self.setup else (user, family)
+        call = lambda: self.func(state)
+        with count_queries() as queries:
+            call()
+        timer = timeit.Timer(call)
+        number, _ = timer.autorange()
+        timings = timer.repeat(repeat=repeat, number=number)
+        return {
+            'ms': min(timings) * 1000 / number,
+            'queries': len(queries),
+        }
+
+
+def _budgets(state):
+    user, family = state
+    return [budget.spent_amount for budget in Budget.objects.filter(family=family).order_by('id')[:50]]
+
+
+def _budgets_with_spent(state):
+    user, family = state
+    return [budget.spent_amount for budget in Budget.objects.filter(family=family).with_spent().order_by('id')[:50]]
+
+
+def _load_expenses(user, family):
+    return list(Expense.objects.filter(family=family).select_related('category__family', 'family', 'paid_by')[:1000])
+
+
+def _tag_lists(expenses):
+    return [expense.tag_list for expense in expenses]
+
+
+def _serialize_loaded(expenses):
+    return ExpenseSerializer(expenses, many=True).data
+
+
+def _serialize_queryset(state):
+    user, family = state
+    queryset = Expense.objects.filter(family=family).select_related('category__family', 'family', 'paid_by')[:1000]
+    return ExpenseSerializer(queryset, many=True).data
+
+
+def _statistics_request(period):
+    def setup(user, family):
+        request = APIRequestFactory().get('/api/expenses/statistics/', {'family_id': family.pk, 'period': period})
+        force_authenticate(request, user=user)
+        return request
+
+    def run(request):
+        return expense_statistics(request).data
+    return setup, run
+
+
+def _membership_page(state):
+    user, family = state
+    queryset = Expense.objects.filter(
+        family__members__user=user,
+        family__members__is_active=True
+    ).distinct()
+    return queryset.count(), list(queryset.order_by('-date', '-created_at')[:20])
+
+
+_month_setup, _month_run = _statistics_request('month')
+_year_setup, _year_run = _statistics_request('year')
+
+BENCHMARKS = [
+    Benchmark('budget.spent_amount', _budgets, description='spent_amount on 50 budgets, one query each'),
+    Benchmark('budget.with_spent', _budgets_with_spent, description='spent_amount on 50 annotated budgets'),
+    Benchmark('expense.tag_list', _tag_lists, setup=_load_expenses, description='tag_list on 1000 expenses'),
+    Benchmark('serializer.expenses_loaded', _serialize_loaded, setup=_load_expenses,
+              description='ExpenseSerializer(many=True) on 1000 loaded expenses'),
+    Benchmark('serializer.expenses_queryset', _serialize_queryset,
+              description='ExpenseSerializer(many=True) on a 1000 row queryset'),
+    Benchmark('statistics.month', _month_run, setup=_month_setup, description='expense_statistics, 30 days'),
+    Benchmark('statistics.year', _year_run, setup=_year_setup, description='expense_statistics, 365 days'),
+    Benchmark('membership.filter', _membership_page, description='family membership filter: count and first page'),
+]
+
+
+def run_benchmarks(user, family, repeat=7, names=None):
+    with fixture_clock():
+        return {
+            benchmark.name: benchmark.run(user, family, repeat)
+            for benchmark in BENCHMARKS
+            if not names or benchmark.name in names
+        }
+
+
+def compare(current, baseline, tolerance):
+    """
+    Return [(name, metric, current, baseline)] for every regression: a
+    timing more than ``tolerance`` (a fraction) slower, or more queries.
+    """
+    regressions = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['ms'] > previous['ms'] * (1 + tolerance):
+            regressions.append((name, 'ms', result['ms'], previous['ms']))
+        if result['queries'] > previous['queries']:
+            regressions.append((name, 'queries', result['queries'], previous['queries']))
+    return regressions
@@ -0,0 +1,335 @@
+"""
+Query plan audit of the API.
+
+Every GET endpoint under ``/api/`` is requested as a sample user, in
+variants with the filters, search and ordering its view supports. Each
+SELECT the request runs is captured and explained: ``EXPLAIN QUERY PLAN``
+on SQLite, ``EXPLAIN (ANALYZE, FORMAT JSON)`` on PostgreSQL. The plans are
+reduced to findings:
+
+- ``scan``: a table read in full (``SCAN`` / ``Seq Scan``)
+- ``sort``: rows sorted in a temporary B-tree or ``Sort`` node
+- ``missing_index``: SQLite built an automatic index, or PostgreSQL
+  filtered away most rows of a sequential scan
+- ``repeated``: the same statement ran ``REPEATED_QUERIES`` times or more
+  in one request, the mark of an N+1 pattern
+
+Queries are ranked by cost: the planner's total cost on PostgreSQL and, as
+SQLite does not expose one, an estimate of the rows it reads there: the
+whole table for a scan, and for an index search the rows per key from
+``sqlite_stat1`` (written by ``ANALYZE``) or a default selectivity. Ties are
+ranked by execution time.
+"""
+import json
+import re
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from django.db import connection
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.generics import GenericAPIView
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from expenses.models import Expense
+
+API_PREFIX = 'api/'
+SEARCH_TERM = 'e'
+# PostgreSQL sequential scans discarding more rows than this are flagged
+FILTERED_ROWS = 1000
+# Statements run this many times by one request are flagged
+REPEATED_QUERIES = 3
+# Assumed share of an index's rows matched by each equality without
+# sqlite_stat1, and by a range constraint
+EQUALITY_SELECTIVITY = 0.1
+RANGE_SELECTIVITY = 0.25
+
+
+def _routes(patterns, prefix=''):
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from _routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route, pattern.callback
+
+
+def _view_class(callback):
+    view_class = getattr(callback, 'cls', None)
+    actions = getattr(callback, 'actions', None)
+    if view_class is None or (actions and 'get' not in actions) or not (actions or hasattr(view_class, 'get')):
+        return None
+    return view_class
+
+
+def _view_queryset(view_class, user, kwargs, params=None):
+    request = APIRequestFactory().get('/', params or {})
+    force_authenticate(request, user=user)
+    view = view_class()
+    view.setup(request, **kwargs)
+    view.request = view.initialize_request(request)
+    view.format_kwarg = None
+    return view.filter_queryset(view.get_queryset())
+
+
+def _filter_names(view_class):
+    filterset_class = getattr(view_class, 'filterset_class', None)
+    if filterset_class is not None:
+        return set(filterset_class.base_filters)
+    return set(getattr(view_class, 'filterset_fields', None) or ())
+
+
+def _variants(view_class, family):
+    """(label, query params) for the requests made to one endpoint"""
+    yield 'default', {}
+    if view_class is None or not issubclass(view_class, GenericAPIView):
+        yield 'family', {'family_id': family.pk}
+        return
+    filters = _filter_names(view_class)
+    if 'family' in filters:
+        yield 'family', {'family': family.pk}
+    if {'start_date', 'end_date'} <= filters:
+        today = date.today()
+        yield 'date range', {
+            'family': family.pk,
+            'start_date': (today - timedelta(days=90)).isoformat(),
+            'end_date': today.isoformat(),
+        }
+    if getattr(view_class, 'search_fields', None):
+        yield 'search', {'search': SEARCH_TERM}
+    for field in getattr(view_class, 'ordering_fields', None) or ():
+        if field != '__all__':
+            yield f'ordering -{field}', {'ordering': f'-{field}'}
+
+
+def endpoints(user, family):
+    """[(route, variant, url)] of every GET endpoint under ``API_PREFIX``"""
+    expense = Expense.objects.filter(family=family).order_by('id').first()
+    known = {'family_id': family.pk, 'expense_id': expense.pk if expense else None}
+    found = []
+    for route, callback in _routes(get_resolver().url_patterns):
+        if not route.startswith(API_PREFIX):
+            continue
+        view_class = _view_class(callback)
+        if view_class is None:
+            continue
+        names = re.findall(r'<(?:\w+:)?(\w+)>', route)
+        values = {name: known.get(name) for name in names if name != 'pk'}
+        if None in values.values():
+            continue
+        if 'pk' in names:
+            if view_class is None or not issubclass(view_class, GenericAPIView):
+                continue
+            pk = _view_queryset(view_class, user, values).order_by().values_list('pk', flat=True).first()
+            if pk is None:
+                continue
+            values['pk'] = pk
+        path = '/' + re.sub(r'<(?:\w+:)?(\w+)>', lambda match: str(values[match.group(1)]), route)
+        for variant, params in _variants(view_class, family):
+            found.append((route, variant, f'{path}?{urlencode(params)}' if params else path))
+    return found
+
+
+def _table_aliases(sql):
+    return dict((alias, table) for table, alias in re.findall(r'"(\w+)" (U\d+|T\d+)\b', sql))
+
+
+_row_counts = {}
+
+
+def _row_count(table):
+    if table not in _row_counts:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+            _row_counts[table] = cursor.fetchone()[0]
+    return _row_counts[table]
+
+
+_index_stats = {}
+
+
+def _index_stat(index):
+    """[rows, rows per value of the first column, of the first two, ...] of an index, or None"""
+    if not _index_stats:
+        _index_stats[None] = None  # Loaded, even when there are no statistics
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute('SELECT idx, stat FROM sqlite_stat1 WHERE idx IS NOT NULL')
+                for name, stat in cursor.fetchall():
+                    _index_stats[name] = [int(value) for value in stat.split() if value.isdigit()]
+    return _index_stats.get(index)
+
+
+def _search_rows(table, index, constraints):
+    """Estimated rows an index search reads, from its equality and range constraints"""
+    rows = _row_count(table)
+    equalities = len(re.findall(r'\w+=\?', constraints))
+    if index is None:
+        # INTEGER PRIMARY KEY
+        estimate = 1 if equalities else rows
+    else:
+        stat = _index_stat(index)
+        if stat and equalities:
+            estimate = stat[min(equalities, len(stat) - 1)]
+        else:
+            estimate = rows * EQUALITY_SELECTIVITY ** equalities
+    if re.search(r'[<>]', constraints):
+        estimate *= RANGE_SELECTIVITY
+    return max(1, round(estimate))
+
+
+def _sqlite_plan(sql, params):
+    tables = set(connection.introspection.table_names())
+    aliases = _table_aliases(sql)
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        lines = [row[-1] for row in cursor.fetchall()]
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+
+    findings = []
+    cost = 0
+    for line in lines:
+        scan = re.match(r'SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?', line)
+        if scan:
+            table = aliases.get(scan.group(1), scan.group(1))
+            if table in tables:
+                rows = _row_count(table)
+                cost += rows
+                if scan.group(2) is None:
+                    findings.append({'kind': 'scan', 'table': table, 'rows': rows, 'detail': line})
+            continue
+        automatic = re.match(r'SEARCH (\w+) USING AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX \(([^)]*)\)', line)
+        if automatic:
+            table = aliases.get(automatic.group(1), automatic.group(1))
+            columns = re.findall(r'(\w+)[=<>]', automatic.group(2))
+            findings.append({'kind': 'missing_index', 'table': table, 'columns': columns, 'detail': line})
+            if table in tables:
+                # Building the index reads the whole table
+                cost += _row_count(table)
+            continue
+        search = re.match(
+            r'SEARCH (\w+) USING (?:(?:COVERING )?INDEX (\w+)|INTEGER PRIMARY KEY) \(([^)]*)\)', line
+        )
+        if search:
+            table = aliases.get(search.group(1), search.group(1))
+            if table in tables:
+                cost += _search_rows(table, search.group(2), search.group(3))
+            continue
+        if 'USE TEMP B-TREE' in line:
+            findings.append({'kind': 'sort', 'detail': line})
+    return lines, findings, cost, elapsed
+
+
+def _walk(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from _walk(child)
+
+
+def _postgres_plan(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+        document = cursor.fetchone()[0]
+    if isinstance(document, str):
+        document = json.loads(document)
+    root = document[0]['Plan']
+
+    findings = []
+    for node in _walk(root):
+        kind = node['Node Type']
+        if kind == 'Seq Scan':
+            removed = node.get('Rows Removed by Filter', 0)
+            findings.append({
+                'kind': 'scan', 'table': node['Relation Name'],
+                'rows': node.get('Actual Rows', 0) + removed, 'detail': node.get('Filter', ''),
+            })
+            if removed > FILTERED_ROWS and node.get('Filter'):
+                findings.append({
+                    'kind': 'missing_index', 'table': node['Relation Name'],
+                    'columns': sorted(set(re.findall(r'\((\w+) [=<>]', node['Filter']))),
+                    'detail': node['Filter'],
+                })
+        elif kind in ('Sort', 'Incremental Sort'):
+            findings.append({
+                'kind': 'sort', 'detail': f"{', '.join(node.get('Sort Key', []))} ({node.get('Sort Method', '')})",
+            })
+    lines = [f"{node['Node Type']} {node.get('Relation Name', '')}".strip() for node in _walk(root)]
+    return lines, findings, root['Total Cost'], root['Actual Total Time']
+
+
+def explain(sql, params):
+    """(plan lines, findings, cost, milliseconds) of one SELECT"""
+    if connection.vendor == 'postgresql':
+        return _postgres_plan(sql, params)
+    if connection.vendor == 'sqlite':
+        return _sqlite_plan(sql, params)
+    raise NotImplementedError(f'Plans cannot be audited on {connection.vendor}')
+
+
+def _is_select(sql):
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+@contextmanager
+def capture_queries():
+    """Yield a list of the (sql, params) run inside"""
+    captured = []
+
+    def wrapper(execute, sql, params, many, context):
+        captured.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield captured
+
+
+def audit_url(client, url):
+    """Request ``url`` and explain every distinct SELECT it ran"""
+    with capture_queries() as captured:
+        started = time.perf_counter()
+        response = client.get(url, HTTP_ACCEPT='application/json')
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - started) * 1000
+
+    queries = {}
+    for sql, params in captured:
+        if not _is_select(sql):
+            continue
+        if sql in queries:
+            queries[sql]['executions'] += 1
+            continue
+        lines, findings, cost, ms = explain(sql, params)
+        queries[sql] = {'sql': sql, 'executions': 1, 'plan': lines, 'findings': findings, 'cost': cost, 'ms': ms}
+    for query in queries.values():
+        if query['executions'] >= REPEATED_QUERIES:
+            query['findings'].append({'kind': 'repeated', 'detail': f"run {query['executions']} times"})
+    return {
+        'url': url,
+        'status': response.status_code,
+        'ms': elapsed,
+        'queries': len(captured),
+        'cost': sum(query['cost'] * query['executions'] for query in queries.values()),
+        'plans': sorted(queries.values(), key=lambda query: (-query['cost'], -query['ms'])),
+    }
+
+
+def audit(user, family, only=None):
+    """Audit every endpoint variant; ``only`` keeps routes containing it"""
+    client = APIClient()
+    client.force_authenticate(user)
+    _row_counts.clear()
+    _index_stats.clear()
+    report = []
+    for route, variant, url in endpoints(user, family):
+        if only and only not in route:
+            continue
+        result = audit_url(client, url)
+        result.update(route=route, variant=variant)
+        report.append(result)
+    return report
@@ -0,0 +1,62 @@
+"""Benchmark results saved as JSON files so runs can be compared"""
+import json
+import platform
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+RESULTS_DIR = Path(getattr(settings, 'BENCHMARK_RESULTS_DIR', settings.BASE_DIR / 'benchmark_results'))
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(terse=True),
+        'database': connection.vendor,
+    }
+
+
+def save(kind, label, results, options):
+    """Write a run to ``RESULTS_DIR/<kind>/`` and return its path"""
+    directory = RESULTS_DIR / kind
+    directory.mkdir(parents=True, exist_ok=True)
+    started = datetime.now()
+    name = started.strftime('%Y%m%d-%H%M%S')
+    if label:
+        name = f'{name}-{label}'
+    path = directory / f'{name}.json'
+    path.write_text(json.dumps({
+        'kind': kind,
+        'label': label,
+        'created_at': started.isoformat(timespec='seconds'),
+        'environment': environment(),
+        'options': options,
+        'results': results,
+    }, indent=2, default=str))
+    return path
+
+
+def load(kind, reference):
+    """
+    Load a saved run. ``reference`` is a file path, a label or 'latest'.
+    Returns None when nothing matches.
+    """
+    path = Path(reference)
+    if path.is_file():
+        return json.loads(path.read_text())
+    runs = sorted((RESULTS_DIR / kind).glob('*.json'))
+    if reference != 'latest':
+        runs = [run for run in runs if run.stem.endswith(f'-{reference}')]
+    if not runs:
+        return None
+    return json.loads(runs[-1].read_text())
+
+
+def change(current, previous):
+    """Relative change from ``previous`` to ``current`` as a percentage"""
+    if not previous:
+        return None
+    return (current - previous) * 100 / previous
@@ -0,0 +1,156 @@
+import time
+import warnings
+from unittest import mock, skipUnless
+
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import Family
+from budgets.models import Budget, CategoryQuerySet
+from budgets.views import ActiveBudgetListView
+from expenses.models import Expense
+from expenses.views import ExpenseListCreateView
+from . import loadtest, micro, plans
+from .generator import Generator, generated_users
+
+
+class QueryBudgetTests(TestCase):
+    """Every endpoint in micro.QUERY_BUDGETS stays within its query budget"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.family = micro.build_fixture()
+
+    def test_endpoints_within_query_budget(self):
+        for template, url in micro.endpoint_urls(self.family).items():
+            with self.subTest(endpoint=template), warnings.catch_warnings():
+                warnings.simplefilter('ignore', UnorderedObjectListWarning)
+                status, count = micro.measure_queries(self.user, url)
+                self.assertEqual(status, 200)
+                self.assertLessEqual(count, micro.QUERY_BUDGETS[template], url)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are checked with SQLite EXPLAIN QUERY PLAN output')
+class QueryPlanTests(TestCase):
+    """
+    The core list and aggregate queries are answered from indexes: no full
+    table scans of the big tables and no temporary B-tree to sort rows.
+    """
+    TABLES = ('expenses_expense', 'budgets_budget')
+
+    @classmethod
+    def setUpTestData(cls):
+        Generator(expenses=300, families=2, years=1, seed=micro.FIXTURE_SEED).run()
+        cls.user = generated_users().order_by('id').first()
+        cls.family = Family.objects.filter(members__user=cls.user).first()
+
+    def view_queryset(self, view_class, params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=self.user)
+        view = view_class()
+        view.setup(request)
+        view.request = view.initialize_request(request)
+        view.format_kwarg = None
+        return view.filter_queryset(view.get_queryset())
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        for table in self.TABLES:
+            self.assertNotRegex(plan, rf'\bSCAN {table}\b(?! USING (COVERING )?INDEX)', plan)
+        self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_expense_list(self):
+        self.assertIndexed(self.view_queryset(ExpenseListCreateView, {'family': self.family.pk})[:20])
+
+    def test_expense_date_range(self):
+        self.assertIndexed(self.view_queryset(ExpenseListCreateView, {
+            'family': self.family.pk, 'start_date': '2020-01-01', 'end_date': '2030-12-31', 'min_amount': '10',
+        })[:20])
+
+    def test_budget_spent(self):
+        queryset = Budget.objects.filter(family=self.family).with_spent()
+        self.assertIndexed(queryset)
+        self.assertIn('USING COVERING INDEX expense_fam_cat_date_idx', queryset.explain())
+
+    def test_active_budgets(self):
+        queryset = self.view_queryset(ActiveBudgetListView, {})
+        self.assertIndexed(queryset)
+        self.assertIn('budget_family_active_idx', queryset.explain())
+
+    def test_audit_explains_every_query(self):
+        report = plans.audit(self.user, self.family, 'api/expenses/expenses/')
+        self.assertTrue(report)
+        for result in report:
+            self.assertEqual(result['status'], 200, result['url'])
+            self.assertTrue(result['plans'], result['url'])
+
+    def test_index_searches_are_costed(self):
+        sql, params = Expense.objects.filter(family=self.family).values_list('id').query.sql_with_params()
+        lines, findings, cost, ms = plans.explain(sql, params)
+        self.assertTrue(any(line.startswith('SEARCH') for line in lines), lines)
+        self.assertGreater(cost, 0)
+        self.assertLessEqual(cost, Expense.objects.count())
+
+    def test_audit_flags_repeated_queries(self):
+        # Without the annotation every listed category counts its own expenses
+        with mock.patch.object(CategoryQuerySet, 'with_expense_count', lambda queryset: queryset), \
+                warnings.catch_warnings():
+            warnings.simplefilter('ignore', UnorderedObjectListWarning)
+            report = plans.audit(self.user, self.family, 'api/budgets/categories/')
+        repeated = [
+            query for result in report for query in result['plans']
+            if any(finding['kind'] == 'repeated' for finding in query['findings'])
+        ]
+        self.assertTrue(repeated)
+        self.assertGreaterEqual(repeated[0]['executions'], plans.REPEATED_QUERIES)
+
+
+class LoadTestTests(SimpleTestCase):
+    """Percentiles, error counts and throughput of load test runs"""
+
+    def test_nearest_rank_percentiles(self):
+        values = list(range(1, 11))
+        self.assertEqual(
+            [loadtest.percentile(values, p) for p in (0, 10, 50, 95, 99, 100)], [1, 1, 5, 10, 10, 10]
+        )
+        self.assertEqual(loadtest.percentile([7], 99), 7)
+        self.assertIsNone(loadtest.percentile([], 50))
+
+    def test_summary_counts_errors_per_scenario(self):
+        samples = [
+            ('expenses.list', 0.010, 200, 4, 100),
+            ('expenses.list', 0.030, 500, 6, 50),
+            ('expenses.list', 0.0, 0, None, 0),  # Connection failed
+            ('budgets.list', 0.020, 304, None, 0),
+        ]
+        summary = loadtest.summarize(samples, 2.0)
+        self.assertEqual(summary['total']['requests'], 4)
+        self.assertEqual(summary['total']['errors'], 2)
+        self.assertEqual(summary['total']['throughput'], 2.0)
+        self.assertEqual(list(summary['scenarios']), ['budgets.list', 'expenses.list'])
+        expenses = summary['scenarios']['expenses.list']
+        self.assertEqual((expenses['requests'], expenses['errors']), (3, 2))
+        # Failed connections have no latency; HTTP errors do
+        self.assertEqual((expenses['p50_ms'], expenses['max_ms']), (10, 30))
+        self.assertEqual(expenses['queries_per_request'], 5)
+        self.assertEqual(summary['scenarios']['budgets.list']['errors'], 0)
+
+    def test_request_limited_runs_measure_throughput(self):
+        class Offline(loadtest.LoadTest):
+            def connection(self):
+                return mock.Mock()
+
+            def request(self, connection, session, name, rng):
+                time.sleep(0.002)
+                return 0.002, 200, 3, 10
+
+        for warmup in (0, 0.05):
+            with self.subTest(warmup=warmup):
+                summary = Offline(
+                    'http://localhost:8000', [object()], concurrency=2, duration=0, requests=10, warmup=warmup
+                ).run()
+                self.assertEqual(summary['total']['requests'], 10)
+                self.assertGreater(summary['elapsed'], 0)
+                self.assertGreater(summary['total']['throughput'], 0)
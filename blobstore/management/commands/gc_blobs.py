@@ -0,0 +1,77 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blobstore.models import Blob
+from blobstore.storage import BLOB_DIR, ContentAddressedStorage, referencing_fields
+
+
+class Command(BaseCommand):
+    help = 'Reconcile blob reference counts and delete unreferenced blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Keep unreferenced blobs younger than this (uploads still being saved)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would be deleted without deleting'
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            self.stdout.write('Default storage is not content addressed; nothing to do')
+            return
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        dry_run = options['dry_run']
+
+        references = Counter()
+        for model, field in referencing_fields():
+            names = model._base_manager.exclude(**{field.name: ''}).exclude(
+                **{f'{field.name}__isnull': True}
+            ).values_list(field.name, flat=True)
+            references.update(name for name in names.iterator(chunk_size=2000) if name.startswith(f'{BLOB_DIR}/'))
+
+        corrected = []
+        deleted = 0
+        known = set()
+        for blob in Blob.objects.iterator(chunk_size=2000):
+            known.add(blob.name)
+            count = references.get(blob.name, 0)
+            if count == 0 and blob.updated_at < cutoff:
+                if dry_run:
+                    deleted += 1
+                    continue
+                # Only when no reference was added since the blob was read
+                Blob.objects.filter(pk=blob.pk, updated_at=blob.updated_at).update(ref_count=0)
+                deleted += default_storage.purge(blob.name, unchanged_since=cutoff)
+            elif count != blob.ref_count:
+                blob.ref_count = count
+                corrected.append(blob)
+        if corrected and not dry_run:
+            Blob.objects.bulk_update(corrected, ['ref_count'], batch_size=1000)
+
+        # Files left behind by interrupted uploads or rows removed out of band
+        orphans = 0
+        root = default_storage.path(BLOB_DIR)
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, default_storage.location).replace(os.sep, '/')
+                if name in known or name in references:
+                    continue
+                if datetime.fromtimestamp(os.path.getmtime(path), tz=dt_timezone.utc) >= cutoff:
+                    continue
+                orphans += 1
+                if not dry_run:
+                    os.remove(path)
+
+        prefix = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {deleted} blob(s) and {orphans} orphaned file(s); corrected {len(corrected)} reference count(s)'
+        ))
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class Blob(models.Model):
+    """A stored file, kept once per content digest and shared by references"""
+    name = models.CharField(max_length=255, unique=True)  # Storage path
+    digest = models.CharField(max_length=64, db_index=True)  # SHA-256 hex
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
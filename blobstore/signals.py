@@ -0,0 +1,66 @@
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_init, post_save
+
+from family_budget.deletion import bulk_deleted
+from .storage import referencing_fields
+
+
+def _stored_names(instance):
+    """Names of the stored files an instance holds; uploads not saved yet are skipped"""
+    names = {}
+    for field in type(instance)._blob_fields:
+        # Read from __dict__: going through the descriptor would load a deferred field
+        value = instance.__dict__.get(field.attname)
+        if not isinstance(value, str):
+            value = value.name if isinstance(value, FieldFile) and value._committed else None
+        names[field.attname] = value or None
+    return names
+
+
+def remember_files(sender, instance, **kwargs):
+    instance._blob_names = _stored_names(instance)
+
+
+def release_replaced_files(sender, instance, created, **kwargs):
+    """Drop the references to files a save replaced or cleared"""
+    previous = getattr(instance, '_blob_names', {})
+    current = _stored_names(instance)
+    if not created:
+        for field in sender._blob_fields:
+            old = previous.get(field.attname)
+            if old and field.attname in instance.__dict__ and old != current[field.attname]:
+                field.storage.delete(old)
+    instance._blob_names = current
+
+
+def release_files(sender, instance, **kwargs):
+    """
+    Drop the blob references held by a deleted row. Fields deferred when the
+    row was loaded are left to ``gc_blobs``.
+    """
+    for field, name in zip(sender._blob_fields, _stored_names(instance).values()):
+        if name:
+            field.storage.delete(name)
+
+
+def release_bulk_files(sender, rows, archived=False, **kwargs):
+    if archived:
+        # The archive's ArchivedReceipt rows take over the references
+        return
+    for field in sender._blob_fields:
+        for row in rows:
+            if row[field.attname]:
+                field.storage.delete(row[field.attname])
+
+
+def connect_signals():
+    models = {}
+    for model, field in referencing_fields():
+        models.setdefault(model, []).append(field)
+    for model, fields in models.items():
+        model._blob_fields = fields
+        label = model._meta.label
+        post_init.connect(remember_files, sender=model, dispatch_uid=f'blobstore-init-{label}')
+        post_save.connect(release_replaced_files, sender=model, dispatch_uid=f'blobstore-save-{label}')
+        post_delete.connect(release_files, sender=model, dispatch_uid=f'blobstore-{label}')
+        bulk_deleted.connect(release_bulk_files, sender=model, dispatch_uid=f'blobstore-bulk-{label}')
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+BLOB_DIR = 'blobs'
+CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that keeps each distinct content once.
+
+    Uploads are hashed chunk by chunk and stored as
+    ``blobs/<aa>/<digest><ext>``. Saving content that is already stored only
+    bumps the blob's reference count, without writing anything. ``delete``
+    drops one reference and removes the file once none are left; counts are
+    reconciled against the actual file fields by ``manage.py gc_blobs``.
+
+    The ``Blob`` row is the lock for its file: adding a reference (and
+    writing the file if it is missing) and removing the last one happen with
+    the row locked. The file of a blob left without references is deleted
+    once the transaction dropping the last one commits, after locking the
+    row again to check that nothing referenced it in the meantime.
+    """
+
+    def blob_name(self, digest, ext):
+        return f'{BLOB_DIR}/{digest[:2]}/{digest}{ext}'
+
+    def is_blob(self, name):
+        return name.startswith(f'{BLOB_DIR}/')
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save
+        return name
+
+    def _hash(self, content):
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+        return digest.hexdigest(), size
+
+    def _write_temp(self, content, directory, digest=None):
+        os.makedirs(directory, exist_ok=True)
+        hasher = hashlib.sha256() if digest is None else None
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if hasher:
+                        hasher.update(chunk)
+                    handle.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, (hasher.hexdigest() if hasher else digest), size
+
+    def _publish(self, temp_path, name):
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(temp_path, self.file_permissions_mode)
+        # Atomic, so concurrent uploads of the same content cannot corrupt it
+        os.replace(temp_path, full_path)
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        seekable = hasattr(content, 'seek') and getattr(content, 'seekable', lambda: True)()
+
+        temp_path = None
+        if seekable:
+            content.seek(0)
+            digest, size = self._hash(content)
+        else:
+            temp_path, digest, size = self._write_temp(content, self.path(BLOB_DIR))
+        target = self.blob_name(digest, ext)
+
+        try:
+            with transaction.atomic():
+                self._lock(target, digest, size)
+                if not self.exists(target):
+                    if temp_path is None:
+                        content.seek(0)
+                        temp_path, digest, size = self._write_temp(
+                            content, os.path.dirname(self.path(target)), digest
+                        )
+                    self._publish(temp_path, target)
+                    temp_path = None
+                self._add_reference(target)
+        finally:
+            if temp_path is not None:
+                os.remove(temp_path)
+        return target
+
+    def _lock(self, name, digest, size):
+        """Lock the ``Blob`` row of ``name``, creating it unreferenced if needed"""
+        from .models import Blob
+        while True:
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is not None:
+                return blob
+            try:
+                with transaction.atomic():
+                    return Blob.objects.create(name=name, digest=digest, size=size, ref_count=0)
+            except IntegrityError:
+                # Created concurrently; lock that row instead
+                continue
+
+    def _add_reference(self, name):
+        from .models import Blob
+        Blob.objects.filter(name=name).update(ref_count=F('ref_count') + 1, updated_at=timezone.now())
+
+    def delete_file(self, name):
+        """Remove the file itself, ignoring reference counts"""
+        super().delete(name)
+
+    def delete(self, name):
+        if not name or not self.is_blob(name):
+            return super().delete(name)
+        from .models import Blob
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return
+            blob.ref_count = max(blob.ref_count - 1, 0)
+            blob.save(update_fields=['ref_count', 'updated_at'])
+            if blob.ref_count == 0:
+                transaction.on_commit(lambda: self.purge(name))
+
+    def purge(self, name, unchanged_since=None):
+        """
+        Delete the file and row of ``name`` if it is still unreferenced (and,
+        with ``unchanged_since``, was not touched after it). Returns whether
+        it was deleted.
+        """
+        from .models import Blob
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name, ref_count=0).first()
+            if blob is None or (unchanged_since is not None and blob.updated_at >= unchanged_since):
+                return False
+            # Savers check for the file with the row locked and rewrite it if
+            # it is gone, so removing it before the commit is safe
+            blob.delete()
+            self.delete_file(name)
+        return True
+
+
+def referencing_fields():
+    """Every (model, file field) whose storage is content addressed"""
+    from django.apps import apps
+    from django.db.models import FileField
+    fields = []
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage):
+                fields.append((model, field))
+    return fields
@@ -0,0 +1,105 @@
+import io
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Family, User
+from budgets.models import Category
+from expenses.models import Expense
+from .models import Blob
+
+
+class BlobStorageTests(TestCase):
+    """Reference counting, file lifetime and releasing replaced files"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def refs(self, name):
+        return Blob.objects.filter(name=name).values_list('ref_count', flat=True).first()
+
+    def expense(self, content):
+        return Expense.objects.create(
+            title='Shop', amount=Decimal('10'), category=self.category, family=self.family, paid_by=self.user,
+            date=date(2024, 1, 1), receipt_image=SimpleUploadedFile('receipt.png', content)
+        )
+
+    def test_same_content_is_stored_once(self):
+        first = default_storage.save('receipts/a.txt', ContentFile(b'same'))
+        second = default_storage.save('receipts/b.txt', ContentFile(b'same'))
+        self.assertEqual(first, second)
+        self.assertEqual(self.refs(first), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            default_storage.delete(first)
+        self.assertEqual(self.refs(first), 1)
+        self.assertTrue(default_storage.exists(first))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            default_storage.delete(first)
+        self.assertIsNone(self.refs(first))
+        self.assertFalse(default_storage.exists(first))
+
+    def test_reference_added_before_the_purge_keeps_the_file(self):
+        name = default_storage.save('receipts/a.txt', ContentFile(b'content'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            default_storage.delete(name)
+        self.assertEqual(default_storage.save('receipts/b.txt', ContentFile(b'content')), name)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.refs(name), 1)
+        self.assertTrue(default_storage.exists(name))
+
+        # A file lost while its row survived is written again by the next save
+        default_storage.delete_file(name)
+        default_storage.save('receipts/c.txt', ContentFile(b'content'))
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(self.refs(name), 2)
+
+    def test_replacing_and_deleting_model_files_release_them(self):
+        expense = self.expense(b'first')
+        old_name = expense.receipt_image.name
+        self.assertEqual(self.refs(old_name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.receipt_image = SimpleUploadedFile('receipt.png', b'second')
+            expense.save()
+        new_name = expense.receipt_image.name
+        self.assertIsNone(self.refs(old_name))
+        self.assertFalse(default_storage.exists(old_name))
+
+        # Saving again without changing the file keeps its reference
+        Expense.objects.get(pk=expense.pk).save()
+        self.assertEqual(self.refs(new_name), 1)
+
+        # Deferred file fields are left to gc_blobs instead of failing the delete
+        Expense.objects.only('id', 'family_id', 'category_id', 'date', 'title', 'tags').get(pk=expense.pk).delete()
+        self.assertEqual(self.refs(new_name), 1)
+
+    def test_gc_blobs_removes_unreferenced_blobs(self):
+        kept = self.expense(b'kept').receipt_image.name
+        orphan = default_storage.save('receipts/orphan.txt', ContentFile(b'orphan'))
+        Blob.objects.update(ref_count=5, updated_at=timezone.now() - timedelta(days=2))
+        call_command('gc_blobs', stdout=io.StringIO())
+        self.assertEqual(self.refs(kept), 1)
+        self.assertIsNone(self.refs(orphan))
+        self.assertFalse(default_storage.exists(orphan))
+
@@ -1,13 +1,13 @@
 from django.contrib import admin
-from .models import Category, Budget
+from .models import Category, Budget, BudgetAlert
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'family', 'color', 'created_by', 'created_at')
-    list_filter = ('family', 'created_at')
+    list_display = ('name', 'family', 'parent', 'level', 'color', 'created_by', 'created_at')
+    list_filter = ('family', 'level', 'created_at')
     search_fields = ('name', 'description', 'family__name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('level', 'created_at', 'updated_at')
 
 
 @admin.register(Budget)
@@ -32,4 +32,12 @@ class BudgetAdmin(admin.ModelAdmin):
             'fields': ('created_by', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(BudgetAlert)
+class BudgetAlertAdmin(admin.ModelAdmin):
+    list_display = ('budget', 'family', 'threshold', 'spent_amount', 'budget_amount', 'is_read', 'created_at')
+    list_filter = ('threshold', 'is_read', 'created_at')
+    search_fields = ('budget__name', 'family__name')
+    readonly_fields = ('created_at',)
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Budget, BudgetAlert
+from .tree import ancestors
+
+# Percentages of a budget's amount that raise an alert when crossed
+THRESHOLDS = tuple(sorted(getattr(settings, 'BUDGET_ALERT_THRESHOLDS', (80, 100))))
+
+# Sent with ``alerts`` after new BudgetAlert rows are bulk created
+alerts_raised = Signal()
+
+
+def alert_level(spent, amount):
+    """Highest threshold reached by ``spent`` out of ``amount``"""
+    if amount <= 0:
+        return 0
+    percentage = spent * 100 / amount
+    level = 0
+    for threshold in THRESHOLDS:
+        if percentage >= threshold:
+            level = threshold
+    return level
+
+
+def evaluate_alerts(windows, expense=None):
+    """
+    Re-evaluate the alert level of active budgets containing ``windows``,
+    on the expense's category or any category above it.
+
+    ``windows`` is an iterable of (family_id, category_id, date) tuples for
+    the old and new version of a written expense. Only those budgets are
+    loaded, each with its spend annotated in the same query, so the cost is
+    proportional to the number of affected budgets. Crossing upwards records
+    one ``BudgetAlert`` per threshold passed; dropping back below lowers the
+    stored level so a later crossing alerts again.
+    """
+    condition = Q()
+    for family_id, category_id, date in set(windows):
+        condition |= Q(
+            family_id=family_id,
+            category_id__in=ancestors(category_id),
+            start_date__lte=date,
+            end_date__gte=date
+        )
+    if not condition:
+        return []
+
+    alerts = []
+    changed = []
+    now = timezone.now()
+    for budget in Budget.objects.filter(condition, is_active=True).with_spent():
+        level = alert_level(budget.spent, budget.amount)
+        if level == budget.alert_level:
+            continue
+        for threshold in THRESHOLDS:
+            if budget.alert_level < threshold <= level:
+                alerts.append(BudgetAlert(
+                    budget=budget,
+                    family_id=budget.family_id,
+                    expense_id=expense.pk if expense is not None and expense.pk else None,
+                    threshold=threshold,
+                    spent_amount=budget.spent,
+                    budget_amount=budget.amount,
+                ))
+        budget.alert_level = level
+        # Bumped so delta sync picks up the new level
+        budget.updated_at = now
+        changed.append(budget)
+
+    if changed:
+        Budget.objects.bulk_update(changed, ['alert_level', 'updated_at'])
+    if alerts:
+        BudgetAlert.objects.bulk_create(alerts)
+        alerts_raised.send(sender=BudgetAlert, alerts=alerts)
+    return alerts
@@ -0,0 +1,23 @@
+import django_filters
+
+from .models import Budget
+
+
+class BudgetFilter(django_filters.FilterSet):
+    """
+    Exact filters plus amount ranges and date windows: ``start_date`` and
+    ``end_date`` keep budgets overlapping the window, ``active_on`` those
+    whose period contains the date.
+    """
+    start_date = django_filters.DateFilter(field_name='end_date', lookup_expr='gte')
+    end_date = django_filters.DateFilter(field_name='start_date', lookup_expr='lte')
+    active_on = django_filters.DateFilter(method='filter_active_on')
+    min_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+
+    class Meta:
+        model = Budget
+        fields = ['family', 'category', 'period', 'is_active']
+
+    def filter_active_on(self, queryset, name, value):
+        return queryset.filter(start_date__lte=value, end_date__gte=value)
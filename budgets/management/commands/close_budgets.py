@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from budgets.snapshots import close_budgets
+
+
+class Command(BaseCommand):
+    help = 'Store the finalized spend of budgets whose period has ended'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date', help='Treat this date (YYYY-MM-DD) as today'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of budgets closed per UPDATE'
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if not today:
+                raise CommandError('--date must use the YYYY-MM-DD format')
+
+        closed = close_budgets(today=today, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Closed {closed} budget(s)'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from budgets.rollover import rollover_budgets
+
+
+class Command(BaseCommand):
+    help = 'Create the next period for every active budget whose period has ended'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--carry-over', action='store_true',
+            help='Add the unspent amount of the ended period to the new budget'
+        )
+        parser.add_argument(
+            '--date', help='Treat this date (YYYY-MM-DD) as today'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of budgets processed per bulk insert'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many budgets are due'
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if not today:
+                raise CommandError('--date must use the YYYY-MM-DD format')
+
+        stats = rollover_budgets(
+            today=today,
+            carry_over=options['carry_over'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f"{stats['created']} budget(s) due for rollover")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']} budget(s), linked {stats['adopted']} existing budget(s) "
+            f"in {stats['passes']} pass(es)"
+        ))
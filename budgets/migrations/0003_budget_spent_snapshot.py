@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0002_budget_rollover'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='snapshot_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='budget',
+            name='spent_snapshot',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_currency'),
+        ('expenses', '0003_remove_expense_currency_and_more'),
+        ('budgets', '0003_budget_spent_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='alert_level',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BudgetAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('threshold', models.PositiveSmallIntegerField()),
+                ('spent_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('budget_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='budgets.budget')),
+                ('expense', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='budget_alerts', to='expenses.expense')),
+                ('family', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_alerts', to='accounts.family')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['family', '-created_at'], name='budget_alert_family_idx')],
+            },
+        ),
+    ]
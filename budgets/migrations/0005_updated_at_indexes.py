@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0004_budget_alerts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['family', 'updated_at'], name='budget_family_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['family', 'updated_at'], name='category_family_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0005_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['family', 'end_date', 'start_date'], name='budget_family_active_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_existing_categories(apps, schema_editor):
+    # Every existing category is top-level: it is only its own ancestor
+    Category = apps.get_model('budgets', 'Category')
+    CategoryClosure = apps.get_model('budgets', 'CategoryClosure')
+    CategoryClosure.objects.bulk_create(
+        (CategoryClosure(ancestor_id=pk, descendant_id=pk, depth=0)
+         for pk in Category.objects.values_list('id', flat=True).iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0006_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='level',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='budgets.category'),
+        ),
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='budgets.category')),
+                ('descendant', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='budgets.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'ancestor', 'depth'], name='category_closure_desc_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(link_existing_categories, migrations.RunPython.noop),
+    ]
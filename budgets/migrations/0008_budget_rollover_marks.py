@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:08
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_rolled_over_budgets(apps, schema_editor):
+    Budget = apps.get_model('budgets', 'Budget')
+    Budget.objects.filter(rolled_over_to__isnull=False).update(rolled_over_at=F('updated_at'))
+
+    # Budgets created by rollover count their periods from the start of their chain
+    links = {pk: (source_id, start_date) for pk, source_id, start_date in Budget.objects.values_list(
+        'id', 'rolled_over_from_id', 'start_date'
+    ).iterator()}
+    anchors = {}
+    for pk, (source_id, _) in links.items():
+        if source_id is None:
+            continue
+        root = pk
+        seen = set()
+        while links[root][0] is not None and root not in seen:
+            seen.add(root)
+            root = links[root][0]
+        anchors.setdefault(links[root][1], []).append(pk)
+    for anchor_date, ids in anchors.items():
+        for offset in range(0, len(ids), 500):
+            Budget.objects.filter(id__in=ids[offset:offset + 500]).update(anchor_date=anchor_date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0007_category_tree'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='anchor_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='budget',
+            name='rolled_over_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_rolled_over_budgets, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,23 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from accounts.models import Family
 
 User = get_user_model()
 
 
+class CategoryQuerySet(models.QuerySet):
+    def with_expense_count(self):
+        """Annotate each category with the number of its own expenses as ``expense_count``"""
+        from expenses.models import Expense
+        count = Expense.objects.filter(category=OuterRef('pk')).order_by().values('category').annotate(
+            count=Count('id')
+        ).values('count')
+        return self.annotate(expense_count=Coalesce(Subquery(count), 0))
+
+
 class Category(models.Model):
     """Expense categories for better organization"""
     name = models.CharField(max_length=100)
@@ -12,17 +25,103 @@ class Category(models.Model):
     color = models.CharField(max_length=7, default='#3B82F6')  # Hex color code
     icon = models.CharField(max_length=50, blank=True, null=True)  # Icon name for UI
     family = models.ForeignKey(Family, on_delete=models.CASCADE, related_name='categories')
+    # Subcategories are deleted with their parent, like its expenses (see budgets.tree)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='children')
+    level = models.PositiveSmallIntegerField(default=0, editable=False)  # 0 for top-level categories
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         unique_together = ['name', 'family']
         verbose_name_plural = 'Categories'
+        indexes = [
+            models.Index(fields=['family', 'updated_at'], name='category_family_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.family.name})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'parent_id' in field_names:
+            instance._loaded_parent_id = values[field_names.index('parent_id')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        from . import tree
+        adding = self._state.adding
+        old_parent_id = getattr(self, '_loaded_parent_id', self.parent_id)
+        moved = not adding and old_parent_id != self.parent_id
+        old_level = self.level
+        if adding or moved:
+            self.level = self.parent.level + 1 if self.parent_id is not None else 0
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                tree.insert(self)
+            elif moved:
+                tree.move(self, old_level)
+                tree.refresh_budgets(self, old_parent_id)
+        self._loaded_parent_id = self.parent_id
+
+
+class CategoryClosure(models.Model):
+    """One (ancestor, descendant) pair of the category tree, see budgets.tree"""
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links', db_index=False)
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links', db_index=False)
+    depth = models.PositiveSmallIntegerField()  # 0 links a category to itself
+
+    class Meta:
+        # Subtree lookups; the index below serves ancestor lookups
+        unique_together = ['ancestor', 'descendant']
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor', 'depth'], name='category_closure_desc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
+
+SPENT_FIELD = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def spent_subquery():
+    """
+    Sum of expenses in the outer budget's family, category subtree and
+    window, archived ones included through their daily rollups
+    """
+    from expenses.models import Expense, ExpenseRollup
+    from .tree import descendants
+
+    def total(model, field):
+        rows = model.objects.filter(
+            category_id__in=descendants(OuterRef(OuterRef('category'))),
+            family=OuterRef('family'),
+            date__gte=OuterRef('start_date'),
+            date__lte=OuterRef('end_date')
+        ).order_by().values('family').annotate(total=Sum(field)).values('total')
+        return Coalesce(Subquery(rows, output_field=SPENT_FIELD), Decimal('0'), output_field=SPENT_FIELD)
+    return ExpressionWrapper(total(Expense, 'amount') + total(ExpenseRollup, 'total'), output_field=SPENT_FIELD)
+
+
+class BudgetQuerySet(models.QuerySet):
+    def with_spent(self):
+        """
+        Annotate each budget with its spent amount as ``spent`` in one query.
+
+        Closed budgets read their stored snapshot; only budgets without one
+        run the expense aggregate.
+        """
+        return self.annotate(spent=Case(
+            When(spent_snapshot__isnull=False, then=F('spent_snapshot')),
+            default=spent_subquery(),
+            output_field=SPENT_FIELD
+        ))
+
 
 class Budget(models.Model):
     """Budget model for tracking monthly/yearly budgets"""
@@ -43,20 +142,79 @@ class Budget(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    rolled_over_from = models.OneToOneField(
+        'self', on_delete=models.SET_NULL, blank=True, null=True, related_name='rolled_over_to'
+    )
+    carried_over_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Set once the next period exists, whether this budget created it, was
+    # linked to it or duplicated a budget that already rolled over
+    rolled_over_at = models.DateTimeField(blank=True, null=True)
+    # First day of the period a rollover chain started from; later periods
+    # begin on the same day of the month (see budgets.rollover)
+    anchor_date = models.DateField(blank=True, null=True)
+    # Finalized spend written once the period has ended (see budgets.snapshots)
+    spent_snapshot = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    snapshot_at = models.DateTimeField(blank=True, null=True)
+    # Highest alert threshold (percent) currently crossed, see budgets.alerts
+    alert_level = models.PositiveSmallIntegerField(default=0)
+
+    objects = BudgetQuerySet.as_manager()
+
+    WINDOW_FIELDS = ('family_id', 'category_id', 'start_date', 'end_date')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['family', 'updated_at'], name='budget_family_updated_idx'),
+            # Active budgets whose window reaches a date
+            models.Index(
+                fields=['family', 'end_date', 'start_date'], condition=Q(is_active=True),
+                name='budget_family_active_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.category.name} ({self.amount})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded and any(
+            field in loaded and loaded[field] != getattr(self, field)
+            for field in self.WINDOW_FIELDS
+        ):
+            # The stored spend no longer matches the budget window
+            self.spent_snapshot = None
+            self.snapshot_at = None
+            self.__dict__.pop('spent', None)
+        super().save(*args, **kwargs)
+        self._loaded_values = {field: getattr(self, field) for field in self.WINDOW_FIELDS}
+
     @property
     def spent_amount(self):
         """Calculate total spent amount for this budget"""
-        from expenses.models import Expense
-        return Expense.objects.filter(
-            category=self.category,
-            family=self.family,
+        if 'spent' in self.__dict__:
+            return self.spent
+        if self.spent_snapshot is not None:
+            return self.spent_snapshot
+        return self.calculate_spent()
+
+    def calculate_spent(self):
+        """Sum the expenses of this budget's category subtree inside its window, archived ones included"""
+        from expenses.models import Expense, ExpenseRollup
+        from .tree import descendants
+        window = dict(
+            category_id__in=descendants(self.category_id),
+            family_id=self.family_id,
             date__gte=self.start_date,
             date__lte=self.end_date
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        )
+        hot = Expense.objects.filter(**window).aggregate(total=models.Sum('amount'))['total'] or 0
+        return hot + (ExpenseRollup.objects.filter(**window).aggregate(total=models.Sum('total'))['total'] or 0)
 
     @property
     def remaining_amount(self):
@@ -68,4 +226,28 @@ class Budget(models.Model):
         """Calculate percentage of budget spent"""
         if self.amount == 0:
             return 0
-        return (self.spent_amount / self.amount) * 100
\ No newline at end of file
+        return (self.spent_amount / self.amount) * 100
+
+
+class BudgetAlert(models.Model):
+    """Event recorded when a budget's spend crosses an alert threshold"""
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='alerts')
+    family = models.ForeignKey(Family, on_delete=models.CASCADE, related_name='budget_alerts')
+    expense = models.ForeignKey(
+        'expenses.Expense', on_delete=models.SET_NULL, blank=True, null=True, related_name='budget_alerts'
+    )
+    threshold = models.PositiveSmallIntegerField()  # Percent of the budget amount
+    spent_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    budget_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Shared by the family: the first member to read an alert marks it read for everyone
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['family', '-created_at'], name='budget_alert_family_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.budget.name} crossed {self.threshold}% ({self.spent_amount}/{self.budget_amount})"
@@ -0,0 +1,158 @@
+import calendar
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Budget
+
+PERIOD_MONTHS = {
+    'monthly': 1,
+    'yearly': 12,
+}
+
+
+def add_months(value, months):
+    """Add ``months`` to a date, clamping the day to the end of the month"""
+    year, month = divmod(value.month - 1 + months, 12)
+    year += value.year
+    day = min(value.day, calendar.monthrange(year, month + 1)[1])
+    return date(year, month + 1, day)
+
+
+def anchor(budget):
+    """Start of the period ``budget``'s rollover chain is counted from"""
+    return budget.anchor_date or budget.start_date
+
+
+def next_period(budget):
+    """
+    Return the (start_date, end_date) of the period following ``budget``.
+
+    Periods end the day before the next whole number of periods after the
+    chain's anchor, so a chain starting on the 31st ends on the 30th (or the
+    day before a clamped month end) without drifting to earlier days.
+    """
+    months = PERIOD_MONTHS.get(budget.period, 1)
+    first = anchor(budget)
+    start_date = budget.end_date + timedelta(days=1)
+    n = ((start_date.year - first.year) * 12 + start_date.month - first.month) // months
+    while add_months(first, n * months) <= start_date:
+        n += 1
+    return start_date, add_months(first, n * months) - timedelta(days=1)
+
+
+def due_budgets(today=None):
+    """Active budgets whose period has ended and have not been rolled over yet"""
+    today = today or timezone.now().date()
+    return Budget.objects.filter(
+        is_active=True,
+        end_date__lt=today,
+        rolled_over_at__isnull=True
+    )
+
+
+def _rollover_batch(sources, carry_over):
+    starts = set()
+    category_ids = set()
+    planned = {}
+    for source in sources:
+        start_date, end_date = next_period(source)
+        key = (source.family_id, source.category_id, source.period, start_date)
+        # Sources duplicating another one in the batch only get marked
+        if key in planned:
+            continue
+        planned[key] = (source, start_date, end_date)
+        starts.add(start_date)
+        category_ids.add(source.category_id)
+
+    # A next-period budget that already exists (created by hand, or rolled
+    # over from a duplicate of this source) is linked or left alone instead
+    # of duplicated
+    existing = {}
+    for budget in Budget.objects.filter(
+        category_id__in=category_ids,
+        start_date__in=starts
+    ).only('id', 'family_id', 'category_id', 'period', 'start_date', 'rolled_over_from'):
+        key = (budget.family_id, budget.category_id, budget.period, budget.start_date)
+        # Prefer a budget that is still free to link
+        if key not in existing or existing[key].rolled_over_from_id is not None:
+            existing[key] = budget
+
+    now = timezone.now()
+    new_budgets = []
+    adopted = []
+    for key, (source, start_date, end_date) in planned.items():
+        if key in existing:
+            match = existing[key]
+            if match.rolled_over_from_id is None:
+                match.rolled_over_from_id = source.id
+                match.updated_at = now
+                adopted.append(match)
+            continue
+
+        base_amount = source.amount - source.carried_over_amount
+        carried = Decimal('0')
+        if carry_over:
+            carried = max(source.amount - source.spent, Decimal('0'))
+        new_budgets.append(Budget(
+            name=source.name,
+            description=source.description,
+            family_id=source.family_id,
+            category_id=source.category_id,
+            amount=base_amount + carried,
+            period=source.period,
+            start_date=start_date,
+            end_date=end_date,
+            created_by_id=source.created_by_id,
+            is_active=True,
+            rolled_over_from_id=source.id,
+            carried_over_amount=carried,
+            anchor_date=anchor(source),
+        ))
+
+    with transaction.atomic():
+        # The unique rolled_over_from column makes concurrent runs harmless
+        Budget.objects.bulk_create(new_budgets, ignore_conflicts=True)
+        if adopted:
+            Budget.objects.bulk_update(adopted, ['rolled_over_from', 'updated_at'])
+        Budget.objects.filter(id__in=[source.id for source in sources]).update(rolled_over_at=now, updated_at=now)
+    return len(new_budgets), len(adopted)
+
+
+def rollover_budgets(today=None, carry_over=False, batch_size=1000, dry_run=False):
+    """
+    Create the next period's budget for every ended, active budget.
+
+    Budgets are processed in id-ordered batches with one query for the
+    candidates (spend annotated), one for already existing next-period budgets
+    and one bulk insert per batch. Passes repeat until nothing new is due, so
+    budgets that fell several periods behind catch up in a single run.
+    """
+    today = today or timezone.now().date()
+    stats = {'created': 0, 'adopted': 0, 'passes': 0}
+
+    while True:
+        stats['passes'] += 1
+        created_this_pass = 0
+        last_id = 0
+        while True:
+            queryset = due_budgets(today).filter(id__gt=last_id).order_by('id')
+            if carry_over:
+                queryset = queryset.with_spent()
+            batch = list(queryset[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            if dry_run:
+                stats['created'] += len(batch)
+                continue
+            created, adopted = _rollover_batch(batch, carry_over)
+            created_this_pass += created + adopted
+            stats['created'] += created
+            stats['adopted'] += adopted
+        if dry_run or not created_this_pass:
+            break
+
+    return stats
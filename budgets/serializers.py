@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import Category, Budget
+from .models import Category, Budget, BudgetAlert
+from . import tree
 from accounts.models import Family
+from family_budget.fieldsets import SparseFieldsetSerializerMixin
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -9,14 +11,43 @@ class CategorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Category
-        fields = ('id', 'name', 'description', 'color', 'icon', 'family', 'created_by', 'expense_count', 'created_at', 'updated_at')
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        fields = (
+            'id', 'name', 'description', 'color', 'icon', 'family', 'parent', 'level',
+            'created_by', 'expense_count', 'created_at', 'updated_at'
+        )
+        read_only_fields = ('id', 'level', 'created_at', 'updated_at')
 
     def get_expense_count(self, obj):
-        return obj.expenses.count()
+        # Annotated by the list views (Category.objects.with_expense_count())
+        count = getattr(obj, 'expense_count', None)
+        return obj.expenses.count() if count is None else count
+
+    def validate(self, attrs):
+        parent = attrs.get('parent', getattr(self.instance, 'parent', None))
+        family = attrs.get('family', getattr(self.instance, 'family', None))
+        if parent is None:
+            return attrs
+        if parent.family_id != family.pk:
+            raise serializers.ValidationError({'parent': 'The parent category must belong to the same family.'})
+        height = 0
+        if self.instance is not None:
+            if tree.descendants(self.instance.pk).filter(descendant_id=parent.pk).exists():
+                raise serializers.ValidationError({'parent': 'A category cannot be moved below itself.'})
+            height = tree.subtree_height(self.instance)
+        if parent.level + 1 + height > tree.MAX_DEPTH:
+            raise serializers.ValidationError(
+                {'parent': f'Categories can be nested at most {tree.MAX_DEPTH} levels deep.'}
+            )
+        return attrs
 
 
-class BudgetSerializer(serializers.ModelSerializer):
+def row_spent_percentage(row):
+    if row['amount'] == 0:
+        return 0
+    return (row['spent'] / row['amount']) * 100
+
+
+class BudgetSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     created_by = serializers.StringRelatedField(read_only=True)
     category = CategorySerializer(read_only=True)
     category_id = serializers.IntegerField(write_only=True)
@@ -30,9 +61,20 @@ class BudgetSerializer(serializers.ModelSerializer):
             'id', 'name', 'description', 'family', 'category', 'category_id',
             'amount', 'period', 'start_date', 'end_date', 'is_active',
             'created_by', 'spent_amount', 'remaining_amount', 'spent_percentage',
-            'created_at', 'updated_at'
+            'rolled_over_from', 'carried_over_amount', 'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'rolled_over_from', 'carried_over_amount', 'created_at', 'updated_at')
+
+    # Builders for the values() list path; ``spent`` comes from with_spent()
+    values_fields = {
+        'created_by': (
+            ('created_by__first_name', 'created_by__last_name', 'created_by__email'),
+            lambda row: f"{row['created_by__first_name']} {row['created_by__last_name']} ({row['created_by__email']})"
+        ),
+        'spent_amount': (('spent',), lambda row: row['spent']),
+        'remaining_amount': (('amount', 'spent'), lambda row: row['amount'] - row['spent']),
+        'spent_percentage': (('amount', 'spent'), row_spent_percentage),
+    }
 
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
@@ -48,3 +90,17 @@ class BudgetCreateSerializer(serializers.ModelSerializer):
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
 
+
+class BudgetAlertSerializer(serializers.ModelSerializer):
+    budget_name = serializers.CharField(source='budget.name', read_only=True)
+
+    class Meta:
+        model = BudgetAlert
+        fields = (
+            'id', 'budget', 'budget_name', 'family', 'expense', 'threshold',
+            'spent_amount', 'budget_amount', 'is_read', 'created_at'
+        )
+        read_only_fields = (
+            'id', 'budget', 'budget_name', 'family', 'expense', 'threshold',
+            'spent_amount', 'budget_amount', 'created_at'
+        )
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from expenses.imports import bulk_created
+from family_budget.deletion import bulk_deleted
+from .alerts import evaluate_alerts
+from .snapshots import refresh_snapshots
+
+
+def expense_windows(expense):
+    """(family_id, category_id, date) of an expense before and after the write"""
+    windows = {(expense.family_id, expense.category_id, expense.date)}
+    # Fields deferred when the expense was loaded (``only()``) keep their current value
+    previous = getattr(expense, '_loaded_values', None) or {}
+    windows.add((
+        previous.get('family_id', expense.family_id),
+        previous.get('category_id', expense.category_id),
+        previous.get('date', expense.date),
+    ))
+    return windows
+
+
+@receiver(post_save, sender='expenses.Expense')
+def update_budgets_on_expense_save(sender, instance, **kwargs):
+    windows = expense_windows(instance)
+    refresh_snapshots(windows)
+    evaluate_alerts(windows, expense=instance)
+
+
+@receiver(post_delete, sender='expenses.Expense')
+def update_budgets_on_expense_delete(sender, instance, **kwargs):
+    windows = expense_windows(instance)
+    refresh_snapshots(windows)
+    evaluate_alerts(windows)
+
+
+@receiver(bulk_deleted, sender='expenses.Expense')
+def update_budgets_on_bulk_delete(sender, rows, family_ids=(), archived=False, **kwargs):
+    if archived:
+        # Archived expenses still count through their rollups
+        return
+    refresh_snapshots(
+        (row['family_id'], row['category_id'], row['date'])
+        for row in rows if row['family_id'] not in family_ids
+    )
+
+
+@receiver(bulk_created, sender='expenses.Expense')
+def update_budgets_on_bulk_create(sender, instances, **kwargs):
+    windows = {(expense.family_id, expense.category_id, expense.date) for expense in instances}
+    refresh_snapshots(windows)
+    evaluate_alerts(windows)
@@ -0,0 +1,58 @@
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Budget, spent_subquery
+from .tree import ancestors
+
+
+def close_budgets(today=None, batch_size=1000, family_id=None):
+    """
+    Store the finalized spend of every ended budget that has no snapshot yet
+    (only ``family_id``'s budgets when given).
+
+    Each batch is a single UPDATE that evaluates the spend subquery per row,
+    so no expenses are loaded into Python.
+    """
+    today = today or timezone.now().date()
+    closed = 0
+    while True:
+        budgets = Budget.objects.filter(end_date__lt=today, spent_snapshot__isnull=True)
+        if family_id is not None:
+            budgets = budgets.filter(family_id=family_id)
+        ids = list(budgets.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        now = timezone.now()
+        closed += Budget.objects.filter(id__in=ids).update(
+            spent_snapshot=spent_subquery(),
+            snapshot_at=now,
+            updated_at=now
+        )
+    return closed
+
+
+def refresh_snapshots(windows):
+    """
+    Recompute snapshots of closed budgets containing any of ``windows``,
+    on the expense's category or any category above it.
+
+    ``windows`` is an iterable of (family_id, category_id, date) tuples, one
+    per expense version that changed. Open budgets are skipped because they
+    are always computed live.
+    """
+    condition = Q()
+    for family_id, category_id, date in set(windows):
+        condition |= Q(
+            family_id=family_id,
+            category_id__in=ancestors(category_id),
+            start_date__lte=date,
+            end_date__gte=date
+        )
+    if not condition:
+        return 0
+    now = timezone.now()
+    return Budget.objects.filter(condition, spent_snapshot__isnull=False).update(
+        spent_snapshot=spent_subquery(),
+        snapshot_at=now,
+        updated_at=now
+    )
@@ -0,0 +1,14 @@
+from jobs.queue import task
+
+from .rollover import rollover_budgets
+from .snapshots import close_budgets
+
+
+@task('budgets.rollover')
+def rollover_budgets_task(job, carry_over=False):
+    return rollover_budgets(carry_over=carry_over)
+
+
+@task('budgets.close')
+def close_budgets_task(job):
+    return {'closed': close_budgets()}
@@ -1,3 +1,392 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from accounts.models import Family, FamilyMember, User
+from expenses.models import Expense
+from . import rollover, snapshots, tree
+from .models import Budget, BudgetAlert, Category, CategoryClosure
+from .serializers import BudgetSerializer
+
+
+class RolloverTests(TestCase):
+    """Next periods are created once per family, category and period, counted from the chain's anchor"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+
+    def budget(self, start_date, end_date, **kwargs):
+        return Budget.objects.create(
+            name='Food', family=self.family, category=self.category, amount=Decimal('100'),
+            start_date=start_date, end_date=end_date, created_by=self.user, **kwargs
+        )
+
+    def test_duplicate_sources_roll_over_once(self):
+        first = self.budget(date(2024, 1, 1), date(2024, 1, 31))
+        second = self.budget(date(2024, 1, 1), date(2024, 1, 31))
+        stats = rollover.rollover_budgets(today=date(2024, 2, 10))
+        self.assertEqual((stats['created'], stats['adopted']), (1, 0))
+        self.assertFalse(rollover.due_budgets(date(2024, 2, 10)).exists())
+
+        # A duplicate appearing after its twin rolled over is not rolled over again
+        late = self.budget(date(2024, 1, 1), date(2024, 1, 31))
+        self.assertEqual(rollover.rollover_budgets(today=date(2024, 2, 10))['created'], 0)
+        self.assertEqual(Budget.objects.filter(start_date=date(2024, 2, 1)).count(), 1)
+        self.assertEqual(
+            set(Budget.objects.filter(rolled_over_at__isnull=False).values_list('id', flat=True)),
+            {first.pk, second.pk, late.pk}
+        )
+
+    def test_budget_created_by_hand_is_adopted(self):
+        source = self.budget(date(2024, 1, 1), date(2024, 1, 31))
+        manual = self.budget(date(2024, 2, 1), date(2024, 2, 29))
+        stats = rollover.rollover_budgets(today=date(2024, 2, 10))
+        self.assertEqual((stats['created'], stats['adopted']), (0, 1))
+        manual.refresh_from_db()
+        self.assertEqual(manual.rolled_over_from_id, source.pk)
+
+    def test_periods_keep_the_anchor_day(self):
+        self.budget(date(2024, 1, 31), date(2024, 2, 28))
+        rollover.rollover_budgets(today=date(2024, 6, 15))
+        self.assertEqual(
+            list(Budget.objects.order_by('start_date').values_list('start_date', 'end_date')),
+            [
+                (date(2024, 1, 31), date(2024, 2, 28)), (date(2024, 2, 29), date(2024, 3, 30)),
+                (date(2024, 3, 31), date(2024, 4, 29)), (date(2024, 4, 30), date(2024, 5, 30)),
+                (date(2024, 5, 31), date(2024, 6, 29)),
+            ]
+        )
+
+    def test_carry_over_adds_the_unspent_amount(self):
+        self.budget(date(2024, 1, 1), date(2024, 1, 31))
+        Expense.objects.create(
+            title='Shop', amount=Decimal('30'), category=self.category, family=self.family,
+            paid_by=self.user, date=date(2024, 1, 5)
+        )
+        rollover.rollover_budgets(today=date(2024, 2, 10), carry_over=True)
+        successor = Budget.objects.get(start_date=date(2024, 2, 1))
+        self.assertEqual((successor.amount, successor.carried_over_amount), (Decimal('170'), Decimal('70')))
+
+
+class SnapshotTests(TestCase):
+    """Closed budgets keep a stored spend that expense writes refresh"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+
+    def setUp(self):
+        self.january, self.february = (
+            Budget.objects.create(
+                name='Food', family=self.family, category=self.category, amount=Decimal('100'),
+                start_date=start_date, end_date=end_date, created_by=self.user
+            )
+            for start_date, end_date in ((date(2024, 1, 1), date(2024, 1, 31)), (date(2024, 2, 1), date(2024, 2, 29)))
+        )
+        self.expense = Expense.objects.create(
+            title='Shop', amount=Decimal('30'), category=self.category, family=self.family,
+            paid_by=self.user, date=date(2024, 1, 10)
+        )
+        self.assertEqual(snapshots.close_budgets(today=date(2024, 3, 1)), 2)
+
+    def snapshots(self):
+        return list(Budget.objects.order_by('start_date').values_list('spent_snapshot', flat=True))
+
+    def test_close_budgets_stores_the_spend_once(self):
+        self.assertEqual(self.snapshots(), [Decimal('30'), Decimal('0')])
+        self.assertEqual(snapshots.close_budgets(today=date(2024, 3, 1)), 0)
+
+    def test_moving_an_expense_refreshes_both_periods(self):
+        self.expense.date = date(2024, 2, 5)
+        self.expense.save()
+        self.assertEqual(self.snapshots(), [Decimal('0'), Decimal('30')])
+
+        # Loaded without family and category: the old window still comes from the date
+        expense = Expense.objects.only('id', 'date', 'amount').get(pk=self.expense.pk)
+        expense.date = date(2024, 1, 20)
+        expense.save()
+        self.assertEqual(self.snapshots(), [Decimal('30'), Decimal('0')])
+
+        Expense.objects.get(pk=expense.pk).delete()
+        self.assertEqual(self.snapshots(), [Decimal('0'), Decimal('0')])
+
+
+class AlertTests(TestCase):
+    """Threshold crossings raise alerts once and move the budget's stored level"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+
+    def setUp(self):
+        self.budget = Budget.objects.create(
+            name='Food', family=self.family, category=self.category, amount=Decimal('100'),
+            start_date=date(2024, 1, 1), end_date=date(2024, 1, 31), created_by=self.user
+        )
+
+    def expense(self, amount):
+        return Expense.objects.create(
+            title='Shop', amount=Decimal(amount), category=self.category, family=self.family,
+            paid_by=self.user, date=date(2024, 1, 10)
+        )
+
+    def level(self):
+        return Budget.objects.values_list('alert_level', 'updated_at').get(pk=self.budget.pk)
+
+    def test_crossings(self):
+        _, created_at = self.level()
+        large = self.expense('85')
+        level, updated_at = self.level()
+        self.assertEqual(level, 80)
+        self.assertGreater(updated_at, created_at)
+
+        small = self.expense('20')
+        self.assertEqual(self.level()[0], 100)
+        self.assertEqual(list(BudgetAlert.objects.order_by('id').values_list('threshold', flat=True)), [80, 100])
+
+        small.delete()
+        self.assertEqual(self.level()[0], 80)
+        large.delete()
+        self.assertEqual(self.level()[0], 0)
+        self.expense('90')
+        self.assertEqual(list(BudgetAlert.objects.order_by('id').values_list('threshold', flat=True)), [80, 100, 80])
+
+
+class SparseFieldsetTests(TestCase):
+    """The values() list path matches the serializer, and fields trim the budget query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='x', first_name='Ann', last_name='Lee'
+        )
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+        Expense.objects.create(
+            title='Shop', amount=Decimal('30'), category=cls.category, family=cls.family,
+            paid_by=cls.user, date=date(2024, 2, 10)
+        )
+        january = Budget.objects.create(
+            name='Food', family=cls.family, category=cls.category, amount=Decimal('100'),
+            start_date=date(2024, 1, 1), end_date=date(2024, 1, 31), created_by=cls.user
+        )
+        Budget.objects.create(
+            name='Food', family=cls.family, category=cls.category, amount=Decimal('0'), rolled_over_from=january,
+            start_date=date(2024, 2, 1), end_date=date(2024, 2, 29), created_by=cls.user
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_values_path_matches_the_serializer(self):
+        for params in ({'exclude': 'category'}, {'fields': 'id,rolled_over_from,created_by,spent_percentage'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/budgets/budgets/', params)
+                self.assertEqual(response.status_code, 200)
+                expected = BudgetSerializer(
+                    Budget.objects.with_spent().order_by('-created_at'), many=True,
+                    context={'request': Request(response.wsgi_request)}
+                ).data
+                self.assertEqual(response.data['results'], expected)
+        self.assertEqual(
+            {row['rolled_over_from'] for row in response.data['results']}, {None, Budget.objects.earliest('id').pk}
+        )
+
+    def test_only_requested_columns_are_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/budgets/budgets/', {'fields': 'id,name,category'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'category'})
+        select = next(query['sql'] for query in queries if query['sql'].startswith('SELECT DISTINCT'))
+        self.assertIn('"budgets_budget"."category_id"', select)
+        self.assertNotIn('"budgets_budget"."description"', select)
+        self.assertNotIn('SUM', select)
+
+        response = self.client.get('/api/budgets/budgets/', {'fields': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CategoryTreeTests(TestCase):
+    """Closure rows follow the tree, and spend and statistics cover whole subtrees"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+
+    def category(self, name, parent=None):
+        return Category.objects.create(name=name, family=self.family, parent=parent, created_by=self.user)
+
+    def expense(self, category, amount):
+        return Expense.objects.create(
+            title=category.name, amount=Decimal(amount), category=category, family=self.family,
+            paid_by=self.user, date=date(2024, 3, 10)
+        )
+
+    def assertClosureConsistent(self):
+        links = set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        levels = dict(Category.objects.values_list('id', 'level'))
+        tree.rebuild(Category.objects.all())
+        self.assertEqual(set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')), links)
+        self.assertEqual(dict(Category.objects.values_list('id', 'level')), levels)
+
+    def test_budget_on_parent_covers_subtree(self):
+        food = self.category('Food')
+        groceries = self.category('Groceries', food)
+        organic = self.category('Organic', groceries)
+        self.expense(food, '5')
+        self.expense(groceries, '20')
+        self.expense(organic, '7.50')
+        budgets = [
+            Budget.objects.create(
+                name=category.name, family=self.family, category=category, amount=Decimal('100'),
+                start_date=date(2024, 3, 1), end_date=date(2024, 3, 31), created_by=self.user
+            )
+            for category in (food, groceries, organic)
+        ]
+        self.assertEqual(
+            [budget.calculate_spent() for budget in budgets], [Decimal('32.50'), Decimal('27.50'), Decimal('7.50')]
+        )
+        annotated = dict(Budget.objects.with_spent().values_list('category__name', 'spent'))
+        self.assertEqual(
+            annotated, {'Food': Decimal('32.50'), 'Groceries': Decimal('27.50'), 'Organic': Decimal('7.50')}
+        )
+
+    def test_listed_categories_count_their_own_expenses(self):
+        food = self.category('Food')
+        groceries = self.category('Groceries', food)
+        self.expense(groceries, '20')
+        self.expense(groceries, '5')
+        Budget.objects.create(
+            name='Food', family=self.family, category=groceries, amount=Decimal('100'),
+            start_date=date(2024, 3, 1), end_date=date(2024, 3, 31), created_by=self.user
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        categories = client.get('/api/budgets/categories/', {'family': self.family.pk}).data['results']
+        self.assertEqual({row['name']: row['expense_count'] for row in categories}, {'Food': 0, 'Groceries': 2})
+        budgets = client.get('/api/budgets/budgets/', {'family': self.family.pk}).data['results']
+        self.assertEqual(budgets[0]['category']['expense_count'], 2)
+
+    def test_moving_a_subtree_keeps_the_closure_consistent(self):
+        food = self.category('Food')
+        home = self.category('Home')
+        groceries = self.category('Groceries', food)
+        organic = self.category('Organic', groceries)
+        self.category('Garden', home)
+
+        groceries.parent = home
+        groceries.save()
+        organic.refresh_from_db()
+        self.assertEqual(organic.level, 2)
+        self.assertEqual(
+            set(tree.ancestors(organic.pk).values_list('ancestor_id', flat=True)), {organic.pk, groceries.pk, home.pk}
+        )
+        self.assertClosureConsistent()
+
+        groceries.parent = None
+        groceries.save()
+        organic.refresh_from_db()
+        self.assertEqual(organic.level, 1)
+        self.assertClosureConsistent()
+
+        food.delete()
+        home.delete()
+        self.assertEqual(
+            list(Category.objects.values_list('name', flat=True).order_by('name')), ['Groceries', 'Organic']
+        )
+        self.assertClosureConsistent()
+
+    def test_moving_a_subtree_updates_the_budgets_of_both_parents(self):
+        food = self.category('Food')
+        home = self.category('Home')
+        groceries = self.category('Groceries', food)
+        self.expense(self.category('Organic', groceries), '90')
+        closed, active = [
+            Budget.objects.create(
+                name=category.name, family=self.family, category=category, amount=Decimal('100'),
+                start_date=date(2024, 3, 1), end_date=date(2024, 3, 31), created_by=self.user
+            )
+            for category in (food, home)
+        ]
+        snapshots.close_budgets(today=date(2024, 4, 1))
+        Budget.objects.filter(pk=active.pk).update(spent_snapshot=None, snapshot_at=None)
+        closed.refresh_from_db()
+        self.assertEqual(closed.spent_snapshot, Decimal('90'))
+
+        groceries.parent = home
+        groceries.save()
+        closed.refresh_from_db()
+        active.refresh_from_db()
+        self.assertEqual(closed.spent_snapshot, Decimal('0'))
+        self.assertEqual(active.alert_level, 80)
+        self.assertEqual(list(BudgetAlert.objects.values_list('budget_id', 'threshold')), [(active.pk, 80)])
+
+    def test_rebuild_touches_only_changed_levels(self):
+        food = self.category('Food')
+        groceries = self.category('Groceries', food)
+        long_ago = timezone.now() - timedelta(days=1)
+        Category.objects.update(updated_at=long_ago)
+        Category.objects.filter(pk=groceries.pk).update(level=3)
+        tree.rebuild(Category.objects.all())
+        self.assertEqual(dict(Category.objects.values_list('name', 'level')), {'Food': 0, 'Groceries': 1})
+        self.assertEqual(Category.objects.get(pk=food.pk).updated_at, long_ago)
+        self.assertGreater(Category.objects.get(pk=groceries.pk).updated_at, long_ago)
+
+    def test_parent_validation(self):
+        food = self.category('Food')
+        groceries = self.category('Groceries', food)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.patch(f'/api/budgets/categories/{food.pk}/', {'parent': groceries.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+
+        other = Family.objects.create(name='Other', created_by=self.user)
+        foreign = Category.objects.create(name='Foreign', family=other, created_by=self.user)
+        response = client.patch(f'/api/budgets/categories/{groceries.pk}/', {'parent': foreign.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_statistics_roll_up_by_level(self):
+        food = self.category('Food')
+        groceries = self.category('Groceries', food)
+        restaurants = self.category('Restaurants', food)
+        organic = self.category('Organic', groceries)
+        rent = self.category('Rent')
+        self.expense(groceries, '20')
+        self.expense(organic, '10')
+        self.expense(restaurants, '15')
+        self.expense(rent, '500')
+        Expense.objects.update(date=date.today())
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def totals(level):
+            response = client.get('/api/expenses/statistics/', {'category_level': level})
+            return {row['category__name']: row['total'] for row in response.data['expenses_by_category']}
 
-# Create your tests here.
+        self.assertEqual(totals(0), {'Rent': Decimal('500'), 'Food': Decimal('45')})
+        self.assertEqual(totals(1), {'Rent': Decimal('500'), 'Groceries': Decimal('30'), 'Restaurants': Decimal('15')})
+        self.assertEqual(
+            totals(2),
+            {'Rent': Decimal('500'), 'Groceries': Decimal('20'), 'Organic': Decimal('10'), 'Restaurants': Decimal('15')}
+        )
@@ -0,0 +1,158 @@
+"""
+Category tree backed by a closure table.
+
+``CategoryClosure`` holds one row per (ancestor, descendant) pair, including
+each category paired with itself at depth 0. Subtree and ancestor lookups
+are then a single indexed read of the closure table, joined to expenses or
+budgets, whatever the depth of the tree.
+
+The table is maintained by ``Category.save``: a new category copies its
+parent's ancestor rows, and a category whose parent changes has its whole
+subtree detached from the old ancestors and attached under the new ones,
+and the budgets of both sets of ancestors re-evaluated (``refresh_budgets``)
+as the subtree's spend moved from one to the other.
+Deleting a category deletes its subcategories, and their closure rows with
+them. Categories created with ``bulk_create`` are added with ``rebuild``.
+"""
+from django.conf import settings
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+# Deepest level a category may be placed at (top-level categories are 0)
+MAX_DEPTH = getattr(settings, 'CATEGORY_MAX_DEPTH', 4)
+# Budget windows re-evaluated per query after a move
+WINDOW_BATCH = 100
+
+
+def descendants(category):
+    """Closure query of the ids in ``category``'s subtree, itself included"""
+    from .models import CategoryClosure
+    return CategoryClosure.objects.filter(ancestor_id=category).values('descendant_id')
+
+
+def ancestors(category):
+    """Closure query of the ids of ``category`` and every category above it"""
+    from .models import CategoryClosure
+    return CategoryClosure.objects.filter(descendant_id=category).values('ancestor_id')
+
+
+def at_level(queryset, level):
+    """
+    Annotate rows of a queryset with a ``category`` foreign key (expenses,
+    rollups, recurring expenses) with the category they roll up to at
+    ``level``: ``rollup_category_id`` and ``rollup_category_name``.
+
+    Rows in categories above ``level`` roll up to their own category. Each
+    row matches exactly one closure row, so totals are not duplicated.
+    """
+    return queryset.filter(
+        Q(category__ancestor_links__ancestor__level=level)
+        | Q(category__ancestor_links__depth=0, category__level__lt=level)
+    ).annotate(
+        rollup_category_id=F('category__ancestor_links__ancestor_id'),
+        rollup_category_name=F('category__ancestor_links__ancestor__name'),
+    )
+
+
+def insert(category):
+    """Add the closure rows of a new category"""
+    from .models import CategoryClosure
+    links = [CategoryClosure(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+    if category.parent_id is not None:
+        links += [
+            CategoryClosure(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1)
+            for ancestor_id, depth in CategoryClosure.objects.filter(
+                descendant_id=category.parent_id
+            ).values_list('ancestor_id', 'depth')
+        ]
+    CategoryClosure.objects.bulk_create(links)
+
+
+def move(category, old_level):
+    """
+    Re-attach ``category``'s subtree under its current parent.
+
+    Links inside the subtree keep their depth; links from the old ancestors
+    are replaced by links from the new ones, and the levels of the moved
+    descendants shift with their root.
+    """
+    from .models import Category, CategoryClosure
+    subtree = list(CategoryClosure.objects.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth'))
+    ids = [descendant_id for descendant_id, _ in subtree]
+    if category.parent_id in ids:
+        raise ValueError('A category cannot be moved below itself')
+
+    CategoryClosure.objects.filter(descendant_id__in=ids).exclude(ancestor_id__in=ids).delete()
+    if category.parent_id is not None:
+        CategoryClosure.objects.bulk_create([
+            CategoryClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=above + 1 + below)
+            for ancestor_id, above in CategoryClosure.objects.filter(
+                descendant_id=category.parent_id
+            ).values_list('ancestor_id', 'depth')
+            for descendant_id, below in subtree
+        ])
+
+    shift = category.level - old_level
+    if shift:
+        Category.objects.filter(pk__in=ids).exclude(pk=category.pk).update(
+            level=F('level') + shift, updated_at=timezone.now()
+        )
+
+
+def refresh_budgets(category, old_parent_id):
+    """
+    Refresh the snapshots and alert levels of the budgets above ``category``
+    before and after it moved from ``old_parent_id``: one window per date
+    with expenses, or archived rollups, in its subtree on either side.
+    """
+    from expenses.models import Expense, ExpenseRollup
+    from .alerts import evaluate_alerts
+    from .snapshots import refresh_snapshots
+    subtree = descendants(category.pk)
+    days = set()
+    for model in (Expense, ExpenseRollup):
+        days.update(model.objects.filter(category_id__in=subtree).values_list('family_id', 'date').distinct())
+    windows = [
+        (family_id, parent_id, day)
+        for family_id, day in sorted(days)
+        for parent_id in (old_parent_id, category.parent_id) if parent_id is not None
+    ]
+    for start in range(0, len(windows), WINDOW_BATCH):
+        refresh_snapshots(windows[start:start + WINDOW_BATCH])
+        evaluate_alerts(windows[start:start + WINDOW_BATCH])
+
+
+def subtree_height(category):
+    """Number of levels below ``category``"""
+    from .models import CategoryClosure
+    return CategoryClosure.objects.filter(ancestor_id=category.pk).aggregate(height=Max('depth'))['height'] or 0
+
+
+def rebuild(categories):
+    """
+    Recompute the closure rows and levels of ``categories`` (a queryset of
+    whole families' categories), e.g. after ``bulk_create``.
+    """
+    from .models import Category, CategoryClosure
+    rows = list(categories.values_list('id', 'parent_id', 'level'))
+    parents = {category_id: parent_id for category_id, parent_id, _ in rows}
+    links = []
+    levels = {}
+    for category_id in parents:
+        depth, current = 0, category_id
+        while current is not None:
+            links.append(CategoryClosure(ancestor_id=current, descendant_id=category_id, depth=depth))
+            depth, current = depth + 1, parents.get(current)
+        levels[category_id] = depth - 1
+
+    CategoryClosure.objects.filter(descendant_id__in=list(parents)).delete()
+    CategoryClosure.objects.bulk_create(links, batch_size=1000)
+    now = timezone.now()
+    Category.objects.bulk_update(
+        [
+            Category(id=category_id, level=levels[category_id], updated_at=now)
+            for category_id, _, level in rows if levels[category_id] != level
+        ],
+        ['level', 'updated_at'], batch_size=1000
+    )
+    return len(links)
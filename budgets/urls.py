@@ -10,5 +10,8 @@ urlpatterns = [
     path('budgets/', views.BudgetListCreateView.as_view(), name='budget-list-create'),
     path('budgets/<int:pk>/', views.BudgetDetailView.as_view(), name='budget-detail'),
     path('budgets/active/', views.ActiveBudgetListView.as_view(), name='active-budget-list'),
+
+    path('alerts/', views.BudgetAlertListView.as_view(), name='budget-alert-list'),
+    path('alerts/<int:pk>/', views.BudgetAlertDetailView.as_view(), name='budget-alert-detail'),
 ]
 
@@ -1,8 +1,10 @@
 from rest_framework import generics, permissions, filters
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from .models import Category, Budget
-from .serializers import CategorySerializer, BudgetSerializer, BudgetCreateSerializer
+from django.db.models import Prefetch, Q
+from family_budget.fieldsets import SparseFieldsetMixin
+from .filters import BudgetFilter
+from .models import Category, Budget, BudgetAlert
+from .serializers import CategorySerializer, BudgetSerializer, BudgetCreateSerializer, BudgetAlertSerializer
 
 
 class CategoryListCreateView(generics.ListCreateAPIView):
@@ -10,16 +12,16 @@ class CategoryListCreateView(generics.ListCreateAPIView):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['family']
+    filterset_fields = ['family', 'parent', 'level']
     search_fields = ['name', 'description']
-    ordering_fields = ['name', 'created_at']
+    ordering_fields = ['name', 'level', 'created_at']
     ordering = ['name']
 
     def get_queryset(self):
         return Category.objects.filter(
             family__members__user=self.request.user,
             family__members__is_active=True
-        ).distinct()
+        ).distinct().select_related('created_by', 'family').with_expense_count()
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -34,14 +36,32 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Category.objects.filter(
             family__members__user=self.request.user,
             family__members__is_active=True
-        ).distinct()
+        ).distinct().select_related('created_by', 'family').with_expense_count()
 
 
-class BudgetListCreateView(generics.ListCreateAPIView):
+class BudgetQuerysetMixin(SparseFieldsetMixin):
+    """Only join and aggregate what the requested budget fields need"""
+    SPENT_FIELDS = ('spent_amount', 'remaining_amount', 'spent_percentage')
+
+    def trim_budget_queryset(self, queryset):
+        if self.request.method != 'GET' or self.wants(*self.SPENT_FIELDS):
+            queryset = queryset.with_spent()
+        if self.request.method == 'GET':
+            if self.wants('created_by'):
+                queryset = queryset.select_related('created_by')
+            if self.wants('category'):
+                # One query for the categories and their expense counts
+                queryset = queryset.prefetch_related(Prefetch(
+                    'category', queryset=Category.objects.select_related('created_by', 'family').with_expense_count()
+                ))
+        return queryset
+
+
+class BudgetListCreateView(BudgetQuerysetMixin, generics.ListCreateAPIView):
     """List and create budgets"""
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['family', 'category', 'period', 'is_active']
+    filterset_class = BudgetFilter
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'amount', 'start_date', 'end_date', 'created_at']
     ordering = ['-created_at']
@@ -52,25 +72,25 @@ class BudgetListCreateView(generics.ListCreateAPIView):
         return BudgetSerializer
 
     def get_queryset(self):
-        return Budget.objects.filter(
+        return self.trim_budget_queryset(Budget.objects.filter(
             family__members__user=self.request.user,
             family__members__is_active=True
-        ).distinct()
+        ).distinct())
 
 
-class BudgetDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BudgetDetailView(BudgetQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Budget detail, update, and delete"""
     serializer_class = BudgetSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Budget.objects.filter(
+        return self.trim_budget_queryset(Budget.objects.filter(
             family__members__user=self.request.user,
             family__members__is_active=True
-        ).distinct()
+        ).distinct())
 
 
-class ActiveBudgetListView(generics.ListAPIView):
+class ActiveBudgetListView(BudgetQuerysetMixin, generics.ListAPIView):
     """List active budgets for dashboard"""
     serializer_class = BudgetSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -79,10 +99,38 @@ class ActiveBudgetListView(generics.ListAPIView):
         from django.utils import timezone
         today = timezone.now().date()
         
-        return Budget.objects.filter(
+        return self.trim_budget_queryset(Budget.objects.filter(
             family__members__user=self.request.user,
             family__members__is_active=True,
             is_active=True,
             start_date__lte=today,
             end_date__gte=today
-        ).distinct()
\ No newline at end of file
+        ).distinct())
+
+
+class BudgetAlertListView(generics.ListAPIView):
+    """Feed of budget threshold alerts, newest first"""
+    serializer_class = BudgetAlertSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['family', 'budget', 'threshold', 'is_read']
+    ordering_fields = ['created_at', 'threshold']
+    ordering = ['-created_at', '-id']
+
+    def get_queryset(self):
+        return BudgetAlert.objects.filter(
+            family__members__user=self.request.user,
+            family__members__is_active=True
+        ).select_related('budget')
+
+
+class BudgetAlertDetailView(generics.RetrieveUpdateAPIView):
+    """Budget alert detail; used to mark alerts as read for the whole family"""
+    serializer_class = BudgetAlertSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return BudgetAlert.objects.filter(
+            family__members__user=self.request.user,
+            family__members__is_active=True
+        ).select_related('budget')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Expense, RecurringExpense, ExpenseShare
+from .models import CategoryRule, Expense, ExpenseArchive, ExpenseRollup, RecurringExpense, ExpenseShare
 
 
 @admin.register(Expense)
@@ -57,4 +57,29 @@ class ExpenseShareAdmin(admin.ModelAdmin):
     list_display = ('expense', 'user', 'amount', 'is_paid', 'paid_at')
     list_filter = ('is_paid', 'paid_at', 'created_at')
     search_fields = ('expense__title', 'user__first_name', 'user__last_name')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
+
+
+@admin.register(ExpenseArchive)
+class ExpenseArchiveAdmin(admin.ModelAdmin):
+    list_display = ('family', 'year', 'expense_count', 'share_count', 'total_amount', 'updated_at')
+    list_filter = ('year',)
+    search_fields = ('family__name',)
+    readonly_fields = ('segment', 'expense_count', 'share_count', 'total_amount', 'first_date', 'last_date',
+                       'created_at', 'updated_at')
+
+
+@admin.register(ExpenseRollup)
+class ExpenseRollupAdmin(admin.ModelAdmin):
+    list_display = ('family', 'date', 'category', 'paid_by', 'payment_method', 'total', 'count')
+    list_filter = ('payment_method', 'date')
+    search_fields = ('family__name', 'category__name')
+    date_hierarchy = 'date'
+
+
+@admin.register(CategoryRule)
+class CategoryRuleAdmin(admin.ModelAdmin):
+    list_display = ('keyword', 'category', 'family', 'created_by', 'updated_at')
+    list_filter = ('family',)
+    search_fields = ('keyword', 'category__name', 'family__name')
+    readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,384 @@
+"""
+Cold storage for old expenses.
+
+Expenses older than a family's cutoff move, with their shares, out of the
+hot tables into one gzip-compressed JSON segment per family and year
+(``ExpenseArchive``). Daily ``ExpenseRollup`` rows stay behind for trends,
+and budgets covering archived dates are closed first so their spend comes
+from the stored snapshot. Only whole years are archived, and never a year
+that an unfinished budget reaches into.
+
+Reads go through the archive only when a request's date range reaches an
+archived year; see ``read_through``.
+"""
+import gzip
+import json
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
+
+from accounts.models import Family, User
+from budgets.models import Budget, BudgetAlert, Category
+from budgets.rollover import add_months
+from budgets.snapshots import close_budgets
+from family_budget.deletion import bulk_deleted, delete_rows
+from .models import ArchivedReceipt, Expense, ExpenseArchive, ExpenseRollup, ExpenseShare
+
+# Default cutoff for families without archive_after_months; None disables
+ARCHIVE_AFTER_MONTHS = getattr(settings, 'EXPENSE_ARCHIVE_AFTER_MONTHS', None)
+# Statistics look back up to a year, so that much always stays hot
+MIN_ARCHIVE_MONTHS = 12
+BATCH_SIZE = 1000
+FORMAT_VERSION = 1
+
+EXPENSE_FIELDS = [field.attname for field in Expense._meta.concrete_fields]
+SHARE_FIELDS = [field.attname for field in ExpenseShare._meta.concrete_fields]
+RECEIPT_FIELDS = ('receipt_image', 'receipt_preview', 'receipt_thumbnail')
+
+
+def archive_cutoff(family, today=None):
+    """Date before which the family's expenses may be archived, or None"""
+    months = family.archive_after_months or ARCHIVE_AFTER_MONTHS
+    if not months:
+        return None
+    today = today or timezone.now().date()
+    return add_months(today, -max(months, MIN_ARCHIVE_MONTHS))
+
+
+def archive_boundary(family_id, cutoff):
+    """
+    First day that stays hot: January 1st of the cutoff's year, moved back
+    while a budget starting earlier still runs past it.
+    """
+    boundary = date(cutoff.year, 1, 1)
+    while True:
+        earliest = Budget.objects.filter(
+            family_id=family_id,
+            start_date__lt=boundary,
+            end_date__gte=boundary
+        ).aggregate(earliest=Min('start_date'))['earliest']
+        if earliest is None:
+            return boundary
+        boundary = date(earliest.year, 1, 1)
+
+
+def _encode(expenses, shares):
+    payload = json.dumps({
+        'version': FORMAT_VERSION,
+        'expenses': expenses,
+        'shares': shares,
+    }, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return gzip.compress(payload.encode(), compresslevel=9, mtime=0)
+
+
+def _decode_rows(model, rows):
+    fields = [(field.attname, field) for field in model._meta.concrete_fields]
+    return [
+        {attname: field.to_python(row.get(attname)) for attname, field in fields}
+        for row in rows
+    ]
+
+
+@lru_cache(maxsize=32)
+def read_segment(name):
+    """
+    Decoded (expense rows, share rows) of a segment. Segment names change
+    whenever their content does, so the cache never serves stale data.
+    """
+    with default_storage.open(name, 'rb') as segment:
+        payload = json.loads(gzip.decompress(segment.read()))
+    return _decode_rows(Expense, payload['expenses']), _decode_rows(ExpenseShare, payload['shares'])
+
+
+def _rollups(rows):
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    for row in rows:
+        key = (row['date'], row['category_id'], row['paid_by_id'], row['payment_method'])
+        totals[key][0] += row['amount']
+        totals[key][1] += 1
+    return totals
+
+
+def _merge_rollups(family_id, year, rows):
+    totals = _rollups(rows)
+    existing = {
+        (rollup.date, rollup.category_id, rollup.paid_by_id, rollup.payment_method): rollup
+        for rollup in ExpenseRollup.objects.filter(
+            family_id=family_id,
+            date__gte=date(year, 1, 1),
+            date__lte=date(year, 12, 31)
+        )
+    }
+    changed, created = [], []
+    for key, (total, count) in totals.items():
+        rollup = existing.get(key)
+        if rollup is not None:
+            rollup.total += total
+            rollup.count += count
+            changed.append(rollup)
+            continue
+        day, category_id, paid_by_id, payment_method = key
+        created.append(ExpenseRollup(
+            family_id=family_id,
+            date=day,
+            category_id=category_id,
+            paid_by_id=paid_by_id,
+            payment_method=payment_method,
+            total=total,
+            count=count,
+        ))
+    ExpenseRollup.objects.bulk_update(changed, ['total', 'count'], batch_size=BATCH_SIZE)
+    ExpenseRollup.objects.bulk_create(created, batch_size=BATCH_SIZE)
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _delete_hot(rows, batch_size):
+    """
+    Delete archived ``rows`` (dictionaries of every column) without loading
+    them as models. ``bulk_deleted`` is sent with ``archived=True``, so sync
+    and the per-process indexes drop them while their receipt files stay
+    referenced by the archive.
+    """
+    for chunk in _chunks(rows, batch_size):
+        ids = [row['id'] for row in chunk]
+        BudgetAlert.objects.filter(expense_id__in=ids).update(expense=None)
+        delete_rows(ExpenseShare, ExpenseShare.objects.filter(expense_id__in=ids).values_list('pk', flat=True))
+        bulk_deleted.send(sender=Expense, rows=chunk, family_ids=set(), archived=True)
+        delete_rows(Expense, ids)
+
+
+def _archive_year(family_id, year, batch_size):
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    with transaction.atomic():
+        rows = list(Expense.objects.select_for_update().filter(
+            family_id=family_id,
+            date__gte=start,
+            date__lte=end
+        ).order_by().values(*EXPENSE_FIELDS))
+        if not rows:
+            return 0, 0
+        ids = [row['id'] for row in rows]
+        shares = []
+        for chunk in _chunks(ids, batch_size):
+            shares.extend(ExpenseShare.objects.filter(expense_id__in=chunk).order_by().values(*SHARE_FIELDS))
+
+        archive = ExpenseArchive.objects.select_for_update().filter(family_id=family_id, year=year).first()
+        all_rows, all_shares = rows, shares
+        if archive is None:
+            archive = ExpenseArchive(family_id=family_id, year=year)
+        else:
+            # Backdated expenses added after the year was archived; the old
+            # segment is released by blobstore when the archive is saved
+            archived_rows, archived_shares = read_segment(archive.segment.name)
+            all_rows, all_shares = archived_rows + rows, archived_shares + shares
+        all_rows.sort(key=lambda row: (row['date'], row['id']))
+
+        archive.expense_count = len(all_rows)
+        archive.share_count = len(all_shares)
+        archive.total_amount = sum((row['amount'] for row in all_rows), Decimal('0'))
+        archive.first_date = all_rows[0]['date']
+        archive.last_date = all_rows[-1]['date']
+        archive.segment.save(f'{family_id}-{year}.json.gz', ContentFile(_encode(all_rows, all_shares)), save=False)
+        archive.save()
+
+        ArchivedReceipt.objects.bulk_create([
+            ArchivedReceipt(archive=archive, expense_id=row['id'], file=row[field])
+            for row in rows for field in RECEIPT_FIELDS if row[field]
+        ], batch_size=batch_size)
+        _merge_rollups(family_id, year, rows)
+        _delete_hot(rows, batch_size)
+    return len(rows), len(shares)
+
+
+def archive_family(family, today=None, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Archive ``family``'s expenses older than its cutoff, one year per
+    transaction. Returns counts of what was (or would be) archived.
+    """
+    stats = {'years': 0, 'expenses': 0, 'shares': 0, 'boundary': None}
+    cutoff = archive_cutoff(family, today)
+    if cutoff is None:
+        return stats
+    boundary = archive_boundary(family.id, cutoff)
+    stats['boundary'] = boundary
+    old = Expense.objects.filter(family_id=family.id, date__lt=boundary)
+    years = [value.year for value in old.dates('date', 'year')]
+    if dry_run:
+        stats.update(years=len(years), expenses=old.count())
+        return stats
+
+    # Budgets over archived dates must not need the expenses any more
+    close_budgets(today=boundary, batch_size=batch_size, family_id=family.id)
+    for year in years:
+        expenses, shares = _archive_year(family.id, year, batch_size)
+        stats['years'] += 1
+        stats['expenses'] += expenses
+        stats['shares'] += shares
+    return stats
+
+
+def archive_all(today=None, batch_size=BATCH_SIZE, dry_run=False):
+    families = Family.objects.all() if ARCHIVE_AFTER_MONTHS else Family.objects.filter(archive_after_months__isnull=False)
+    totals = {'families': 0, 'years': 0, 'expenses': 0, 'shares': 0}
+    for family in families.order_by('id').iterator():
+        stats = archive_family(family, today, batch_size, dry_run)
+        if stats['years']:
+            totals['families'] += 1
+        for key in ('years', 'expenses', 'shares'):
+            totals[key] += stats[key]
+    return totals
+
+
+def hot_boundaries(family_ids):
+    """{family_id: first date still in the hot table} for archived families"""
+    return {
+        row['family_id']: date(row['year'] + 1, 1, 1)
+        for row in ExpenseArchive.objects.filter(family_id__in=family_ids).values('family_id').annotate(year=Max('year'))
+    }
+
+
+def archives_for_range(family_ids, start=None, end=None):
+    """Segments of ``family_ids`` overlapping [start, end]"""
+    queryset = ExpenseArchive.objects.filter(family_id__in=family_ids)
+    if start:
+        queryset = queryset.filter(last_date__gte=start)
+    if end:
+        queryset = queryset.filter(first_date__lte=end)
+    return list(queryset)
+
+
+def _matches_search(row, terms):
+    haystack = ' '.join(filter(None, (row['title'], row['description'], row['tags']))).lower()
+    return all(term in haystack for term in terms)
+
+
+def archived_expenses(archives, start=None, end=None, filters=None, search=None):
+    """
+    Expenses from ``archives`` inside [start, end] as unsaved ``Expense``
+    instances marked ``_archived``. ``filters`` maps attnames to the values
+    they must equal; ``search`` matches title, description and tags.
+    """
+    filters = filters or {}
+    terms = search.lower().split() if search else []
+    expenses = []
+    for archive in archives:
+        rows, _ = read_segment(archive.segment.name)
+        for row in rows:
+            if start and row['date'] < start or end and row['date'] > end:
+                continue
+            if any(str(row[name]) != str(value) for name, value in filters.items()):
+                continue
+            if terms and not _matches_search(row, terms):
+                continue
+            expense = Expense(**row)
+            expense._archived = True
+            expenses.append(expense)
+    return expenses
+
+
+def attach_related(expenses):
+    """Load category (with family), family and payer of archived expenses in bulk"""
+    archived = [expense for expense in expenses if getattr(expense, '_archived', False)]
+    if not archived:
+        return
+    categories = Category.objects.select_related('family').in_bulk({e.category_id for e in archived})
+    families = Family.objects.in_bulk({e.family_id for e in archived})
+    users = User.objects.in_bulk({e.paid_by_id for e in archived})
+    for expense in archived:
+        expense.category = categories.get(expense.category_id)
+        expense.family = families.get(expense.family_id)
+        expense.paid_by = users.get(expense.paid_by_id)
+
+
+def _sort(items, ordering):
+    for key in reversed(ordering):
+        name = key.lstrip('-')
+        items.sort(
+            key=lambda item: (getattr(item, name) is not None, getattr(item, name)),
+            reverse=key.startswith('-')
+        )
+    return items
+
+
+class Merged:
+    """
+    A queryset merged with in-memory rows in ``ordering``, which the queryset
+    must already follow. A slice only loads the queryset rows up to its end.
+    """
+
+    def __init__(self, queryset, items, ordering):
+        self.queryset = queryset
+        self.items = _sort(list(items), ordering)
+        self.ordering = ordering
+
+    def __len__(self):
+        return self.queryset.count() + len(self.items)
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop if index.stop is not None else len(self)
+        return _sort(list(self.queryset[:stop]) + self.items, self.ordering)[start:stop]
+
+
+class ReadThrough:
+    """
+    Concatenation of querysets and lists that Django's paginator can slice,
+    so hot rows stay lazy while archived rows are merged in.
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+        self._counts = None
+
+    def _part_counts(self):
+        if self._counts is None:
+            self._counts = [part.count() if isinstance(part, QuerySet) else len(part) for part in self.parts]
+        return self._counts
+
+    def count(self):
+        return sum(self._part_counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop if index.stop is not None else self.count()
+        items = []
+        offset = 0
+        for part, count in zip(self.parts, self._part_counts()):
+            if start < offset + count and stop > offset:
+                items.extend(part[max(start - offset, 0):stop - offset])
+            offset += count
+        return items
+
+
+def read_through(hot, archived, ordering, boundary):
+    """
+    Combine the hot queryset, already in ``ordering``, with archived expenses.
+
+    Ordered by date, hot rows on or after ``boundary`` are left as a lazy
+    queryset and only older (backdated) hot rows are merged with the
+    archive in memory. Other orderings merge the archive into the hot rows
+    up to the end of the requested page.
+    """
+    ordering = list(ordering)
+    if ordering and ordering[0].lstrip('-') == 'date':
+        recent = hot.filter(date__gte=boundary)
+        older = _sort(list(hot.filter(date__lt=boundary)) + archived, ordering)
+        parts = [recent, older] if ordering[0].startswith('-') else [older, recent]
+        return ReadThrough(parts)
+    return ReadThrough([Merged(hot, archived, ordering)])
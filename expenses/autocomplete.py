@@ -0,0 +1,212 @@
+"""
+Title and tag autocomplete.
+
+Each family gets an ``Index`` per field: a sorted list of (fragment, term)
+pairs, where a term is a distinct title or tag (case-insensitive) and its
+fragments are the term from each word onwards, so "shop" completes
+"Weekly shop" as well as "Shopping". A prefix is a ``bisect`` range of that
+list, and the best terms of each prefix asked for are remembered: uses
+added later move terms up those lists in place, removals drop the lists
+they touch.
+
+Terms are ranked by frequency decayed by recency: a use on ``day`` weighs
+``2 ** ((day - reference) / HALF_LIFE)``, so sums of weights rank terms as
+if every use lost half its weight each ``HALF_LIFE`` days, and a use can be
+added or removed without rescoring the rest. The reference is the day the
+index was built, and exponents are clamped to ``MAX_EXPONENT`` so dates
+far from it cannot overflow a float.
+
+Indexes are built from the family's expenses on first use and kept per
+process (at most ``CACHE_SIZE`` families). Expense writes update the loaded
+indexes of this process once committed; other processes pick them up when
+their copy is ``TTL`` seconds old.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+# Days after which a use counts half as much
+HALF_LIFE = getattr(settings, 'EXPENSE_AUTOCOMPLETE_HALF_LIFE', 90)
+# Seconds before an index is rebuilt to pick up other processes' writes
+TTL = getattr(settings, 'EXPENSE_AUTOCOMPLETE_TTL', 600)
+CACHE_SIZE = getattr(settings, 'EXPENSE_AUTOCOMPLETE_CACHE_SIZE', 256)
+MAX_LIMIT = 25
+# Prefixes whose best terms each index remembers
+TOP_CACHE_SIZE = getattr(settings, 'EXPENSE_AUTOCOMPLETE_TOP_CACHE_SIZE', 2048)
+
+FIELDS = ('title', 'tags')
+# Floats overflow past 2 ** 1023; sums of weights keep well below
+MAX_EXPONENT = 512
+
+
+def weight(day, reference):
+    exponent = (day - reference).days / HALF_LIFE
+    return 2 ** max(-MAX_EXPONENT, min(exponent, MAX_EXPONENT))
+
+
+def terms(field, value):
+    """Distinct terms of an expense's ``field`` value"""
+    if not value:
+        return []
+    if field == 'tags':
+        return list(dict.fromkeys(tag.strip() for tag in value.split(',') if tag.strip()))
+    return [value.strip()] if value.strip() else []
+
+
+def fragments(key):
+    """``key`` from the start of each of its words"""
+    return [key] + [key[position + 1:] for position, char in enumerate(key) if char == ' ' and key[position + 1:]]
+
+
+class Index:
+    """Ranked terms of one field of one family; built by ``index_for``"""
+
+    def __init__(self, uses=(), reference=None):
+        self.reference = reference or timezone.now().date()
+        self.terms = {}  # key -> [display, count, weight, last used]
+        # Best MAX_LIMIT keys per prefix asked for; all matches when shorter
+        self.top = {}
+        self.lock = threading.Lock()
+        for term, day, count in uses:
+            self._add(term, day, count)
+        # Sorted (fragment, key)
+        self.fragments = sorted((fragment, key) for key in self.terms for fragment in fragments(key))
+        # One-letter prefixes match the most terms; rank them once up front
+        for letter in {fragment[0] for fragment, _ in self.fragments}:
+            self.complete(letter)
+
+    @staticmethod
+    def key(term):
+        return ' '.join(term.lower().split())
+
+    def score(self, key):
+        return (self.terms[key][2], key)
+
+    def _add(self, term, day, count):
+        key = self.key(term)
+        entry = self.terms.get(key)
+        if entry is None:
+            self.terms[key] = [term, count, count * weight(day, self.reference), day]
+            return key, True
+        entry[1] += count
+        entry[2] += count * weight(day, self.reference)
+        if day >= entry[3]:
+            entry[0], entry[3] = term, day
+        return key, False
+
+    def prefixes(self, key):
+        return {fragment[:end] for fragment in fragments(key) for end in range(1, len(fragment) + 1)}
+
+    def add(self, term, day, count=1):
+        with self.lock:
+            key, new = self._add(term, day, count)
+            if new:
+                for fragment in fragments(key):
+                    insort(self.fragments, (fragment, key))
+            # A higher score can only move the key up the lists it matches
+            for prefix in self.prefixes(key) & self.top.keys():
+                best = self.top[prefix]
+                if key not in best:
+                    best.append(key)
+                best.sort(key=self.score, reverse=True)
+                del best[MAX_LIMIT:]
+
+    def remove(self, term, day):
+        key = self.key(term)
+        with self.lock:
+            entry = self.terms.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            entry[2] -= weight(day, self.reference)
+            # A lower score may let a key outside a list overtake it
+            for prefix in self.prefixes(key):
+                self.top.pop(prefix, None)
+            if entry[1] > 0:
+                return
+            del self.terms[key]
+            for fragment in fragments(key):
+                position = bisect_left(self.fragments, (fragment, key))
+                if position < len(self.fragments) and self.fragments[position] == (fragment, key):
+                    del self.fragments[position]
+
+    def complete(self, prefix, limit=10):
+        """[{value, count, last_used}] of the best ``limit`` terms matching ``prefix``"""
+        prefix = self.key(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            best = self.top.get(prefix)
+            if best is None:
+                matches = self.fragments[
+                    bisect_left(self.fragments, (prefix,)):bisect_left(self.fragments, (prefix + '\U0010ffff',))
+                ]
+                best = heapq.nlargest(MAX_LIMIT, {key for _, key in matches}, key=self.score)
+                if len(self.top) >= TOP_CACHE_SIZE:
+                    self.top.clear()
+                self.top[prefix] = best
+            return [
+                {'value': self.terms[key][0], 'count': self.terms[key][1], 'last_used': self.terms[key][3]}
+                for key in best[:limit]
+            ]
+
+
+def build(family_id, field):
+    from .models import Expense
+
+    rows = Expense.objects.filter(family_id=family_id).exclude(**{f'{field}__isnull': True}).values_list(
+        field, 'date'
+    ).annotate(uses=Count('id')).order_by('date')
+    return Index((term, day, uses) for value, day, uses in rows for term in terms(field, value))
+
+
+_indexes = OrderedDict()  # (family_id, field) -> (built at, Index)
+_lock = threading.Lock()
+
+
+def index_for(family_id, field):
+    """The cached ``Index`` of a family's ``field``, rebuilt when stale"""
+    with _lock:
+        cached = _indexes.get((family_id, field))
+        if cached is not None and time.monotonic() - cached[0] < TTL:
+            _indexes.move_to_end((family_id, field))
+            return cached[1]
+    index = build(family_id, field)
+    with _lock:
+        _indexes[(family_id, field)] = (time.monotonic(), index)
+        _indexes.move_to_end((family_id, field))
+        while len(_indexes) > CACHE_SIZE * len(FIELDS):
+            _indexes.popitem(last=False)
+    return index
+
+
+def invalidate(family_id=None):
+    """Drop the cached indexes of a family, or of every family"""
+    with _lock:
+        if family_id is None:
+            _indexes.clear()
+        else:
+            for field in FIELDS:
+                _indexes.pop((family_id, field), None)
+
+
+def update(added=(), removed=()):
+    """
+    Apply expense writes to the loaded indexes. ``added`` and ``removed``
+    are dictionaries with family_id, date and the indexed fields.
+    """
+    for rows, method in ((removed, 'remove'), (added, 'add')):
+        for row in rows:
+            for field in FIELDS:
+                with _lock:
+                    cached = _indexes.get((row['family_id'], field))
+                if cached is None:
+                    continue
+                for term in terms(field, row.get(field)):
+                    getattr(cached[1], method)(term, row['date'])
@@ -0,0 +1,201 @@
+"""
+Per-family category suggestions from expense titles and tags.
+
+A ``Matcher`` is compiled from three sources, in order of precedence:
+
+- ``CategoryRule`` keywords and, after them, the family's category names. A
+  keyword matches when its words appear consecutively in the title or the
+  tags; the longest match wins.
+- The family's ``HISTORY_SIZE`` most recent expenses. A title seen before
+  reuses the category it was most often filed under.
+- Otherwise every word of the title and tags votes for the categories it
+  was seen with, in proportion to how often.
+
+Classifying a title is then a handful of dictionary lookups, and repeated
+titles are answered from a memo. Matchers are kept per process (at most
+``CACHE_SIZE`` families) for ``TTL`` seconds, and rebuilt earlier when the
+family's rules or categories change, which costs two indexed aggregates per
+lookup batch.
+"""
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+# Recent expenses the matcher learns from
+HISTORY_SIZE = getattr(settings, 'EXPENSE_CATEGORIZER_HISTORY', 5000)
+# Seconds before a matcher is rebuilt to pick up new expenses
+TTL = getattr(settings, 'EXPENSE_CATEGORIZER_TTL', 300)
+CACHE_SIZE = getattr(settings, 'EXPENSE_CATEGORIZER_CACHE_SIZE', 256)
+# Distinct (title, tags) answers remembered by each matcher
+MEMO_SIZE = getattr(settings, 'EXPENSE_CATEGORIZER_MEMO_SIZE', 10000)
+# Below this confidence a suggestion is not applied automatically
+MIN_CONFIDENCE = getattr(settings, 'EXPENSE_CATEGORIZER_MIN_CONFIDENCE', 0.5)
+
+_WORD = re.compile(r'\w+')
+
+
+def words(text):
+    """Lowercase words of ``text``"""
+    return _WORD.findall(text.lower()) if text else []
+
+
+class Suggestion(NamedTuple):
+    category_id: int
+    confidence: float
+    source: str  # rule, name, history or words
+
+
+def _most_common(counter):
+    (category_id, count), = counter.most_common(1)
+    return category_id, count / sum(counter.values())
+
+
+class Matcher:
+    """Suggests categories of one family; built by ``matcher_for``"""
+
+    def __init__(self, rules, categories, history):
+        # First word -> [(words, category_id, source)], preferred first
+        self.keywords = defaultdict(list)
+        for keyword, category_id, source in (
+            [(keyword, category_id, 'rule') for keyword, category_id in rules]
+            + [(name, category_id, 'name') for category_id, name in categories.items()]
+        ):
+            keyword_words = tuple(words(keyword))
+            if keyword_words and category_id in categories:
+                self.keywords[keyword_words[0]].append((keyword_words, category_id, source))
+        for candidates in self.keywords.values():
+            candidates.sort(key=lambda candidate: (candidate[2] != 'rule', -len(candidate[0])))
+
+        titles = defaultdict(Counter)
+        votes = defaultdict(Counter)
+        for title, tags, category_id in history:
+            if category_id not in categories:
+                continue
+            title_words = words(title)
+            titles[' '.join(title_words)][category_id] += 1
+            for word in set(title_words + words(tags)):
+                votes[word][category_id] += 1
+        self.titles = {title: _most_common(counter) for title, counter in titles.items()}
+        self.votes = {
+            word: [(category_id, count / sum(counter.values())) for category_id, count in counter.items()]
+            for word, counter in votes.items()
+        }
+        # Imports repeat the same titles; a matcher never changes once built
+        self.memo = {}
+
+    def _keyword(self, sequence):
+        best = None
+        for position, word in enumerate(sequence):
+            for keyword_words, category_id, source in self.keywords.get(word, ()):
+                if tuple(sequence[position:position + len(keyword_words)]) != keyword_words:
+                    continue
+                rank = (source == 'rule', len(keyword_words))
+                if best is None or rank > best[0]:
+                    best = (rank, category_id, source)
+                break
+        return best
+
+    def suggest(self, title, tags=None):
+        """The most likely ``Suggestion`` for an expense, or None"""
+        key = (title, tags)
+        if key in self.memo:
+            return self.memo[key]
+        suggestion = self._suggest(title, tags)
+        if len(self.memo) < MEMO_SIZE:
+            self.memo[key] = suggestion
+        return suggestion
+
+    def _suggest(self, title, tags):
+        title_words = words(title)
+        tag_words = words(tags)
+
+        matches = [match for match in (self._keyword(title_words), self._keyword(tag_words)) if match]
+        if matches:
+            _, category_id, source = max(matches, key=lambda match: match[0])
+            return Suggestion(category_id, 1.0, source)
+
+        seen = self.titles.get(' '.join(title_words))
+        if seen is not None:
+            return Suggestion(seen[0], round(seen[1], 3), 'history')
+
+        scores = defaultdict(float)
+        for word in set(title_words + tag_words):
+            for category_id, weight in self.votes.get(word, ()):
+                scores[category_id] += weight
+        if not scores:
+            return None
+        category_id, score = max(scores.items(), key=lambda item: (item[1], -item[0]))
+        return Suggestion(category_id, round(score / sum(scores.values()), 3), 'words')
+
+
+def build(family_id):
+    from budgets.models import Category
+    from .models import CategoryRule, Expense
+
+    categories = dict(Category.objects.filter(family_id=family_id).values_list('id', 'name'))
+    rules = CategoryRule.objects.filter(family_id=family_id).values_list('keyword', 'category_id')
+    history = Expense.objects.filter(family_id=family_id).order_by('-date', '-created_at').values_list(
+        'title', 'tags', 'category_id'
+    )[:HISTORY_SIZE]
+    return Matcher(list(rules), categories, history)
+
+
+def _stamp(family_id):
+    """Changes whenever a rule or category of the family is added, edited or removed"""
+    from budgets.models import Category
+    from .models import CategoryRule
+
+    return tuple(
+        tuple(model.objects.filter(family_id=family_id).aggregate(
+            count=Count('id'), changed=Max('updated_at')
+        ).values())
+        for model in (Category, CategoryRule)
+    )
+
+
+_matchers = OrderedDict()  # family_id -> (stamp, built at, Matcher)
+_lock = threading.Lock()
+
+
+def matcher_for(family_id):
+    """The cached ``Matcher`` of a family, rebuilt when stale"""
+    stamp = _stamp(family_id)
+    with _lock:
+        cached = _matchers.get(family_id)
+        if cached is not None and cached[0] == stamp and time.monotonic() - cached[1] < TTL:
+            _matchers.move_to_end(family_id)
+            return cached[2]
+    matcher = build(family_id)
+    with _lock:
+        _matchers[family_id] = (stamp, time.monotonic(), matcher)
+        _matchers.move_to_end(family_id)
+        while len(_matchers) > CACHE_SIZE:
+            _matchers.popitem(last=False)
+    return matcher
+
+
+def invalidate(family_id=None):
+    """Drop the cached matcher of a family, or of every family"""
+    with _lock:
+        if family_id is None:
+            _matchers.clear()
+        else:
+            _matchers.pop(family_id, None)
+
+
+def classify(family_id, items):
+    """
+    [Suggestion or None] for ``items``, an iterable of (title, tags), keeping
+    only suggestions at least ``MIN_CONFIDENCE`` sure.
+    """
+    matcher = matcher_for(family_id)
+    suggestions = []
+    for title, tags in items:
+        suggestion = matcher.suggest(title, tags)
+        suggestions.append(suggestion if suggestion and suggestion.confidence >= MIN_CONFIDENCE else None)
+    return suggestions
@@ -0,0 +1,20 @@
+import django_filters
+
+from budgets.tree import descendants
+from .models import Expense
+
+
+class ExpenseFilter(django_filters.FilterSet):
+    """Exact filters, inclusive date and amount ranges and category subtrees"""
+    start_date = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    end_date = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    min_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+    category_tree = django_filters.NumberFilter(method='filter_category_tree')
+
+    class Meta:
+        model = Expense
+        fields = ['family', 'category', 'paid_by', 'payment_method', 'date']
+
+    def filter_category_tree(self, queryset, name, value):
+        return queryset.filter(category_id__in=descendants(value))
@@ -0,0 +1,75 @@
+"""
+Bulk import of expenses.
+
+Rows are validated without queries, rows without a category are classified
+by ``expenses.categorizer`` in one pass, and the expenses are written with
+``bulk_create``. Per-row ``post_save`` receivers do not run: ``bulk_created``
+is sent once with the new expenses instead, so budgets and the event stream
+can catch up in bulk.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import ModelSignal
+
+from . import categorizer
+from .models import Expense
+from .serializers import ExpenseImportRowSerializer
+
+MAX_ROWS = getattr(settings, 'EXPENSE_MAX_IMPORT_ROWS', 1000)
+
+# sender=model, instances=[saved instances]
+bulk_created = ModelSignal(use_caching=True)
+
+
+def import_expenses(family_id, user, rows):
+    """
+    Create the valid ``rows`` as expenses of ``family_id`` paid by ``user``.
+
+    Returns one outcome per row: created (with the expense id and where its
+    category came from), invalid (with errors) or uncategorized when no
+    category was given and none could be suggested.
+    """
+    from budgets.models import Category
+
+    outcomes = []
+    pending = []
+    for index, row in enumerate(rows):
+        outcome = {'row': index, 'status': None}
+        outcomes.append(outcome)
+        serializer = ExpenseImportRowSerializer(data=row)
+        if not serializer.is_valid():
+            outcome.update(status='invalid', errors=serializer.errors)
+            continue
+        pending.append((outcome, serializer.validated_data))
+
+    unlabelled = [(outcome, data) for outcome, data in pending if data.get('category_id') is None]
+    suggestions = categorizer.classify(family_id, [(data['title'], data.get('tags')) for _, data in unlabelled])
+    for (outcome, data), suggestion in zip(unlabelled, suggestions):
+        if suggestion is not None:
+            data['category_id'] = suggestion.category_id
+            outcome.update(category_source=suggestion.source, confidence=suggestion.confidence)
+
+    category_ids = set(Category.objects.filter(family_id=family_id).values_list('id', flat=True))
+    expenses = []
+    for outcome, data in pending:
+        if data.get('category_id') is None:
+            outcome['status'] = 'uncategorized'
+            continue
+        if data['category_id'] not in category_ids:
+            outcome.update(status='invalid', errors={'category_id': ['Not a category of this family.']})
+            continue
+        outcome.setdefault('category_source', 'given')
+        expense = Expense(family_id=family_id, paid_by=user, **data)
+        outcome['expense'] = expense
+        expenses.append(expense)
+
+    with transaction.atomic():
+        Expense.objects.bulk_create(expenses, batch_size=500)
+        if expenses:
+            bulk_created.send(sender=Expense, instances=expenses)
+
+    for outcome in outcomes:
+        expense = outcome.pop('expense', None)
+        if expense is not None:
+            outcome.update(status='created', id=expense.pk, category_id=expense.category_id)
+    return outcomes
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from accounts.models import Family
+from expenses import archive
+
+
+class Command(BaseCommand):
+    help = 'Move expenses older than each family\'s cutoff into compressed archive segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--family', type=int,
+            help='Only archive this family'
+        )
+        parser.add_argument(
+            '--date',
+            help='Treat this date (YYYY-MM-DD) as today'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=archive.BATCH_SIZE,
+            help='Number of rows inserted or deleted per query'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report what would be archived'
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError('--date must use the YYYY-MM-DD format')
+
+        if options['family']:
+            family = Family.objects.filter(pk=options['family']).first()
+            if family is None:
+                raise CommandError(f'Family {options["family"]} does not exist')
+            stats = archive.archive_family(family, today, options['batch_size'], options['dry_run'])
+            if stats['boundary'] is None:
+                self.stdout.write(f'{family} has no archive cutoff')
+                return
+            stats['families'] = 1 if stats['years'] else 0
+        else:
+            stats = archive.archive_all(today, options['batch_size'], options['dry_run'])
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {stats["expenses"]} expense(s) and {stats.get("shares", 0)} share(s) '
+            f'from {stats["years"]} year(s) of {stats["families"]} family(ies)'
+        ))
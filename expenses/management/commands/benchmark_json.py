@@ -0,0 +1,117 @@
+import io
+import random
+import timeit
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import Family, User
+from budgets.models import Category
+from expenses.models import Expense
+from expenses.serializers import ExpenseSerializer
+from family_budget.renderers import FastJSONParser, FastJSONRenderer, orjson
+
+
+def expense_rows(count, rng):
+    """Unsaved expenses with their related objects attached, like a list page"""
+    user = User(id=1, email='alex@example.com', first_name='Alex', last_name='Doe')
+    family = Family(id=1, name='Doe household', created_by=user)
+    categories = [
+        Category(id=i, name=name, family=family, created_by=user)
+        for i, name in enumerate(['Groceries', 'Rent', 'Utilities', 'Dining out', 'Transport', 'Café & bakery'], 1)
+    ]
+    created = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    rows = []
+    for i in range(count):
+        rows.append(Expense(
+            id=i + 1,
+            title=rng.choice(['Weekly shop', 'Electricity bill', 'Train ticket', 'Pizza night', 'Rent — March']),
+            description=rng.choice([None, '', 'Paid with the shared card']),
+            amount=Decimal(rng.randint(100, 50000)) / 100,
+            category=rng.choice(categories),
+            family=family,
+            paid_by=user,
+            date=date(2024, 1, 1) + timedelta(days=rng.randint(0, 365)),
+            payment_method=rng.choice(Expense.PAYMENT_METHOD_CHOICES)[0],
+            tags=rng.choice([None, 'food', 'food, weekly', 'bills,home']),
+            created_at=created + timedelta(seconds=rng.randint(0, 10 ** 7), microseconds=rng.randint(0, 999999)),
+            updated_at=created + timedelta(seconds=rng.randint(0, 10 ** 7)),
+        ))
+    return rows
+
+
+def statistics_payload(rng):
+    """Shape of the expense_statistics response for a year of data"""
+    today = date(2024, 12, 31)
+    return {
+        'total_expenses': Decimal('48211.37'),
+        'expense_count': 1843,
+        'period': 'year',
+        'start_date': today - timedelta(days=365),
+        'end_date': today,
+        'expenses_by_category': [
+            {'category__name': name, 'total': Decimal(rng.randint(1000, 900000)) / 100, 'count': rng.randint(1, 400)}
+            for name in ['Groceries', 'Rent', 'Utilities', 'Dining out', 'Transport', 'Café & bakery']
+        ],
+        'expenses_by_payment': [
+            {'payment_method': method, 'total': Decimal(rng.randint(1000, 900000)) / 100, 'count': rng.randint(1, 400)}
+            for method, _ in Expense.PAYMENT_METHOD_CHOICES
+        ],
+        'daily_expenses': [
+            {'day': today - timedelta(days=i), 'total': Decimal(rng.randint(100, 50000)) / 100}
+            for i in range(365)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare the default and the fast JSON renderer/parser on realistic payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Expenses in the list payload')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed iterations per case')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def time(self, func, repeat):
+        return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; the fast classes fall back to DRF'))
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+        payloads = {
+            f"ExpenseSerializer x{options['rows']}": ExpenseSerializer(expense_rows(options['rows'], rng), many=True).data,
+            'expense_statistics (year)': statistics_payload(rng),
+        }
+
+        default_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        default_parser, fast_parser = JSONParser(), FastJSONParser()
+
+        for name, data in payloads.items():
+            default_bytes = default_renderer.render(data)
+            fast_bytes = fast_renderer.render(data)
+            identical = default_bytes == fast_bytes
+
+            render_default = self.time(lambda: default_renderer.render(data), repeat)
+            render_fast = self.time(lambda: fast_renderer.render(data), repeat)
+            parse_default = self.time(lambda: default_parser.parse(io.BytesIO(default_bytes)), repeat)
+            parse_fast = self.time(lambda: fast_parser.parse(io.BytesIO(default_bytes)), repeat)
+
+            self.stdout.write(f'{name} ({len(default_bytes) / 1024:.1f} KiB)')
+            self.stdout.write(
+                f'  render: {render_default:8.3f} ms -> {render_fast:8.3f} ms '
+                f'({render_default / render_fast:.1f}x)'
+            )
+            self.stdout.write(
+                f'  parse:  {parse_default:8.3f} ms -> {parse_fast:8.3f} ms '
+                f'({parse_default / parse_fast:.1f}x)'
+            )
+            if identical:
+                self.stdout.write(self.style.SUCCESS('  output: byte-identical'))
+            else:
+                self.stdout.write(self.style.ERROR('  output: DIFFERS from JSONRenderer'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from expenses.recurrence import materialize
+
+
+class Command(BaseCommand):
+    help = 'Create the expenses of recurring expenses that are due and advance their next occurrence'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date', help='Treat this date (YYYY-MM-DD) as today'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of rules loaded per query'
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if not today:
+                raise CommandError('--date must use the YYYY-MM-DD format')
+
+        created = materialize(today=today, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Created {created} expense(s)'))
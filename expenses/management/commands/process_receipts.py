@@ -0,0 +1,51 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from expenses.models import Expense
+from expenses.receipts import _init_worker, process_receipt_ids
+
+
+class Command(BaseCommand):
+    help = 'Generate receipt thumbnails and previews for existing expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=4,
+            help='Number of worker processes'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of expenses handed to a worker at a time'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Reprocess receipts that already have variants'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Expense.objects.exclude(receipt_image='').exclude(receipt_image__isnull=True)
+        if not options['all']:
+            queryset = queryset.filter(receipt_thumbnail__in=['', None]).exclude(
+                receipt_status=Expense.RECEIPT_REJECTED
+            )
+        ids = list(queryset.order_by('id').values_list('id', flat=True))
+        if not ids:
+            self.stdout.write('No receipts to process')
+            return
+
+        size = options['batch_size']
+        batches = [ids[i:i + size] for i in range(0, len(ids), size)]
+        processed = failed = 0
+
+        # Forked workers must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['processes'], initializer=_init_worker) as pool:
+            for future in as_completed(pool.submit(process_receipt_ids, batch) for batch in batches):
+                done, errors = future.result()
+                processed += done
+                failed += errors
+                self.stdout.write(f'{processed + failed}/{len(ids)} receipts')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} receipt(s), {failed} failed'))
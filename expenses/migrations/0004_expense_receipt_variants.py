@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_remove_expense_currency_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='receipt_preview',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='receipts/previews/'),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='receipt_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='receipts/thumbnails/'),
+        ),
+    ]
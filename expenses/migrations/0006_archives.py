@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0004_family_archive_after_months'),
+        ('budgets', '0005_updated_at_indexes'),
+        ('expenses', '0005_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('segment', models.FileField(upload_to='archives/')),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('share_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('first_date', models.DateField()),
+                ('last_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('family', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_archives', to='accounts.family')),
+            ],
+            options={
+                'ordering': ['family', 'year'],
+                'unique_together': {('family', 'year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expense_id', models.BigIntegerField()),
+                ('file', models.FileField(upload_to='receipts/')),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='expenses.expensearchive')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_method', models.CharField(choices=[('cash', 'Cash'), ('credit_card', 'Credit Card'), ('debit_card', 'Debit Card'), ('bank_transfer', 'Bank Transfer'), ('digital_wallet', 'Digital Wallet'), ('other', 'Other')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('count', models.PositiveIntegerField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_rollups', to='budgets.category')),
+                ('family', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_rollups', to='accounts.family')),
+                ('paid_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['family', 'date'], name='rollup_family_date_idx')],
+                'unique_together': {('family', 'date', 'category', 'paid_by', 'payment_method')},
+            },
+        ),
+    ]
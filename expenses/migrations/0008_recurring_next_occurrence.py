@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:52
+
+import calendar
+from datetime import date, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# expenses.recurrence as of this migration, so later changes to it cannot change what it does
+STEP_DAYS = {'daily': 1, 'weekly': 7}
+STEP_MONTHS = {'monthly': 1, 'yearly': 12}
+
+
+def nth(start, frequency, n):
+    if frequency in STEP_DAYS:
+        return start + timedelta(days=n * STEP_DAYS[frequency])
+    year, month = divmod(start.month - 1 + n * STEP_MONTHS[frequency], 12)
+    year += start.year
+    return date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def first_on_or_after(rule, day):
+    if day <= rule.start_date:
+        n = 0
+    elif rule.frequency in STEP_DAYS:
+        n = -(-(day - rule.start_date).days // STEP_DAYS[rule.frequency])
+    else:
+        n = ((day.year - rule.start_date.year) * 12 + day.month - rule.start_date.month) // STEP_MONTHS[rule.frequency]
+        while nth(rule.start_date, rule.frequency, n) < day:
+            n += 1
+    occurrence = nth(rule.start_date, rule.frequency, n)
+    if rule.end_date is not None and occurrence > rule.end_date:
+        return None
+    return occurrence
+
+
+def schedule_existing_rules(apps, schema_editor):
+    RecurringExpense = apps.get_model('expenses', 'RecurringExpense')
+    today = timezone.now().date()
+    rules = list(RecurringExpense.objects.filter(is_active=True))
+    for rule in rules:
+        # Nothing has been materialized yet
+        rule.next_occurrence = first_on_or_after(rule, today)
+    RecurringExpense.objects.bulk_update(rules, ['next_occurrence'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recurringexpense',
+            name='last_materialized',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recurringexpense',
+            name='next_occurrence',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recurringexpense',
+            index=models.Index(fields=['family', 'next_occurrence'], name='recurring_family_next_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringexpense',
+            index=models.Index(fields=['next_occurrence'], name='recurring_next_idx'),
+        ),
+        migrations.RunPython(schedule_existing_rules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_family_deleted_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('budgets', '0007_category_tree'),
+        ('expenses', '0008_recurring_next_occurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='budgets.category')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_rules', to=settings.AUTH_USER_MODEL)),
+                ('family', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_rules', to='accounts.family')),
+            ],
+            options={
+                'ordering': ['keyword'],
+                'indexes': [models.Index(fields=['family', 'updated_at'], name='categoryrule_family_idx')],
+                'unique_together': {('family', 'keyword')},
+            },
+        ),
+    ]
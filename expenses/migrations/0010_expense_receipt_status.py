@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:12
+
+from django.db import migrations, models
+
+
+def mark_processed_receipts(apps, schema_editor):
+    Expense = apps.get_model('expenses', 'Expense')
+    Expense.objects.exclude(receipt_thumbnail='').exclude(receipt_thumbnail__isnull=True).update(
+        receipt_status='processed'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_category_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='receipt_status',
+            field=models.CharField(blank=True, choices=[('', 'Not processed'), ('processed', 'Processed'), ('rejected', 'Rejected')], default='', editable=False, max_length=10),
+        ),
+        migrations.RunPython(mark_processed_receipts, migrations.RunPython.noop),
+    ]
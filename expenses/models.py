@@ -16,6 +16,13 @@ class Expense(models.Model):
         ('digital_wallet', 'Digital Wallet'),
         ('other', 'Other'),
     ]
+    RECEIPT_PROCESSED = 'processed'
+    RECEIPT_REJECTED = 'rejected'
+    RECEIPT_STATUS_CHOICES = [
+        ('', 'Not processed'),
+        (RECEIPT_PROCESSED, 'Processed'),
+        (RECEIPT_REJECTED, 'Rejected'),
+    ]
 
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
@@ -26,16 +33,47 @@ class Expense(models.Model):
     date = models.DateField()
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, default='cash')
     receipt_image = models.ImageField(upload_to='receipts/', blank=True, null=True)
+    # Generated from receipt_image by expenses.receipts
+    receipt_preview = models.ImageField(upload_to='receipts/previews/', blank=True, null=True, editable=False)
+    receipt_thumbnail = models.ImageField(upload_to='receipts/thumbnails/', blank=True, null=True, editable=False)
+    # Outcome of expenses.receipts for the current receipt_image; reset when it changes
+    receipt_status = models.CharField(
+        max_length=10, choices=RECEIPT_STATUS_CHOICES, blank=True, default='', editable=False
+    )
     tags = models.CharField(max_length=200, blank=True, null=True)  # Comma-separated tags
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['family', 'updated_at'], name='expense_family_updated_idx'),
+            # Family date ranges in list order (-date, -created_at), read backwards
+            models.Index(fields=['family', 'date', 'created_at'], name='expense_family_date_idx'),
+            # Covers budget spend sums: family + category + date window, amount
+            models.Index(fields=['family', 'category', 'date', 'amount'], name='expense_fam_cat_date_idx'),
+        ]
+
+    # Fields whose previous values are kept so signal handlers can update
+    # aggregates and autocomplete for both the old and the new version of an expense
+    TRACKED_FIELDS = ('family_id', 'category_id', 'date', 'amount', 'receipt_image', 'title', 'tags')
 
     def __str__(self):
         return f"{self.title} - {self.amount} ({self.date})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        previous = getattr(self, '_loaded_values', None) or {}
+        if 'receipt_image' in previous and str(previous['receipt_image'] or '') != (self.receipt_image.name or ''):
+            self.receipt_status = ''
+        super().save(*args, **kwargs)
+        self._loaded_values = {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+
     @property
     def tag_list(self):
         """Return tags as a list"""
@@ -64,12 +102,64 @@ class RecurringExpense(models.Model):
     end_date = models.DateField(blank=True, null=True)
     payment_method = models.CharField(max_length=20, choices=Expense.PAYMENT_METHOD_CHOICES, default='cash')
     is_active = models.BooleanField(default=True)
+    # First occurrence without an expense yet, None once ended (see expenses.recurrence)
+    next_occurrence = models.DateField(blank=True, null=True, editable=False)
+    last_materialized = models.DateField(blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['family', 'updated_at'], name='recurring_family_updated_idx'),
+            # Upcoming bills of a family, and rules due for materialization
+            models.Index(fields=['family', 'next_occurrence'], name='recurring_family_next_idx'),
+            models.Index(fields=['next_occurrence'], name='recurring_next_idx'),
+        ]
+
+    SCHEDULE_FIELDS = ('frequency', 'start_date', 'end_date', 'is_active')
+
     def __str__(self):
         return f"{self.title} - {self.amount} ({self.frequency})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .recurrence import schedule
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None or any(
+            field in loaded and loaded[field] != getattr(self, field)
+            for field in self.SCHEDULE_FIELDS
+        ):
+            schedule(self)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'next_occurrence'}
+        super().save(*args, **kwargs)
+        self._loaded_values = {field: getattr(self, field) for field in self.SCHEDULE_FIELDS}
+
+
+class CategoryRule(models.Model):
+    """A keyword that puts matching expenses of a family in a category (see expenses.categorizer)"""
+    family = models.ForeignKey(Family, on_delete=models.CASCADE, related_name='category_rules')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='rules')
+    keyword = models.CharField(max_length=100)  # One or more words, matched in titles and tags
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_rules')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['family', 'keyword']
+        ordering = ['keyword']
+        indexes = [
+            models.Index(fields=['family', 'updated_at'], name='categoryrule_family_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.keyword} -> {self.category.name}"
+
 
 class ExpenseShare(models.Model):
     """Model for sharing expenses among family members"""
@@ -85,3 +175,55 @@ class ExpenseShare(models.Model):
 
     def __str__(self):
         return f"{self.user.first_name} - {self.expense.title} ({self.amount})"
+
+
+class ExpenseArchive(models.Model):
+    """One compressed segment holding a family's archived expenses for a year"""
+    family = models.ForeignKey(Family, on_delete=models.CASCADE, related_name='expense_archives')
+    year = models.PositiveSmallIntegerField()
+    # gzip-compressed JSON written by expenses.archive
+    segment = models.FileField(upload_to='archives/')
+    expense_count = models.PositiveIntegerField(default=0)
+    share_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    first_date = models.DateField()
+    last_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['family', 'year']
+        ordering = ['family', 'year']
+
+    def __str__(self):
+        return f"{self.family.name} {self.year} ({self.expense_count} expenses)"
+
+
+class ArchivedReceipt(models.Model):
+    """Keeps a reference to the receipt files of archived expenses"""
+    archive = models.ForeignKey(ExpenseArchive, on_delete=models.CASCADE, related_name='receipts')
+    expense_id = models.BigIntegerField()
+    file = models.FileField(upload_to='receipts/')
+
+    def __str__(self):
+        return self.file.name
+
+
+class ExpenseRollup(models.Model):
+    """Daily totals of archived expenses, so statistics and trends still cover them"""
+    family = models.ForeignKey(Family, on_delete=models.CASCADE, related_name='expense_rollups')
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='expense_rollups')
+    paid_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_rollups')
+    payment_method = models.CharField(max_length=20, choices=Expense.PAYMENT_METHOD_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['family', 'date', 'category', 'paid_by', 'payment_method']
+        indexes = [
+            models.Index(fields=['family', 'date'], name='rollup_family_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.family.name} {self.date}: {self.total} ({self.count})"
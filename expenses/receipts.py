@@ -0,0 +1,123 @@
+import io
+import logging
+import os
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Expense
+
+# Longest side, in pixels, of the stored original and of each variant
+MAX_DIMENSION = getattr(settings, 'RECEIPT_MAX_DIMENSION', 2048)
+PREVIEW_SIZE = getattr(settings, 'RECEIPT_PREVIEW_SIZE', 1024)
+THUMBNAIL_SIZE = getattr(settings, 'RECEIPT_THUMBNAIL_SIZE', 256)
+JPEG_QUALITY = getattr(settings, 'RECEIPT_JPEG_QUALITY', 82)
+
+# Raised for files Pillow cannot or will not decode; retrying cannot help
+IMAGE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(image, size=None):
+    if size:
+        image = image.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def _decode(file):
+    image = Image.open(file)
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.load()
+    return image
+
+
+def _load(field):
+    """The receipt as an RGB image, or None when it cannot be decoded"""
+    field.open('rb')
+    try:
+        return _decode(field)
+    except IMAGE_ERRORS:
+        logger.warning('Rejected receipt %s', field.name, exc_info=True)
+        return None
+    finally:
+        field.close()
+
+
+def process_receipt(expense):
+    """
+    Build the thumbnail and preview of an expense's receipt.
+
+    Images are rotated according to their EXIF orientation and re-encoded as
+    JPEG, which also strips the remaining metadata. Originals larger than
+    ``MAX_DIMENSION`` are replaced by a downscaled copy. The new file names
+    are written with a queryset update so the expense signals do not fire
+    again. Files that cannot be decoded, including decompression bombs, are
+    marked rejected instead of raising, so the job is not retried.
+    """
+    field = expense.receipt_image
+    if not field:
+        return False
+    storage = field.storage
+    image = _load(field)
+    if image is None:
+        Expense.objects.filter(pk=expense.pk).update(
+            receipt_status=Expense.RECEIPT_REJECTED, updated_at=timezone.now()
+        )
+        expense.receipt_status = Expense.RECEIPT_REJECTED
+        return False
+    stem = os.path.splitext(os.path.basename(field.name))[0]
+
+    updates = {}
+    if max(image.size) > MAX_DIMENSION:
+        old_name = field.name
+        updates['receipt_image'] = storage.save(
+            f'receipts/{stem}.jpg', ContentFile(_encode(image, MAX_DIMENSION))
+        )
+        storage.delete(old_name)
+
+    for attr, folder, size in (
+        ('receipt_preview', 'previews', PREVIEW_SIZE),
+        ('receipt_thumbnail', 'thumbnails', THUMBNAIL_SIZE),
+    ):
+        previous = getattr(expense, attr)
+        updates[attr] = storage.save(f'receipts/{folder}/{stem}.jpg', ContentFile(_encode(image, size)))
+        if previous:
+            storage.delete(previous.name)
+
+    updates['receipt_status'] = Expense.RECEIPT_PROCESSED
+    Expense.objects.filter(pk=expense.pk).update(updated_at=timezone.now(), **updates)
+    for attr, name in updates.items():
+        setattr(expense, attr, name)
+    return True
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def process_receipt_ids(ids):
+    """Process a batch of expenses by id; used by the backfill process pool"""
+    processed = failed = 0
+    for expense in Expense.objects.filter(pk__in=ids).only(
+        'id', 'receipt_image', 'receipt_preview', 'receipt_thumbnail'
+    ):
+        try:
+            if process_receipt(expense):
+                processed += 1
+            else:
+                failed += 1
+        except OSError:
+            # Storage errors; the receipt is picked up again by the next run
+            failed += 1
+    return processed, failed
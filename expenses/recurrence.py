@@ -0,0 +1,128 @@
+"""
+Occurrences of recurring expenses.
+
+Every ``RecurringExpense`` stores ``next_occurrence``, the first date it has
+not been materialized for yet (None once it has ended or while inactive).
+It is set when a rule is saved and advanced by ``materialize``, so "what is
+due before X" is an indexed range query on that column. Past occurrences of
+a new rule are not backfilled.
+
+Dates are computed from ``start_date`` arithmetically instead of stepping
+through every earlier occurrence: the n-th monthly occurrence of a rule
+starting on the 31st falls on the last day of shorter months and returns to
+the 31st afterwards.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from budgets.rollover import add_months
+
+STEP_DAYS = {'daily': 1, 'weekly': 7}
+STEP_MONTHS = {'monthly': 1, 'yearly': 12}
+
+
+def nth(start, frequency, n):
+    """Date of occurrence ``n`` (0 is ``start``)"""
+    if frequency in STEP_DAYS:
+        return start + timedelta(days=n * STEP_DAYS[frequency])
+    return add_months(start, n * STEP_MONTHS[frequency])
+
+
+def index_on_or_after(start, frequency, day):
+    """Smallest n whose occurrence falls on or after ``day``"""
+    if day <= start:
+        return 0
+    if frequency in STEP_DAYS:
+        return -(-(day - start).days // STEP_DAYS[frequency])
+    # Occurrence n is in the same month as ``day`` or before it
+    n = ((day.year - start.year) * 12 + day.month - start.month) // STEP_MONTHS[frequency]
+    while nth(start, frequency, n) < day:
+        n += 1
+    return n
+
+
+def first_on_or_after(rule, day):
+    """``rule``'s first occurrence on or after ``day``, or None past its end_date"""
+    occurrence = nth(rule.start_date, rule.frequency, index_on_or_after(rule.start_date, rule.frequency, day))
+    if rule.end_date is not None and occurrence > rule.end_date:
+        return None
+    return occurrence
+
+
+def schedule(rule, today=None):
+    """Set ``rule.next_occurrence`` to its first occurrence from today on"""
+    if not rule.is_active:
+        rule.next_occurrence = None
+        return
+    day = today or timezone.now().date()
+    if rule.last_materialized is not None:
+        day = max(day, rule.last_materialized + timedelta(days=1))
+    rule.next_occurrence = first_on_or_after(rule, day)
+
+
+def expand(rules, start, end):
+    """
+    [(date, rule)] of every occurrence of ``rules`` between ``start`` and
+    ``end`` inclusive, in date order. A rule's occurrences begin at its
+    ``next_occurrence``; each rule jumps straight to its first occurrence in
+    the window.
+    """
+    occurrences = []
+    for rule in rules:
+        if rule.next_occurrence is None:
+            continue
+        last = end if rule.end_date is None else min(end, rule.end_date)
+        n = index_on_or_after(rule.start_date, rule.frequency, max(start, rule.next_occurrence))
+        day = nth(rule.start_date, rule.frequency, n)
+        while day <= last:
+            occurrences.append((day, rule))
+            n += 1
+            day = nth(rule.start_date, rule.frequency, n)
+    occurrences.sort(key=lambda occurrence: (occurrence[0], occurrence[1].pk))
+    return occurrences
+
+
+def materialize(today=None, batch_size=500):
+    """
+    Create an expense for every occurrence due on or before ``today`` and
+    advance the rules' ``next_occurrence``. Each rule is locked and read
+    again in its own transaction, so concurrent runs skip what another one
+    already materialized and an interrupted run can simply be repeated.
+    Expenses are saved one by one so budget, sync and event receivers see
+    them.
+    """
+    from .models import Expense, RecurringExpense
+
+    today = today or timezone.now().date()
+    created = 0
+    while True:
+        due = RecurringExpense.objects.filter(is_active=True, next_occurrence__lte=today)
+        ids = list(due.order_by('next_occurrence', 'id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        for rule_id in ids:
+            with transaction.atomic():
+                rule = due.select_for_update().filter(pk=rule_id).first()
+                if rule is None:
+                    # Materialized, paused or deleted since the batch was read
+                    continue
+                for day, _ in expand([rule], rule.next_occurrence, today):
+                    Expense.objects.create(
+                        title=rule.title,
+                        description=rule.description,
+                        amount=rule.amount,
+                        category_id=rule.category_id,
+                        family_id=rule.family_id,
+                        paid_by_id=rule.paid_by_id,
+                        date=day,
+                        payment_method=rule.payment_method,
+                    )
+                    created += 1
+                RecurringExpense.objects.filter(pk=rule.pk).update(
+                    last_materialized=today,
+                    next_occurrence=first_on_or_after(rule, today + timedelta(days=1)),
+                    updated_at=timezone.now(),
+                )
+    return created
@@ -1,25 +1,50 @@
 from rest_framework import serializers
-from .models import Expense, RecurringExpense, ExpenseShare
+from .models import CategoryRule, Expense, RecurringExpense, ExpenseShare
+from . import categorizer
 from budgets.models import Category
 from accounts.models import Family
+from family_budget.fieldsets import SparseFieldsetSerializerMixin
 
 
-class ExpenseSerializer(serializers.ModelSerializer):
+def user_label(prefix):
+    """values() paths and builder reproducing User.__str__"""
+    paths = (f'{prefix}__first_name', f'{prefix}__last_name', f'{prefix}__email')
+    return paths, lambda row: f"{row[paths[0]]} {row[paths[1]]} ({row[paths[2]]})"
+
+
+class ExpenseSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     paid_by = serializers.StringRelatedField(read_only=True)
     category = serializers.StringRelatedField(read_only=True)
     family = serializers.StringRelatedField(read_only=True)
     category_id = serializers.IntegerField(write_only=True)
     family_id = serializers.IntegerField(write_only=True)
     tag_list = serializers.ReadOnlyField()
+    receipt_preview = serializers.ImageField(read_only=True)
+    receipt_thumbnail = serializers.ImageField(read_only=True)
 
     class Meta:
         model = Expense
         fields = (
             'id', 'title', 'description', 'amount', 'category', 'category_id',
             'family', 'family_id', 'paid_by', 'date', 'payment_method',
-            'receipt_image', 'tags', 'tag_list', 'created_at', 'updated_at'
+            'receipt_image', 'receipt_preview', 'receipt_thumbnail', 'receipt_status',
+            'tags', 'tag_list', 'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'receipt_status', 'created_at', 'updated_at')
+
+    # Builders matching the model __str__/properties for the values() list path
+    values_fields = {
+        'paid_by': user_label('paid_by'),
+        'category': (
+            ('category__name', 'category__family__name'),
+            lambda row: f"{row['category__name']} ({row['category__family__name']})"
+        ),
+        'family': (('family__name',), lambda row: row['family__name']),
+        'tag_list': (
+            ('tags',),
+            lambda row: [tag.strip() for tag in row['tags'].split(',')] if row['tags'] else []
+        ),
+    }
 
     def create(self, validated_data):
         validated_data['paid_by'] = self.context['request'].user
@@ -33,12 +58,53 @@ class ExpenseCreateSerializer(serializers.ModelSerializer):
             'title', 'description', 'amount', 'category', 'family', 'date',
             'payment_method', 'receipt_image', 'tags'
         )
+        extra_kwargs = {'category': {'required': False}}
+
+    def validate(self, attrs):
+        # Without a category, use the one suggested from the family's rules and history
+        if attrs.get('category') is None and self.instance is None:
+            suggestion, = categorizer.classify(attrs['family'].pk, [(attrs['title'], attrs.get('tags'))])
+            if suggestion is None:
+                raise serializers.ValidationError({'category': 'No category could be suggested; please choose one.'})
+            attrs['category'] = Category.objects.get(pk=suggestion.category_id)
+        return attrs
 
     def create(self, validated_data):
         validated_data['paid_by'] = self.context['request'].user
         return super().create(validated_data)
 
 
+class ExpenseImportRowSerializer(serializers.ModelSerializer):
+    """One row of a bulk import; validated without queries"""
+    category_id = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Expense
+        fields = ('title', 'description', 'amount', 'category_id', 'date', 'payment_method', 'tags')
+
+
+class CategoryRuleSerializer(serializers.ModelSerializer):
+    created_by = serializers.StringRelatedField(read_only=True)
+
+    class Meta:
+        model = CategoryRule
+        fields = ('id', 'family', 'category', 'keyword', 'created_by', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'created_at', 'updated_at')
+
+    def validate(self, attrs):
+        family = attrs.get('family', getattr(self.instance, 'family', None))
+        category = attrs.get('category', getattr(self.instance, 'category', None))
+        if category.family_id != family.pk:
+            raise serializers.ValidationError({'category': 'The category must belong to the same family.'})
+        if not categorizer.words(attrs.get('keyword', getattr(self.instance, 'keyword', ''))):
+            raise serializers.ValidationError({'keyword': 'The keyword must contain a word.'})
+        return attrs
+
+    def create(self, validated_data):
+        validated_data['created_by'] = self.context['request'].user
+        return super().create(validated_data)
+
+
 class RecurringExpenseSerializer(serializers.ModelSerializer):
     paid_by = serializers.StringRelatedField(read_only=True)
     category = serializers.StringRelatedField(read_only=True)
@@ -51,9 +117,10 @@ class RecurringExpenseSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'title', 'description', 'amount', 'category', 'category_id',
             'family', 'family_id', 'paid_by', 'frequency', 'start_date',
-            'end_date', 'payment_method', 'is_active', 'created_at', 'updated_at'
+            'end_date', 'payment_method', 'is_active', 'next_occurrence',
+            'last_materialized', 'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'next_occurrence', 'last_materialized', 'created_at', 'updated_at')
 
     def create(self, validated_data):
         validated_data['paid_by'] = self.context['request'].user
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from family_budget.deletion import bulk_deleted
+from jobs.queue import enqueue
+
+from . import autocomplete, categorizer
+from .imports import bulk_created
+from .models import Expense
+
+AUTOCOMPLETE_FIELDS = ('family_id', 'date') + autocomplete.FIELDS
+
+
+def autocomplete_row(values):
+    row = {field: values.get(field) for field in AUTOCOMPLETE_FIELDS}
+    # Saved as given, e.g. a string from Expense.objects.create(date='2024-01-02')
+    row['date'] = Expense._meta.get_field('date').to_python(row['date'])
+    return row
+
+
+@receiver(post_save, sender=Expense)
+def queue_receipt_processing(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_values', None) or {}
+    if not instance.receipt_image:
+        return
+    if not created and str(previous.get('receipt_image') or '') == instance.receipt_image.name:
+        return
+    transaction.on_commit(lambda: enqueue('expenses.process_receipt', {'expense_id': instance.pk}))
+
+
+@receiver(post_save, sender=Expense)
+def update_autocomplete_on_save(sender, instance, created, **kwargs):
+    current = autocomplete_row(vars(instance))
+    previous = getattr(instance, '_loaded_values', None)
+    if created:
+        removed = []
+    elif previous and all(field in previous for field in AUTOCOMPLETE_FIELDS):
+        removed = [autocomplete_row(previous)]
+        if removed[0] == current:
+            return
+    else:
+        # Loaded with deferred fields: the old title is unknown
+        family_ids = {instance.family_id, (previous or {}).get('family_id', instance.family_id)}
+
+        def rebuild():
+            for family_id in family_ids:
+                autocomplete.invalidate(family_id)
+        transaction.on_commit(rebuild)
+        return
+    transaction.on_commit(lambda: autocomplete.update(added=[current], removed=removed))
+
+
+@receiver(post_delete, sender=Expense)
+def update_autocomplete_on_delete(sender, instance, **kwargs):
+    removed = [autocomplete_row(vars(instance))]
+    transaction.on_commit(lambda: autocomplete.update(removed=removed))
+
+
+@receiver(bulk_created, sender=Expense)
+def update_autocomplete_on_bulk_create(sender, instances, **kwargs):
+    added = [autocomplete_row(vars(expense)) for expense in instances]
+    transaction.on_commit(lambda: autocomplete.update(added=added))
+
+
+@receiver(bulk_deleted, sender=Expense)
+def update_autocomplete_on_bulk_delete(sender, rows, family_ids=(), **kwargs):
+    removed = [autocomplete_row(row) for row in rows if row['family_id'] not in family_ids]
+
+    def apply():
+        for family_id in family_ids:
+            autocomplete.invalidate(family_id)
+        autocomplete.update(removed=removed)
+    transaction.on_commit(apply)
+
+
+@receiver(bulk_deleted, sender=Expense)
+def invalidate_categorizer_on_bulk_delete(sender, rows, **kwargs):
+    # Matchers learn from recent expenses; rebuild those of the families touched
+    family_ids = {row['family_id'] for row in rows}
+
+    def apply():
+        for family_id in family_ids:
+            categorizer.invalidate(family_id)
+    transaction.on_commit(apply)
@@ -0,0 +1,31 @@
+from jobs.queue import task
+
+from accounts.models import Family
+from . import archive, recurrence
+from .models import Expense
+from .receipts import process_receipt
+
+
+@task('expenses.process_receipt')
+def process_receipt_task(job, expense_id):
+    expense = Expense.objects.filter(pk=expense_id).first()
+    if expense is None:
+        return {'processed': False}
+    return {'processed': process_receipt(expense)}
+
+
+@task('expenses.archive')
+def archive_expenses_task(job, family_id=None):
+    if family_id is None:
+        return archive.archive_all()
+    family = Family.objects.filter(pk=family_id).first()
+    if family is None:
+        return {'years': 0}
+    stats = archive.archive_family(family)
+    stats['boundary'] = stats['boundary'] and stats['boundary'].isoformat()
+    return stats
+
+
+@task('expenses.materialize_recurring')
+def materialize_recurring_task(job):
+    return {'created': recurrence.materialize()}
@@ -1,3 +1,537 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from accounts.models import Family, FamilyMember, User
+from budgets.models import Budget, Category
+from sync.models import Tombstone
+from . import archive, autocomplete, categorizer, receipts, recurrence, trends
+from .models import CategoryRule, Expense, RecurringExpense
+from .serializers import ExpenseSerializer
+
+
+class TrendsTests(TestCase):
+    """Bucketed spend with the previous period, and validation of the requested range"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+        for day, amount in ((date(2024, 1, 15), '10'), (date(2024, 3, 2), '25'), (date(2023, 11, 30), '7')):
+            Expense.objects.create(
+                title='Shop', amount=Decimal(amount), category=cls.category, family=cls.family,
+                paid_by=cls.user, date=day
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_monthly_buckets_with_previous_period(self):
+        response = self.client.get('/api/expenses/trends/', {'start_date': '2024-01-10', 'end_date': '2024-03-05'})
+        self.assertEqual(response.status_code, 200)
+        series, = response.data['series']
+        self.assertEqual(
+            [(point['period'], point['total']) for point in series['current']],
+            [(date(2024, 1, 1), Decimal('10')), (date(2024, 2, 1), Decimal('0')), (date(2024, 3, 1), Decimal('25'))]
+        )
+        self.assertEqual(series['previous_total'], Decimal('7'))
+        self.assertEqual(response.data['previous_start_date'], date(2023, 10, 1))
+
+    def test_invalid_dates_are_rejected(self):
+        for params in (
+            {'start_date': 'abc'}, {'end_date': 'abc'}, {'start_date': '2023-02-30'}, {'end_date': '2023-02-30'},
+            {'start_date': '2024-03-01', 'end_date': '2024-02-01'},
+            {'granularity': 'day', 'start_date': '2000-01-01', 'end_date': '2024-01-01'},
+        ):
+            self.assertEqual(self.client.get('/api/expenses/trends/', params).status_code, 400, params)
+
+    def test_bucket_count_matches_the_listed_buckets(self):
+        for granularity in trends.GRANULARITIES:
+            for start, end in ((date(2023, 12, 31), date(2024, 3, 1)), (date(2024, 2, 29), date(2026, 1, 4))):
+                self.assertEqual(
+                    trends.bucket_count(start, end, granularity), len(trends.bucket_range(start, end, granularity))
+                )
+
+
+class ReceiptTests(TestCase):
+    """Receipt variants, and files that are rejected instead of retried"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def expense(self, content, name='receipt.png'):
+        return Expense.objects.create(
+            title='Shop', amount=Decimal('10'), category=self.category, family=self.family,
+            paid_by=self.user, date=date(2024, 1, 1), receipt_image=SimpleUploadedFile(name, content)
+        )
+
+    def png(self, size=(400, 300)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'white').save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def test_variants_are_generated(self):
+        expense = self.expense(self.png())
+        self.assertTrue(receipts.process_receipt(expense))
+        expense.refresh_from_db()
+        self.assertEqual(expense.receipt_status, Expense.RECEIPT_PROCESSED)
+        with expense.receipt_thumbnail.open('rb') as thumbnail:
+            self.assertEqual(Image.open(thumbnail).size, (256, 192))
+
+        # A new receipt has not been processed yet
+        expense.receipt_image = SimpleUploadedFile('other.png', self.png((50, 50)))
+        expense.save()
+        self.assertEqual(Expense.objects.get(pk=expense.pk).receipt_status, '')
+
+    def test_undecodable_receipts_are_rejected(self):
+        garbage = self.expense(b'not an image')
+        bomb = self.expense(self.png(), name='bomb.png')
+        with self.assertLogs('expenses.receipts', 'WARNING'), mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 100):
+            self.assertEqual(receipts.process_receipt_ids([garbage.pk, bomb.pk]), (0, 2))
+        self.assertEqual(
+            set(Expense.objects.values_list('receipt_status', flat=True)), {Expense.RECEIPT_REJECTED}
+        )
+
+
+class ArchiveTests(TestCase):
+    """Archived years keep counting towards budgets and are read back by the expense list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user, archive_after_months=12)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def expense(self, amount, day, title='Shop'):
+        return Expense.objects.create(
+            title=title, amount=Decimal(amount), category=self.category, family=self.family,
+            paid_by=self.user, date=day
+        )
+
+    def archive(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return archive.archive_family(self.family, today=date(2024, 6, 1))
+
+    def test_archived_spend_still_counts(self):
+        archived = self.expense('50.00', date(2022, 3, 5))
+        budget = Budget.objects.create(
+            name='Food', family=self.family, category=self.category, amount=Decimal('100'),
+            start_date=date(2022, 3, 1), end_date=date(2022, 3, 31), created_by=self.user
+        )
+        self.assertEqual(self.archive()['expenses'], 1)
+        self.assertFalse(Expense.objects.filter(pk=archived.pk).exists())
+        self.assertTrue(Tombstone.objects.filter(collection='expenses', object_id=archived.pk).exists())
+        budget.refresh_from_db()
+        self.assertEqual(budget.spent_snapshot, Decimal('50.00'))
+
+        # A backdated expense refreshes the snapshot on top of the archived spend
+        self.expense('5.00', date(2022, 3, 10))
+        budget.refresh_from_db()
+        self.assertEqual(budget.spent_snapshot, Decimal('55.00'))
+
+        # So does recomputing the spend after the window changed
+        budget.end_date = date(2022, 4, 30)
+        budget.save()
+        self.assertEqual(budget.spent_amount, Decimal('55.00'))
+        self.assertEqual(Budget.objects.with_spent().get(pk=budget.pk).spent, Decimal('55.00'))
+
+    def test_list_reads_archived_years(self):
+        self.expense('30', date(2022, 5, 1), 'Old')
+        self.expense('10', date(2022, 6, 1), 'Older')
+        self.archive()
+        self.expense('20', date(2024, 2, 1), 'New')
+        url = '/api/expenses/expenses/'
+
+        response = self.client.get(url, {'end_date': '2022-12-31'})
+        self.assertEqual([row['title'] for row in response.data['results']], ['Older', 'Old'])
+        response = self.client.get(url, {'date': '2022-05-01'})
+        self.assertEqual([row['title'] for row in response.data['results']], ['Old'])
+        self.assertEqual(self.client.get(url, {'date': '2023-02-30'}).status_code, 400)
+
+        # Other orderings merge the archive into the page being read
+        response = self.client.get(url, {'include_archived': 'true', 'ordering': '-amount'})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([row['title'] for row in response.data['results']], ['Old', 'New', 'Older'])
+        merged = archive.read_through(
+            Expense.objects.order_by('amount'), archive.archived_expenses(archive.archives_for_range([self.family.pk])),
+            ['amount'], date(2023, 1, 1)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual([expense.title for expense in merged[0:2]], ['Older', 'New'])
+        self.assertIn('LIMIT 2', queries[-1]['sql'])
+
+
+class SparseFieldsetTests(TestCase):
+    """The values() list path matches the serializer, and fields/exclude trim the output"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='x', first_name='Ann', last_name='Lee'
+        )
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def expense(self, **kwargs):
+        return Expense.objects.create(
+            title='Shop', amount=Decimal('10.50'), category=self.category, family=self.family,
+            paid_by=self.user, date=date(2024, 1, 1), **kwargs
+        )
+
+    def test_values_path_matches_the_serializer(self):
+        self.expense(receipt_image=SimpleUploadedFile('receipt.png', b'image'), tags='food, weekly')
+        self.expense(description=None)
+        for params in ({}, {'exclude': 'description'}, {'fields': 'id,receipt_image,tag_list,paid_by'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/expenses/expenses/', params)
+                self.assertEqual(response.status_code, 200)
+                expected = ExpenseSerializer(
+                    Expense.objects.order_by('-date', '-created_at'), many=True,
+                    context={'request': Request(response.wsgi_request)}
+                ).data
+                self.assertEqual(response.data['results'], expected)
+        urls = {row['id']: row['receipt_image'] for row in response.data['results']}
+        with_receipt, without = Expense.objects.order_by('id')
+        self.assertTrue(urls[with_receipt.pk].startswith('http://testserver/media/'))
+        self.assertIsNone(urls[without.pk])
+
+    def test_fields_and_exclude(self):
+        expense = self.expense()
+        rows = self.client.get('/api/expenses/expenses/', {'fields': 'id,title'}).data['results']
+        self.assertEqual(rows, [{'id': expense.pk, 'title': 'Shop'}])
+        row = self.client.get('/api/expenses/expenses/', {'exclude': 'description,tags'}).data['results'][0]
+        self.assertNotIn('description', row)
+        self.assertIn('tag_list', row)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/expenses/expenses/{expense.pk}/', {'fields': 'title'})
+        self.assertEqual(response.data, {'title': 'Shop'})
+        select = next(query['sql'] for query in queries if 'FROM "expenses_expense"' in query['sql'])
+        self.assertIn('"expenses_expense"."title"', select)
+        self.assertNotIn('"expenses_expense"."description"', select)
+
+    def test_unknown_fields_are_rejected(self):
+        self.expense()
+        response = self.client.get('/api/expenses/expenses/', {'fields': 'id,bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bogus', str(response.data['fields']))
+        response = self.client.get(f'/api/expenses/expenses/{Expense.objects.get().pk}/', {'exclude': 'nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nope', str(response.data['exclude']))
+
+
+class RecurrenceTests(TestCase):
+    """Stored next occurrences, window expansion, materialization and upcoming bills"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Bills', family=cls.family, created_by=cls.user)
+
+    def rule(self, frequency, start_date, **kwargs):
+        return RecurringExpense.objects.create(
+            title=f'{frequency} bill', amount=Decimal('10'), category=self.category, family=self.family,
+            paid_by=self.user, frequency=frequency, start_date=start_date, **kwargs
+        )
+
+    def test_monthly_dates_clamp_without_drifting(self):
+        start = date(2024, 1, 31)
+        self.assertEqual(
+            [recurrence.nth(start, 'monthly', n) for n in range(4)],
+            [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)]
+        )
+        self.assertEqual(recurrence.index_on_or_after(start, 'monthly', date(2024, 3, 1)), 2)
+        self.assertEqual(recurrence.index_on_or_after(start, 'yearly', date(2026, 2, 1)), 3)
+        self.assertEqual(recurrence.index_on_or_after(start, 'weekly', date(2024, 2, 8)), 2)
+
+    def test_next_occurrence_follows_the_schedule(self):
+        today = timezone.now().date()
+        rule = self.rule('weekly', today - timedelta(days=10))
+        self.assertEqual(rule.next_occurrence, today + timedelta(days=4))
+
+        rule.start_date = today + timedelta(days=2)
+        rule.save()
+        self.assertEqual(RecurringExpense.objects.get(pk=rule.pk).next_occurrence, today + timedelta(days=2))
+
+        rule.is_active = False
+        rule.save()
+        self.assertIsNone(RecurringExpense.objects.get(pk=rule.pk).next_occurrence)
+
+        ended = self.rule('monthly', today - timedelta(days=40), end_date=today - timedelta(days=1))
+        self.assertIsNone(ended.next_occurrence)
+
+    def test_materialize_catches_up_once(self):
+        today = timezone.now().date()
+        rule = self.rule('daily', today)
+        later = today + timedelta(days=2)
+        self.assertEqual(recurrence.materialize(today=later), 3)
+        self.assertEqual(recurrence.materialize(today=later), 0)
+        self.assertEqual(
+            list(Expense.objects.order_by('date').values_list('date', flat=True)),
+            [today, today + timedelta(days=1), later]
+        )
+        rule.refresh_from_db()
+        self.assertEqual((rule.last_materialized, rule.next_occurrence), (later, later + timedelta(days=1)))
+
+    def test_materialize_rereads_each_rule(self):
+        today = timezone.now().date()
+        rule = self.rule('daily', today)
+        paused = self.rule('daily', today)
+        RecurringExpense.objects.filter(pk=paused.pk).update(is_active=False)
+        select_for_update = QuerySet.select_for_update
+
+        def materialized_elsewhere(queryset, *args, **kwargs):
+            # Another run advances the rule after this one read its batch
+            RecurringExpense.objects.filter(pk=rule.pk).update(
+                last_materialized=today, next_occurrence=today + timedelta(days=1)
+            )
+            return select_for_update(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'select_for_update', materialized_elsewhere):
+            self.assertEqual(recurrence.materialize(today=today), 0)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_upcoming_bills(self):
+        today = timezone.now().date()
+        self.rule('weekly', today)
+        self.rule('monthly', today + timedelta(days=3))
+        self.rule('daily', today, is_active=False)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/expenses/upcoming/', {'days': 14, 'family_id': self.family.pk})
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            [occurrence['date'] for occurrence in response.data['occurrences']],
+            [today, today + timedelta(days=3), today + timedelta(days=7)]
+        )
+        self.assertEqual(response.data['total'], Decimal('30'))
+
+        response = client.get('/api/expenses/upcoming/', {'days': 14, 'paid_by': 'me'})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(client.get('/api/expenses/upcoming/', {'days': 0}).status_code, 400)
+
+
+class CategorizerTests(TestCase):
+    """Rules, category names and history suggest categories for creation and bulk import"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.groceries, cls.dining, cls.transport = (
+            Category.objects.create(name=name, family=cls.family, created_by=cls.user)
+            for name in ('Groceries', 'Dining out', 'Transport')
+        )
+        for title, category in (
+            ('Weekly shop', cls.groceries), ('Weekly shop', cls.groceries), ('Pizza night', cls.dining),
+            ('Lunch with Sam', cls.dining), ('Train ticket', cls.transport), ('Corner shop', cls.groceries),
+        ):
+            Expense.objects.create(
+                title=title, amount=Decimal('10'), category=category, family=cls.family,
+                paid_by=cls.user, date=date(2024, 3, 1)
+            )
+        CategoryRule.objects.create(family=cls.family, category=cls.transport, keyword='uber', created_by=cls.user)
+        CategoryRule.objects.create(family=cls.family, category=cls.dining, keyword='uber eats', created_by=cls.user)
+
+    def setUp(self):
+        categorizer.invalidate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_sources_in_order_of_precedence(self):
+        matcher = categorizer.matcher_for(self.family.pk)
+        self.assertEqual(matcher.suggest('Uber to the airport'), (self.transport.pk, 1.0, 'rule'))
+        self.assertEqual(matcher.suggest('UBER EATS order'), (self.dining.pk, 1.0, 'rule'))
+        self.assertEqual(matcher.suggest('Dinner', 'dining out'), (self.dining.pk, 1.0, 'name'))
+        self.assertEqual(matcher.suggest('weekly  shop'), (self.groceries.pk, 1.0, 'history'))
+        self.assertEqual(matcher.suggest('Farm shop').source, 'words')
+        self.assertEqual(matcher.suggest('Farm shop').category_id, self.groceries.pk)
+        self.assertIsNone(matcher.suggest('Something else'))
+
+    def test_rule_changes_rebuild_the_matcher(self):
+        self.assertIsNone(categorizer.matcher_for(self.family.pk).suggest('Bus pass'))
+        CategoryRule.objects.create(family=self.family, category=self.transport, keyword='bus', created_by=self.user)
+        self.assertEqual(categorizer.matcher_for(self.family.pk).suggest('Bus pass').category_id, self.transport.pk)
+
+    def test_create_without_category_uses_the_suggestion(self):
+        data = {'title': 'Uber home', 'amount': '12.00', 'family': self.family.pk, 'date': '2024-03-02'}
+        response = self.client.post('/api/expenses/expenses/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['category'], self.transport.pk)
+
+        response = self.client.post('/api/expenses/expenses/', {**data, 'title': 'Mystery'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('category', response.data)
+
+    def test_import(self):
+        response = self.client.post('/api/expenses/import/', {'family_id': self.family.pk, 'expenses': [
+            {'title': 'Weekly shop', 'amount': '50', 'date': '2024-03-05'},
+            {'title': 'Parking', 'amount': '3', 'date': '2024-03-05', 'category_id': self.transport.pk},
+            {'title': 'Mystery', 'amount': '3', 'date': '2024-03-05'},
+            {'title': 'No amount', 'date': '2024-03-05'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(row['status'], row.get('category_source')) for row in response.data['results']],
+            [('created', 'history'), ('created', 'given'), ('uncategorized', None), ('invalid', None)]
+        )
+        self.assertEqual(Expense.objects.get(pk=response.data['results'][0]['id']).category, self.groceries)
+
+    def test_import_query_count_does_not_grow_with_rows(self):
+        counts = []
+        for size in (5, 50):
+            rows = [{'title': f'Weekly shop {i}', 'amount': '5', 'date': '2024-03-06'} for i in range(size)]
+            categorizer.invalidate()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    '/api/expenses/import/', {'family_id': self.family.pk, 'expenses': rows}, format='json'
+                )
+            self.assertEqual(response.data['summary']['created'], size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class AutocompleteTests(TestCase):
+    """Prefix index of titles and tags, ranked by decayed frequency and kept current by expense writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+
+    def setUp(self):
+        autocomplete.invalidate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def expense(self, title, day, tags=None):
+        return Expense.objects.create(
+            title=title, amount=Decimal('10'), category=self.category, family=self.family,
+            paid_by=self.user, date=day, tags=tags
+        )
+
+    def complete(self, query, **params):
+        response = self.client.get(
+            '/api/expenses/autocomplete/', {'family_id': self.family.pk, 'q': query, **params}
+        )
+        return [result['value'] for result in response.data['results']]
+
+    def test_far_dates_do_not_overflow(self):
+        self.expense('Distant past', date(1, 1, 1))
+        self.assertEqual(self.complete('dis'), ['Distant past'])
+        # Written while the index is loaded, then read back from a fresh build
+        with self.captureOnCommitCallbacks(execute=True):
+            self.expense('Distant future', date(9999, 12, 31))
+        self.assertEqual(self.complete('dis'), ['Distant future', 'Distant past'])
+        autocomplete.invalidate()
+        self.assertEqual(self.complete('dis'), ['Distant future', 'Distant past'])
+
+    def test_string_dates_are_indexed(self):
+        self.assertEqual(self.complete('gro'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            expense = self.expense('Groceries', '2024-01-02')
+        self.assertEqual(self.complete('gro'), ['Groceries'])
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.title = 'Market'
+            expense.date = '2024-01-03'
+            expense.save()
+        self.assertEqual(self.complete('gro'), [])
+        self.assertEqual(self.complete('mar'), ['Market'])
+
+    def test_ranking_and_word_prefixes(self):
+        for day in (date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)):
+            self.expense('Weekly shop', day, tags='food, weekly')
+        self.expense('Shoes', date(2024, 6, 1), tags='clothes')
+        self.expense('Shoes', date(2024, 6, 2))
+        self.expense('Shopping mall', date(2023, 1, 1))
+
+        # Two recent uses outweigh three from five months earlier
+        self.assertEqual(self.complete('sho'), ['Shoes', 'Weekly shop', 'Shopping mall'])
+        self.assertEqual(self.complete('  WEEK'), ['Weekly shop'])
+        self.assertEqual(self.complete('sho', limit=1), ['Shoes'])
+        self.assertEqual(self.complete('f', field='tags'), ['food'])
+        self.assertEqual(self.complete(''), [])
+        self.assertEqual(self.client.get('/api/expenses/autocomplete/', {'q': 'a'}).status_code, 400)
+
+    def test_writes_update_the_loaded_index(self):
+        shop = self.expense('Weekly shop', date(2024, 1, 1))
+        self.assertEqual(self.complete('we'), ['Weekly shop'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.expense('Wedding gift', date(2024, 1, 2))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.complete('we'), ['Wedding gift', 'Weekly shop'])
+        self.assertEqual(len(queries), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            shop.title = 'Groceries'
+            shop.save()
+        self.assertEqual(self.complete('we'), ['Wedding gift'])
+        self.assertEqual(self.complete('gro'), ['Groceries'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/expenses/import/', {'family_id': self.family.pk, 'expenses': [
+                {'title': 'Web hosting', 'amount': '5', 'date': '2024-01-03', 'category_id': self.category.pk},
+            ]}, format='json')
+        self.assertEqual(self.complete('we'), ['Web hosting', 'Wedding gift'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.get(title='Wedding gift').delete()
+        self.assertEqual(self.complete('we'), ['Web hosting'])
+        self.assertEqual(
+            self.complete('we'), [term['value'] for term in autocomplete.build(self.family.pk, 'title').complete('we')]
+        )
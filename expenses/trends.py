@@ -0,0 +1,204 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import chain
+
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+
+from budgets.tree import at_level
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+GROUP_BY_CHOICES = ('category', 'member')
+
+# Number of buckets shown when the client does not pass a start_date
+DEFAULT_BUCKETS = {
+    'day': 30,
+    'week': 12,
+    'month': 12,
+    'quarter': 8,
+    'year': 5,
+}
+
+# Upper bound on buckets per series (ten years of daily data)
+MAX_BUCKETS = 3660
+
+_MONTHS_PER_BUCKET = {'month': 1, 'quarter': 3, 'year': 12}
+
+
+def _add_months(value, months):
+    year, month = divmod(value.month - 1 + months, 12)
+    return date(value.year + year, month + 1, 1)
+
+
+def bucket_start(value, granularity):
+    """Return the first day of the bucket containing ``value``"""
+    if granularity == 'day':
+        return value
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularity == 'month':
+        return value.replace(day=1)
+    if granularity == 'quarter':
+        return date(value.year, 3 * ((value.month - 1) // 3) + 1, 1)
+    return date(value.year, 1, 1)
+
+
+def shift_bucket(value, granularity, steps=1):
+    """Move a bucket start forwards (or backwards) by ``steps`` buckets"""
+    if granularity == 'day':
+        return value + timedelta(days=steps)
+    if granularity == 'week':
+        return value + timedelta(weeks=steps)
+    return _add_months(value, steps * _MONTHS_PER_BUCKET[granularity])
+
+
+def bucket_count(start, end, granularity):
+    """Number of buckets between ``start`` and ``end`` inclusive, without listing them"""
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    if granularity == 'day':
+        return (last - first).days + 1
+    if granularity == 'week':
+        return (last - first).days // 7 + 1
+    months = (last.year - first.year) * 12 + last.month - first.month
+    return months // _MONTHS_PER_BUCKET[granularity] + 1
+
+
+def bucket_range(start, end, granularity):
+    """List every bucket start between ``start`` and ``end`` inclusive"""
+    buckets = []
+    current = bucket_start(start, granularity)
+    while current <= end:
+        buckets.append(current)
+        current = shift_bucket(current, granularity)
+    return buckets
+
+
+def default_start(end, granularity):
+    """Start date covering the default number of buckets ending at ``end``"""
+    steps = DEFAULT_BUCKETS[granularity] - 1
+    return shift_bucket(bucket_start(end, granularity), granularity, -steps)
+
+
+def _group_fields(group_by, category_level=None):
+    if group_by == 'category' and category_level is not None:
+        return ['rollup_category_id', 'rollup_category_name']
+    if group_by == 'category':
+        return ['category_id', 'category__name']
+    if group_by == 'member':
+        return ['paid_by_id', 'paid_by__first_name', 'paid_by__last_name']
+    return []
+
+
+def _group_key(row, group_by):
+    if 'rollup_category_id' in row:
+        return row['rollup_category_id'], row['rollup_category_name']
+    if group_by == 'category':
+        return row['category_id'], row['category__name']
+    if group_by == 'member':
+        label = f"{row['paid_by__first_name']} {row['paid_by__last_name']}".strip()
+        return row['paid_by_id'], label
+    return None, 'All expenses'
+
+
+def _empty_series(buckets):
+    return {bucket: {'total': Decimal('0'), 'count': 0} for bucket in buckets}
+
+
+def _to_list(points):
+    return [
+        {'period': period, 'total': point['total'], 'count': point['count']}
+        for period, point in points.items()
+    ]
+
+
+def _grouped(queryset, start, end, granularity, group_fields, total, count):
+    return queryset.filter(
+        date__gte=start,
+        date__lte=end
+    ).annotate(
+        bucket=Trunc('date', granularity, output_field=DateField())
+    ).values('bucket', *group_fields).annotate(
+        total=total,
+        count=count
+    ).order_by('bucket')
+
+
+def build_trends(queryset, start, end, granularity, group_by=None, compare=True, rollups=None, category_level=None):
+    """
+    Bucket expense totals between ``start`` and ``end`` by ``granularity``.
+
+    The range is widened to whole buckets. When ``compare`` is set the same
+    number of buckets immediately before the range is returned alongside as
+    the previous period. Both periods come from a single grouped query; empty
+    buckets are filled with zeros here rather than by the client. Archived
+    expenses are covered by a second query over ``rollups``, an
+    ``ExpenseRollup`` queryset, when given. Grouped by category, a
+    ``category_level`` rolls each category up to its ancestor at that level.
+    """
+    buckets = bucket_range(start, end, granularity)
+    range_start = buckets[0]
+    range_end = shift_bucket(buckets[-1], granularity) - timedelta(days=1)
+
+    previous_buckets = []
+    query_start = range_start
+    if compare:
+        query_start = shift_bucket(range_start, granularity, -len(buckets))
+        previous_buckets = bucket_range(query_start, range_start - timedelta(days=1), granularity)
+
+    group_fields = _group_fields(group_by, category_level)
+    if group_by == 'category' and category_level is not None:
+        queryset = at_level(queryset, category_level)
+        if rollups is not None:
+            rollups = at_level(rollups, category_level)
+    rows = _grouped(queryset, query_start, range_end, granularity, group_fields, Sum('amount'), Count('id'))
+    if rollups is not None:
+        rows = chain(rows, _grouped(rollups, query_start, range_end, granularity, group_fields, Sum('total'), Sum('count')))
+
+    series = {}
+    for row in rows:
+        key, label = _group_key(row, group_by)
+        if key not in series:
+            series[key] = {
+                'key': key,
+                'label': label,
+                'current': _empty_series(buckets),
+                'previous': _empty_series(previous_buckets),
+            }
+        bucket = row['bucket']
+        target = series[key]['current'] if bucket >= range_start else series[key]['previous']
+        point = target.setdefault(bucket, {'total': Decimal('0'), 'count': 0})
+        point['total'] += row['total'] or Decimal('0')
+        point['count'] += row['count'] or 0
+
+    if not group_by and not series:
+        series[None] = {
+            'key': None,
+            'label': 'All expenses',
+            'current': _empty_series(buckets),
+            'previous': _empty_series(previous_buckets),
+        }
+
+    results = []
+    for item in series.values():
+        total = sum((point['total'] for point in item['current'].values()), Decimal('0'))
+        previous_total = sum((point['total'] for point in item['previous'].values()), Decimal('0'))
+        results.append({
+            'key': item['key'],
+            'label': item['label'],
+            'total': total,
+            'previous_total': previous_total if compare else None,
+            'current': _to_list(item['current']),
+            'previous': _to_list(item['previous']) if compare else None,
+        })
+    results.sort(key=lambda item: item['total'], reverse=True)
+
+    return {
+        'granularity': granularity,
+        'group_by': group_by,
+        'start_date': range_start,
+        'end_date': range_end,
+        'previous_start_date': query_start if compare else None,
+        'previous_end_date': range_start - timedelta(days=1) if compare else None,
+        'buckets': buckets,
+        'series': results,
+    }
@@ -10,9 +10,18 @@ urlpatterns = [
     path('recurring-expenses/', views.RecurringExpenseListCreateView.as_view(), name='recurring-expense-list-create'),
     path('recurring-expenses/<int:pk>/', views.RecurringExpenseDetailView.as_view(), name='recurring-expense-detail'),
     
+    path('category-rules/', views.CategoryRuleListCreateView.as_view(), name='category-rule-list-create'),
+    path('category-rules/<int:pk>/', views.CategoryRuleDetailView.as_view(), name='category-rule-detail'),
+
     path('expenses/<int:expense_id>/shares/', views.ExpenseShareListCreateView.as_view(), name='expense-share-list-create'),
     
     path('statistics/', views.expense_statistics, name='expense-statistics'),
+    path('trends/', views.expense_trends, name='expense-trends'),
+    path('export/', views.export_expenses, name='expense-export'),
     path('recent/', views.recent_expenses, name='recent-expenses'),
+    path('upcoming/', views.upcoming_bills, name='upcoming-bills'),
+    path('suggest-category/', views.suggest_category, name='suggest-category'),
+    path('import/', views.import_expenses, name='expense-import'),
+    path('autocomplete/', views.autocomplete_expenses, name='expense-autocomplete'),
 ]
 
@@ -1,19 +1,36 @@
 from rest_framework import generics, permissions, filters, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Sum, Count
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
-from .models import Expense, RecurringExpense, ExpenseShare
-from .serializers import ExpenseSerializer, ExpenseCreateSerializer, RecurringExpenseSerializer, ExpenseShareSerializer
+from decimal import Decimal
+from accounts.models import FamilyMember
+from budgets import tree
+from family_budget.fieldsets import SparseFieldsetMixin
+from .filters import ExpenseFilter
+from .models import CategoryRule, Expense, ExpenseRollup, RecurringExpense, ExpenseShare
+from . import archive, autocomplete, categorizer, export, imports, recurrence, trends
+from .serializers import (
+    CategoryRuleSerializer, ExpenseSerializer, ExpenseCreateSerializer,
+    RecurringExpenseSerializer, ExpenseShareSerializer
+)
 
 
-class ExpenseListCreateView(generics.ListCreateAPIView):
+# Longest window the upcoming bills endpoint expands
+MAX_UPCOMING_DAYS = 366
+
+
+class ExpenseListCreateView(SparseFieldsetMixin, generics.ListCreateAPIView):
     """List and create expenses"""
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['family', 'category', 'paid_by', 'payment_method', 'date']
+    filterset_class = ExpenseFilter
     search_fields = ['title', 'description', 'tags']
     ordering_fields = ['title', 'amount', 'date', 'created_at']
     ordering = ['-date', '-created_at']
@@ -29,17 +46,114 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
             family__members__is_active=True
         ).distinct()
 
+    def list(self, request, *args, **kwargs):
+        # Archive segments are only opened when the date range reaches them
+        start, end = date_range(request)
+        day = query_date(request, 'date')
+        if day:
+            start = end = day
+        params = request.query_params
+        if start or end or params.get('include_archived', '').lower() in ('true', '1', 'yes'):
+            archives = archive.archives_for_range(scoped_family_ids(request), start, end)
+            if archives:
+                return self.list_with_archives(archives, start, end)
+        return super().list(request, *args, **kwargs)
+
+    def list_with_archives(self, archives, start, end):
+        hot = self.filter_queryset(self.get_queryset())
+        ordering = filters.OrderingFilter().get_ordering(self.request, hot, self) or self.ordering
+        archived = archive.archived_expenses(
+            archives, start, end, archive_filters(self.request), self.request.query_params.get('search')
+        )
+        # The filterset has validated the amounts while filtering ``hot``
+        params = self.request.query_params
+        if params.get('min_amount'):
+            archived = [expense for expense in archived if expense.amount >= Decimal(params['min_amount'])]
+        if params.get('max_amount'):
+            archived = [expense for expense in archived if expense.amount <= Decimal(params['max_amount'])]
+        if params.get('category_tree'):
+            subtree = set(tree.descendants(params['category_tree']).values_list('descendant_id', flat=True))
+            archived = [expense for expense in archived if expense.category_id in subtree]
+        boundary = max(archive.hot_boundaries({item.family_id for item in archives}).values())
+        page = self.paginate_queryset(archive.read_through(hot, archived, ordering, boundary))
+        archive.attach_related(page)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+def query_date(request, name):
+    """The ``name`` query parameter as a date, None when absent; 400 when malformed"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({'error': f'{name} must be a valid date in the YYYY-MM-DD format'})
+    return parsed
+
+
+def date_range(request):
+    """(start_date, end_date) query parameters of a request, either may be None"""
+    return query_date(request, 'start_date'), query_date(request, 'end_date')
+
+
+def scoped_family_ids(request, param='family'):
+    """Ids of the user's families, narrowed to the ``param`` query parameter"""
+    family_ids = FamilyMember.objects.filter(user=request.user, is_active=True).values_list('family_id', flat=True)
+    family_id = request.query_params.get(param)
+    if family_id:
+        family_ids = family_ids.filter(family_id=family_id if family_id.isdigit() else None)
+    return list(family_ids)
+
+
+def category_level(request):
+    """The ``category_level`` query parameter as an int, or None"""
+    value = request.query_params.get('category_level')
+    if value is None or value == '':
+        return None
+    if not value.isdigit():
+        raise ValidationError({'error': 'category_level must be a non-negative integer'})
+    return int(value)
 
-class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
+
+def archive_filters(request):
+    """The expense list's exact-match filters, applied to archived rows"""
+    params = request.query_params
+    return {
+        attname: params[name]
+        for name, attname in (
+            ('family', 'family_id'),
+            ('category', 'category_id'),
+            ('paid_by', 'paid_by_id'),
+            ('payment_method', 'payment_method'),
+        )
+        if params.get(name)
+    }
+
+
+class ExpenseDetailView(SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Expense detail, update, and delete"""
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Expense.objects.filter(
+        queryset = Expense.objects.filter(
             family__members__user=self.request.user,
             family__members__is_active=True
         ).distinct()
+        if self.request.method == 'GET':
+            related = [
+                name for name, wanted in (
+                    ('category__family', self.wants('category')),
+                    ('family', self.wants('family')),
+                    ('paid_by', self.wants('paid_by')),
+                ) if wanted
+            ]
+            queryset = queryset.select_related(*related)
+        return queryset
 
 
 class RecurringExpenseListCreateView(generics.ListCreateAPIView):
@@ -56,7 +170,7 @@ class RecurringExpenseListCreateView(generics.ListCreateAPIView):
         return RecurringExpense.objects.filter(
             family__members__user=self.request.user,
             family__members__is_active=True
-        ).distinct()
+        ).distinct().select_related('paid_by', 'category__family', 'family')
 
 
 class RecurringExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -68,7 +182,34 @@ class RecurringExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
         return RecurringExpense.objects.filter(
             family__members__user=self.request.user,
             family__members__is_active=True
-        ).distinct()
+        ).distinct().select_related('paid_by', 'category__family', 'family')
+
+
+class CategoryRuleListCreateView(generics.ListCreateAPIView):
+    """List and create the keywords used to categorize a family's expenses"""
+    serializer_class = CategoryRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_fields = ['family', 'category']
+    search_fields = ['keyword']
+
+    def get_queryset(self):
+        return CategoryRule.objects.filter(
+            family__members__user=self.request.user,
+            family__members__is_active=True
+        ).select_related('created_by')
+
+
+class CategoryRuleDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Category rule detail, update, and delete"""
+    serializer_class = CategoryRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return CategoryRule.objects.filter(
+            family__members__user=self.request.user,
+            family__members__is_active=True
+        )
 
 
 class ExpenseShareListCreateView(generics.ListCreateAPIView):
@@ -96,6 +237,7 @@ def expense_statistics(request):
     """Get expense statistics for dashboard"""
     family_id = request.query_params.get('family_id')
     period = request.query_params.get('period', 'month')  # month, year, week
+    level = category_level(request)
     
     # Calculate date range based on period
     today = timezone.now().date()
@@ -121,11 +263,21 @@ def expense_statistics(request):
     total_expenses = queryset.aggregate(total=Sum('amount'))['total'] or 0
     expense_count = queryset.count()
     
-    # Expenses by category
-    expenses_by_category = queryset.values('category__name').annotate(
-        total=Sum('amount'),
-        count=Count('id')
-    ).order_by('-total')
+    # Expenses by category, or by the categories at ``category_level``
+    if level is None:
+        expenses_by_category = queryset.values('category__name').annotate(
+            total=Sum('amount'),
+            count=Count('id')
+        ).order_by('-total')
+    else:
+        expenses_by_category = [
+            {'category_id': row['rollup_category_id'], 'category__name': row['rollup_category_name'],
+             'total': row['total'], 'count': row['count']}
+            for row in tree.at_level(queryset, level).values('rollup_category_id', 'rollup_category_name').annotate(
+                total=Sum('amount'),
+                count=Count('id')
+            ).order_by('-total')
+        ]
     
     # Expenses by payment method
     expenses_by_payment = queryset.values('payment_method').annotate(
@@ -152,6 +304,61 @@ def expense_statistics(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def expense_trends(request):
+    """Get bucketed spend over time with the comparable previous period"""
+    family_id = request.query_params.get('family_id')
+    granularity = request.query_params.get('granularity', 'month')
+    group_by = request.query_params.get('group_by') or None
+    compare = request.query_params.get('compare', 'true').lower() not in ('false', '0', 'no')
+
+    if granularity not in trends.GRANULARITIES:
+        return Response(
+            {'error': f"granularity must be one of: {', '.join(trends.GRANULARITIES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if group_by and group_by not in trends.GROUP_BY_CHOICES:
+        return Response(
+            {'error': f"group_by must be one of: {', '.join(trends.GROUP_BY_CHOICES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    start_date, end_date = date_range(request)
+    end_date = end_date or timezone.now().date()
+    start_date = start_date or trends.default_start(end_date, granularity)
+    if start_date > end_date:
+        return Response(
+            {'error': 'start_date must be on or before end_date'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if trends.bucket_count(start_date, end_date, granularity) > trends.MAX_BUCKETS:
+        return Response(
+            {'error': f'Requested range exceeds {trends.MAX_BUCKETS} {granularity} buckets'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    queryset = Expense.objects.filter(
+        family__members__user=request.user,
+        family__members__is_active=True
+    )
+
+    # Archived expenses are only present as daily rollups
+    rollups = ExpenseRollup.objects.filter(
+        family__members__user=request.user,
+        family__members__is_active=True
+    )
+
+    if family_id:
+        queryset = queryset.filter(family_id=family_id)
+        rollups = rollups.filter(family_id=family_id)
+
+    return Response(trends.build_trends(
+        queryset, start_date, end_date, granularity,
+        group_by=group_by, compare=compare, rollups=rollups, category_level=category_level(request)
+    ))
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def recent_expenses(request):
@@ -162,7 +369,7 @@ def recent_expenses(request):
     queryset = Expense.objects.filter(
         family__members__user=request.user,
         family__members__is_active=True
-    ).select_related('category', 'paid_by', 'family')
+    ).select_related('category__family', 'paid_by', 'family')
     
     if family_id:
         queryset = queryset.filter(family_id=family_id)
@@ -170,4 +377,155 @@ def recent_expenses(request):
     recent_expenses = queryset.order_by('-date', '-created_at')[:limit]
     serializer = ExpenseSerializer(recent_expenses, many=True)
     
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [export.CSVRenderer])
+def export_expenses(request):
+    """Stream expenses as CSV, including archived ones when the range reaches them"""
+    start, end = date_range(request)
+    family_ids = scoped_family_ids(request, 'family_id')
+    queryset = Expense.objects.filter(family_id__in=family_ids)
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    archives = archive.archives_for_range(family_ids, start, end)
+
+    response = StreamingHttpResponse(
+        export.export_rows(queryset, archives, start, end),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = 'attachment; filename="expenses.csv"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def upcoming_bills(request):
+    """Occurrences of recurring expenses due in the next ``days`` days"""
+    days = request.query_params.get('days', '30')
+    if not days.isdigit() or not 1 <= int(days) <= MAX_UPCOMING_DAYS:
+        return Response(
+            {'error': f'days must be between 1 and {MAX_UPCOMING_DAYS}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    today = timezone.now().date()
+    end_date = today + timedelta(days=int(days) - 1)
+
+    rules = RecurringExpense.objects.filter(
+        family_id__in=scoped_family_ids(request, 'family_id'),
+        next_occurrence__lte=end_date
+    ).select_related('category')
+    paid_by = request.query_params.get('paid_by')
+    if paid_by:
+        if paid_by == 'me':
+            paid_by = str(request.user.pk)
+        rules = rules.filter(paid_by_id=paid_by if paid_by.isdigit() else None)
+
+    occurrences = [
+        {
+            'date': day,
+            'recurring_expense': rule.pk,
+            'title': rule.title,
+            'amount': rule.amount,
+            'category_id': rule.category_id,
+            'category': rule.category.name,
+            'family_id': rule.family_id,
+            'paid_by_id': rule.paid_by_id,
+            'payment_method': rule.payment_method,
+        }
+        for day, rule in recurrence.expand(rules, today, end_date)
+    ]
+    return Response({
+        'start_date': today,
+        'end_date': end_date,
+        'count': len(occurrences),
+        'total': sum((occurrence['amount'] for occurrence in occurrences), Decimal('0')),
+        'occurrences': occurrences,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def suggest_category(request):
+    """Category suggested for an expense ``title`` (and ``tags``) in ``family_id``"""
+    if not request.query_params.get('family_id'):
+        return Response({'error': 'family_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    family_ids = scoped_family_ids(request, 'family_id')
+    if not family_ids:
+        return Response({'error': 'Family not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    suggestion = categorizer.matcher_for(family_ids[0]).suggest(
+        request.query_params.get('title', ''), request.query_params.get('tags')
+    )
+    if suggestion is None:
+        return Response({'category_id': None, 'confidence': 0, 'source': None, 'automatic': False})
+    return Response({
+        **suggestion._asdict(),
+        'automatic': suggestion.confidence >= categorizer.MIN_CONFIDENCE,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def autocomplete_expenses(request):
+    """
+    Titles (or, with ``field=tags``, tags) of ``family_id`` that contain a
+    word starting with ``q``, most used and most recent first.
+    """
+    field = request.query_params.get('field', 'title')
+    if field not in autocomplete.FIELDS:
+        return Response({'error': 'field must be title or tags'}, status=status.HTTP_400_BAD_REQUEST)
+    if not request.query_params.get('family_id'):
+        return Response({'error': 'family_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= autocomplete.MAX_LIMIT:
+        return Response(
+            {'error': f'limit must be between 1 and {autocomplete.MAX_LIMIT}'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    family_ids = scoped_family_ids(request, 'family_id')
+    if not family_ids:
+        return Response({'error': 'Family not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    query = request.query_params.get('q', '')
+    return Response({
+        'field': field,
+        'query': query,
+        'results': autocomplete.index_for(family_ids[0], field).complete(query, limit),
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def import_expenses(request):
+    """
+    Create many expenses of one family at once. Rows without a
+    ``category_id`` are categorized from the family's rules and history.
+    """
+    family_id = request.data.get('family_id')
+    rows = request.data.get('expenses')
+    if not str(family_id).isdigit() or not FamilyMember.objects.filter(
+        family_id=family_id, user=request.user, is_active=True
+    ).exists():
+        return Response({'error': 'Family not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not isinstance(rows, list) or not rows:
+        return Response({'error': 'expenses must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > imports.MAX_ROWS:
+        return Response(
+            {'error': f'At most {imports.MAX_ROWS} expenses can be imported at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    outcomes = imports.import_expenses(int(family_id), request.user, rows)
+    summary = dict.fromkeys(['created', 'invalid', 'uncategorized'], 0)
+    for outcome in outcomes:
+        summary[outcome['status']] += 1
+    return Response(
+        {'results': outcomes, 'summary': summary},
+        status=status.HTTP_201_CREATED if summary['created'] else status.HTTP_200_OK
+    )
@@ -2,6 +2,8 @@
 ASGI config for family_budget project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests for ``/api/events/`` are served by the server-sent event stream in
+``sync.stream``; everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +15,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'family_budget.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from sync.broker import get_broker  # noqa: E402  (needs the app registry)
+from sync.stream import event_stream  # noqa: E402
+
+# Fail at startup, not on the first event, when the broker is misconfigured
+get_broker()
+
+EVENT_STREAM_PATH = '/api/events/'
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENT_STREAM_PATH:
+        await event_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
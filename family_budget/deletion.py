@@ -0,0 +1,99 @@
+"""
+Chunked, bottom-up deletion for large object graphs.
+
+``Model.delete()`` hands everything to Django's cascade collector, which
+loads every dependent row (because delete signals are connected to most of
+them) and removes them one model at a time inside a single transaction.
+``delete_queryset`` instead walks the same ``on_delete`` graph, deleting
+dependents before their parents in batches of primary keys, each batch in
+its own short transaction and without instantiating models.
+
+Per-row ``post_delete`` receivers do not run. Apps that need to react to
+deletions connect to ``bulk_deleted``, which is sent once per batch with the
+rows about to be removed as dictionaries. ``family_ids`` lists families
+being deleted as a whole, so receivers can skip bookkeeping for rows whose
+family is going away too. ``expenses.archive`` sends it with
+``archived=True`` for rows moved to cold storage: their files and spend
+live on in the archive.
+
+A run that is interrupted leaves the parents in place and can simply be
+repeated.
+"""
+from collections import Counter
+
+from django.db import models, router, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.models.signals import ModelSignal
+from django.db.models.sql import DeleteQuery
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+# sender=model, rows=[{attname: value}], family_ids=set, archived=bool (optional)
+bulk_deleted = ModelSignal(use_caching=True)
+
+_FAST = (models.CASCADE, models.SET_NULL, models.DO_NOTHING)
+
+
+def _relations(model):
+    return [
+        relation for relation in get_candidate_relations_to_delete(model._meta)
+        if relation.on_delete is not models.DO_NOTHING
+    ]
+
+
+def delete_rows(model, pks):
+    """
+    Delete rows of ``model`` by primary key with plain DELETE statements: no
+    collector, no cascades and no signals. Returns the number deleted.
+    """
+    return DeleteQuery(model).delete_batch(list(pks), router.db_for_write(model))
+
+
+def _delete_batch(model, pks, family_ids):
+    with transaction.atomic():
+        if bulk_deleted.has_listeners(model):
+            rows = list(model._base_manager.filter(pk__in=pks).values(
+                *[field.attname for field in model._meta.concrete_fields]
+            ))
+            bulk_deleted.send(sender=model, rows=rows, family_ids=family_ids)
+        return delete_rows(model, pks)
+
+
+def delete_queryset(queryset, batch_size=BATCH_SIZE, family_ids=()):
+    """
+    Delete ``queryset`` and everything that cascades from it, in batches of
+    ``batch_size`` rows. Returns a Counter of deleted rows per model label.
+    """
+    model = queryset.model
+    relations = _relations(model)
+    counts = Counter()
+    family_ids = set(family_ids)
+    queryset = queryset.order_by('pk')
+
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+
+        if any(relation.on_delete not in _FAST for relation in relations):
+            # PROTECT, RESTRICT and SET(...) need the collector's checks
+            deleted, per_model = model._base_manager.filter(pk__in=pks).delete()
+            counts.update(per_model)
+            continue
+
+        for relation in relations:
+            related = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': pks})
+            if relation.related_model is model:
+                related = related.exclude(pk__in=pks)
+            if relation.on_delete is models.CASCADE:
+                counts.update(delete_queryset(related, batch_size, family_ids))
+            else:
+                changes = {relation.field.name: None}
+                if any(field.name == 'updated_at' for field in relation.related_model._meta.concrete_fields):
+                    # Let delta sync clients see the cleared reference
+                    changes['updated_at'] = timezone.now()
+                related.update(**changes)
+
+        counts[model._meta.label] += _delete_batch(model, pks, family_ids)
+    return counts
@@ -0,0 +1,172 @@
+"""
+Sparse fieldsets (``?fields=`` / ``?exclude=``) and a ``.values()`` read path.
+
+Serializers opt in with ``SparseFieldsetSerializerMixin`` and views with
+``SparseFieldsetMixin``. Serializers may declare ``values_fields`` mapping a
+field name to ``(value paths, builder)`` for fields that cannot be derived
+from a model column, such as ``StringRelatedField`` or properties; list views
+then build rows from dictionaries instead of model instances whenever every
+requested field can be produced that way.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+
+def _parse(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+
+def requested_field_names(request, available):
+    """
+    Readable field names the client asked for, in serializer order. Raises
+    ``ValidationError`` (a 400) naming any field that does not exist.
+    """
+    fields = _parse(request.query_params.get('fields'))
+    exclude = _parse(request.query_params.get('exclude'))
+    errors = {
+        param: [f"Unknown fields: {', '.join(sorted(names - set(available)))}."]
+        for param, names in (('fields', fields), ('exclude', exclude)) if names - set(available)
+    }
+    if errors:
+        raise serializers.ValidationError(errors)
+    return [
+        name for name in available
+        if (not fields or name in fields) and name not in exclude
+    ]
+
+
+def is_sparse_request(request):
+    return request is not None and request.method == 'GET' and (
+        'fields' in request.query_params or 'exclude' in request.query_params
+    )
+
+
+class SparseFieldsetSerializerMixin:
+    """Drop fields the client did not ask for from GET responses"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if not is_sparse_request(request):
+            return
+        readable = [name for name, field in self.fields.items() if not field.write_only]
+        keep = set(requested_field_names(request, readable))
+        for name in readable:
+            if name not in keep:
+                self.fields.pop(name)
+
+
+def _plain_builder(field):
+    def build(value):
+        # Mirrors Serializer.to_representation: None is never passed on
+        return None if value is None else field.to_representation(value)
+    return build
+
+
+def _file_builder(field, model_field):
+    def build(value):
+        if not value:
+            return None
+        return field.to_representation(model_field.attr_class(None, model_field, value))
+    return build
+
+
+def values_plan(serializer):
+    """
+    Return [(name, paths, builder)] producing ``serializer``'s output from a
+    ``.values()`` row, or None if some field needs a model instance.
+    """
+    model = serializer.Meta.model
+    custom = getattr(serializer, 'values_fields', {})
+    plan = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in custom:
+            paths, build = custom[name]
+            plan.append((name, tuple(paths), lambda row, build=build: build(row)))
+            continue
+        if '.' in field.source or field.source == '*':
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete:
+            return None
+        if isinstance(field, PrimaryKeyRelatedField):
+            plan.append((name, (field.source,), lambda row, path=field.source: row[path]))
+        elif isinstance(field, serializers.FileField):
+            build = _file_builder(field, model_field)
+            plan.append((name, (field.source,), lambda row, path=field.source, build=build: build(row[path])))
+        elif isinstance(field, (serializers.Serializer, serializers.ListSerializer, serializers.RelatedField)):
+            return None
+        else:
+            build = _plain_builder(field)
+            plan.append((name, (field.source,), lambda row, path=field.source, build=build: build(row[path])))
+    return plan
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin trimming queries to the requested fields.
+
+    ``wants(*names)`` tells ``get_queryset`` whether joins or annotations
+    behind a field are needed. With ``fields``/``exclude`` present, the
+    queryset is restricted with ``.only()``; list requests whose fields are all
+    covered by ``values_plan`` skip model instances and the serializer.
+    """
+
+    def get_requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            serializer = self.get_serializer_class()()
+            readable = [name for name, field in serializer.fields.items() if not field.write_only]
+            if is_sparse_request(self.request):
+                self._requested_fields = requested_field_names(self.request, readable)
+            else:
+                self._requested_fields = readable
+        return self._requested_fields
+
+    def wants(self, *names):
+        return any(name in self.get_requested_fields() for name in names)
+
+    def _model_columns(self, serializer):
+        model = serializer.Meta.model
+        custom = getattr(serializer, 'values_fields', {})
+        columns = {model._meta.pk.name}
+        for name in self.get_requested_fields():
+            field = serializer.fields[name]
+            paths = custom[name][0] if name in custom else (field.source,)
+            for path in paths:
+                root = path.split('__')[0].split('.')[0]
+                try:
+                    if model._meta.get_field(root).concrete:
+                        columns.add(root)
+                except FieldDoesNotExist:
+                    continue
+        return columns
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if is_sparse_request(self.request):
+            queryset = queryset.only(*self._model_columns(self.get_serializer()))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        plan = values_plan(serializer) if request.method == 'GET' else None
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        plan = [entry for entry in plan if entry[0] in self.get_requested_fields()]
+        paths = ['pk'] + sorted({path for _, entry_paths, _ in plan for path in entry_paths})
+        queryset = super().filter_queryset(self.get_queryset()).values(*paths)
+
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        data = [{name: build(row) for name, _, build in plan} for row in rows]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,260 @@
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Responses smaller than this many bytes are sent uncompressed
+MIN_SIZE = getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+GZIP_LEVEL = getattr(settings, 'API_COMPRESSION_GZIP_LEVEL', 6)
+BROTLI_QUALITY = getattr(settings, 'API_COMPRESSION_BROTLI_QUALITY', 5)
+# Content type prefixes worth compressing; images, archives etc. are not
+CONTENT_TYPES = tuple(getattr(settings, 'API_COMPRESSION_CONTENT_TYPES', (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)))
+# Upper bound, in bytes, of compressed bodies kept for ETagged responses
+CACHE_SIZE = getattr(settings, 'API_COMPRESSION_CACHE_SIZE', 16 * 1024 * 1024)
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_encoding(header):
+    """Pick 'br' or 'gzip' for an Accept-Encoding header, or None"""
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get('*', 0.0)
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = None, 0.0
+    for coding in candidates:
+        quality = codings.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class _StreamCompressor:
+    """Incremental compressor flushing after every chunk so clients see data early"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+class _CompressedCache:
+    """Thread-safe LRU of compressed bodies, bounded by total size"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, minus the warning for a ``STATIC_ROOT`` that does not exist.
+
+    The directory only appears once ``collectstatic`` has run; before that
+    (development, tests) the finders serve static files and there is nothing
+    to warn about.
+    """
+
+    def add_files(self, root, prefix=None):
+        if not self.autorefresh and not os.path.isdir(root):
+            return
+        super().add_files(root, prefix)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, whichever the client prefers.
+
+    Only bodies of at least ``API_COMPRESSION_MIN_SIZE`` bytes with a
+    compressible content type are touched; streaming responses are
+    compressed chunk by chunk. For responses carrying an ETag that shared
+    caches may store, the compressed body is kept in memory keyed by path
+    with query string, ETag and encoding so repeated hits are not
+    compressed again.
+    """
+
+    cache = _CompressedCache(CACHE_SIZE)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def is_compressible(self, response):
+        if response.has_header('Content-Encoding') or response.status_code < 200 or response.status_code in (204, 304):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(CONTENT_TYPES):
+            return False
+        if not response.streaming and len(response.content) < MIN_SIZE:
+            return False
+        return True
+
+    def is_cacheable(self, response):
+        if response.streaming or response.status_code != 200 or not response.get('ETag'):
+            return False
+        cache_control = response.get('Cache-Control', '').lower()
+        return 'no-store' not in cache_control and 'private' not in cache_control
+
+    def process_response(self, request, response):
+        if not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(response, encoding)
+            del response.headers['Content-Length']
+        else:
+            key = None
+            compressed = None
+            if self.is_cacheable(response):
+                key = (request.get_full_path(), response['ETag'], encoding)
+                compressed = self.cache.get(key)
+            if compressed is None:
+                compressed = compress(response.content, encoding)
+                if len(compressed) >= len(response.content):
+                    return response
+                if key is not None:
+                    self.cache.set(key, compressed)
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body is no longer byte-identical to the strong ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compress_stream(self, response, encoding):
+        stream = response.streaming_content
+        compressor = _StreamCompressor(encoding)
+        if response.is_async:
+            async def compressed():
+                async for chunk in stream:
+                    data = compressor.chunk(chunk)
+                    if data:
+                        yield data
+                yield compressor.finish()
+            return compressed()
+
+        def compressed():
+            for chunk in stream:
+                data = compressor.chunk(chunk)
+                if data:
+                    yield data
+            yield compressor.finish()
+        return compressed()
+
+
+class QueryCountMiddleware:
+    """
+    Report the number of database queries behind a response in an
+    ``X-Query-Count`` header, for load tests and benchmarks.
+
+    Enabled by ``QUERY_COUNT_HEADER``, which defaults to ``DEBUG``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_COUNT_HEADER', settings.DEBUG):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = _QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        response.headers['X-Query-Count'] = str(counter.count)
+        return response
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
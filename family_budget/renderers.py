@@ -0,0 +1,107 @@
+"""
+JSON renderer and parser backed by orjson when it is installed.
+
+Both are drop-in replacements for DRF's JSON classes and fall back to them
+whenever orjson is missing or cannot reproduce DRF's output exactly: pretty
+printing, non-UTF-8 request bodies, integers beyond 64 bits, floats that
+are not finite (DRF refuses them under STRICT_JSON) or that Python writes
+in exponent notation, and dictionary keys json.dumps does not accept.
+"""
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework.utils import encoders
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised when orjson is absent
+    orjson = None
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+def _plain_float(value):
+    """Whether orjson writes ``value`` like ``float.__repr__``: finite and without an exponent"""
+    return math.isfinite(value) and (value == 0 or 1e-4 <= abs(value) < 1e16)
+
+
+def _plain_key(key):
+    if isinstance(key, float):
+        return _plain_float(key)
+    # json.dumps also takes int, bool and None keys; orjson would convert dates and more
+    return key is None or isinstance(key, (str, int))
+
+
+def _orjson_compatible(data):
+    """Whether orjson encodes ``data`` byte for byte like DRF's renderer"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not _plain_float(value):
+                return False
+        elif isinstance(value, dict):
+            if not all(_plain_key(key) for key in value):
+                return False
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return True
+
+
+def _default(obj):
+    # orjson handles str, numbers, dict, list, date/datetime and UUID itself;
+    # everything else is converted exactly like DRF's encoder does
+    if isinstance(obj, Decimal):
+        value = float(obj)
+        if not _plain_float(value):
+            raise TypeError('Decimal is rendered by json.dumps')
+        return value
+    return _drf_encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer writing the same bytes as DRF's for the data orjson can
+    encode identically, and handing everything else (including data DRF
+    raises on) to DRF's renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if not _orjson_compatible(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as DRF so the output stays a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser that decodes UTF-8 request bodies with orjson"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            # orjson rejects NaN and Infinity, matching STRICT_JSON
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -44,11 +44,20 @@ INSTALLED_APPS = [
     'accounts',
     'budgets',
     'expenses',
+    'jobs',
+    'blobstore',
+    'sync',
+    'querylog',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'family_budget.middleware.StaticFilesMiddleware',
+    'family_budget.middleware.CompressionMiddleware',
+    'family_budget.middleware.QueryCountMiddleware',
+    'querylog.middleware.QueryLogMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -125,6 +134,41 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Production React bundle (`npm run build`). Its static/ folder is collected
+# under STATIC_URL, matching the /static/... URLs in the built index.html
+FRONTEND_BUILD_DIR = BASE_DIR / 'frontend' / 'build'
+STATICFILES_DIRS = [FRONTEND_BUILD_DIR / 'static'] if (FRONTEND_BUILD_DIR / 'static').is_dir() else []
+
+# WhiteNoise serves the collected files with far-future cache headers for
+# hashed names (ours and the bundler's) and the pre-built .gz/.br variants
+if FRONTEND_BUILD_DIR.is_dir():
+    WHITENOISE_ROOT = FRONTEND_BUILD_DIR
+WHITENOISE_IMMUTABLE_FILE_TEST = r'\.[0-9a-f]{8,32}\.'
+
+# Change events for the ASGI event stream (see sync.broker). LocalBroker only
+# reaches clients streaming from the process that made the write, and refuses
+# to start when WEB_CONCURRENCY asks for several workers; use
+# 'sync.broker.RedisBroker' with SYNC_EVENT_BROKER_OPTIONS = {'url': ...} then
+SYNC_EVENT_BROKER = 'sync.broker.LocalBroker'
+
+# Uploaded files (receipts, profile pictures)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploads are stored once per content digest (see blobstore.storage)
+STORAGES = {
+    'default': {
+        'BACKEND': 'blobstore.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -140,6 +184,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed drop-ins for DRF's JSON classes; switch back to
+    # rest_framework.renderers.JSONRenderer / parsers.JSONParser to disable
+    'DEFAULT_RENDERER_CLASSES': [
+        'family_budget.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'family_budget.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
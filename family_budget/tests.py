@@ -0,0 +1,136 @@
+import gzip
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from accounts.models import Family, FamilyMember, User
+from budgets.models import Category
+from expenses.models import Expense
+from expenses.serializers import ExpenseSerializer
+from . import views
+from .middleware import CompressionMiddleware, _CompressedCache
+from .renderers import FastJSONRenderer
+
+
+class FrontendIndexTests(SimpleTestCase):
+    """Serving and caching the SPA index"""
+
+    def setUp(self):
+        views._index_cache.clear()
+        self.addCleanup(views._index_cache.clear)
+
+    @override_settings(DEBUG=False)
+    def test_missing_index_is_remembered(self):
+        with mock.patch('family_budget.views.os.path.getmtime', side_effect=OSError) as getmtime:
+            for _ in range(3):
+                with self.assertRaises(FileNotFoundError):
+                    views._frontend_index()
+        self.assertEqual(getmtime.call_count, 2)
+        self.assertIn('Frontend not found', self.client.get('/').json()['message'])
+
+    @override_settings(DEBUG=True)
+    def test_missing_index_is_looked_up_again_in_debug(self):
+        with mock.patch('family_budget.views.os.path.getmtime', side_effect=OSError) as getmtime:
+            for _ in range(2):
+                with self.assertRaises(FileNotFoundError):
+                    views._frontend_index()
+        self.assertEqual(getmtime.call_count, 4)
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Negotiating, caching and marking compressed responses"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        cache = mock.patch.object(CompressionMiddleware, 'cache', _CompressedCache(1024 * 1024))
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    def respond(self, body, path='/api/expenses/', encoding='gzip', etag=None):
+        def view(request):
+            response = HttpResponse(body, content_type='application/json')
+            if etag:
+                response['ETag'] = etag
+            return response
+        request = self.factory.get(path, HTTP_ACCEPT_ENCODING=encoding)
+        return CompressionMiddleware(view)(request)
+
+    def test_compressed_responses_vary_and_weaken_the_etag(self):
+        response = self.respond(b'[' + b'1,' * 1000 + b'1]', etag='"abc"')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(gzip.decompress(response.content), b'[' + b'1,' * 1000 + b'1]')
+
+        # Small bodies are left alone
+        response = self.respond(b'[]', etag='"abc"')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['ETag'], '"abc"')
+
+        response = self.respond(b'[' + b'1,' * 1000 + b'1]', encoding='identity', etag='"abc"')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['ETag'], '"abc"')
+
+    def test_cached_bodies_are_kept_per_query_string(self):
+        first = b'[' + b'1,' * 1000 + b'1]'
+        second = b'[' + b'2,' * 1000 + b'2]'
+        response = self.respond(first, path='/api/expenses/?page=1', etag='"same"')
+        self.assertEqual(gzip.decompress(response.content), first)
+        response = self.respond(second, path='/api/expenses/?page=2', etag='"same"')
+        self.assertEqual(gzip.decompress(response.content), second)
+
+
+class RendererTests(TestCase):
+    """FastJSONRenderer writes exactly what DRF's JSONRenderer writes, or raises what it raises"""
+
+    def assertSameRender(self, data):
+        try:
+            expected = JSONRenderer().render(data)
+        except (TypeError, ValueError) as exc:
+            with self.assertRaises(type(exc)):
+                FastJSONRenderer().render(data)
+            return
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+
+    def test_api_payloads(self):
+        user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        family = Family.objects.create(name='Family', created_by=user)
+        FamilyMember.objects.create(family=family, user=user, role='admin')
+        category = Category.objects.create(name='Food \u2028 and more', family=family, created_by=user)
+        for day in range(5):
+            Expense.objects.create(
+                title=f'Shop {day}', amount=Decimal('10.05') * (day + 1), category=category, family=family,
+                paid_by=user, date=timezone.now().date() - timedelta(days=day), tags='food, \u00e9t\u00e9'
+            )
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/expenses/statistics/', {'family_id': family.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertSameRender(response.data)
+        self.assertSameRender(ExpenseSerializer(
+            Expense.objects.all(), many=True, context={'request': Request(response.wsgi_request)}
+        ).data)
+
+    def test_edge_values(self):
+        values = [
+            float('nan'), float('inf'), -float('inf'), Decimal('NaN'), Decimal('Infinity'),
+            1e16, 1.5e16, 1e-5, 5e-324, 1.7976931348623157e308, 123456789012345.6, 0.1, -0.0, 1 / 3,
+            Decimal('1E+20'), Decimal('0.00001'), Decimal('1.10'), 2 ** 70, -2 ** 63,
+            'line\u2028separator\u2029', '\u00e9\U0001f600', '<script>',
+            datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc), datetime(2024, 1, 2), date(2024, 1, 2),
+            timedelta(days=1, seconds=3), uuid.UUID(int=5),
+            {1: 'int'}, {True: 'bool'}, {None: 'none'}, {1.5: 'float'}, {1e16: 'big float'},
+            {date(2024, 1, 1): 'date'}, {Decimal('1.5'): 'decimal'}, {(1, 2): 'tuple'},
+        ]
+        for value in values:
+            with self.subTest(value=value):
+                self.assertSameRender({'value': value, 'nested': [value, {'again': value}]})
@@ -14,6 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
@@ -26,5 +28,11 @@ urlpatterns = [
     path('api/auth/', include('accounts.urls')),
     path('api/budgets/', include('budgets.urls')),
     path('api/expenses/', include('expenses.urls')),
+    path('api/jobs/', include('jobs.urls')),
+    path('api/sync/', include('sync.urls')),
+    path('api/querylog/', include('querylog.urls')),
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
 ]
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,5 +1,7 @@
-from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified
 from django.views.decorators.csrf import csrf_exempt
+import hashlib
 import os
 
 @csrf_exempt
@@ -13,20 +15,63 @@ def api_root(request):
             'families': '/api/auth/families/',
             'budgets': '/api/budgets/',
             'expenses': '/api/expenses/',
+            'jobs': '/api/jobs/',
+            'sync': '/api/sync/',
+            'querylog': '/api/querylog/',
             'admin': '/admin/',
         },
         'documentation': 'See README.md for detailed API documentation'
     })
 
+_index_cache = {}
+
+
+def _frontend_index():
+    """
+    Return (content, etag, (path, mtime)) of the SPA index, reading it from
+    disk only once; raise FileNotFoundError when there is none.
+
+    The production build is preferred over the development index.html. A
+    missing index is remembered too. With DEBUG on, the file's mtime is
+    checked so edits (and a new build) are picked up.
+    """
+    frontend_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend')
+    cached = _index_cache.get('index')
+    if 'index' in _index_cache and not settings.DEBUG:
+        if cached is None:
+            raise FileNotFoundError('frontend/index.html')
+        return cached
+
+    for path in (os.path.join(frontend_dir, 'build', 'index.html'), os.path.join(frontend_dir, 'index.html')):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        if cached and cached[2] == (path, mtime):
+            return cached
+        with open(path, 'rb') as f:
+            content = f.read()
+        cached = (content, '"%s"' % hashlib.sha256(content).hexdigest()[:32], (path, mtime))
+        _index_cache['index'] = cached
+        return cached
+    _index_cache['index'] = None
+    raise FileNotFoundError('frontend/index.html')
+
+
 def frontend_view(request):
     """Serve the frontend HTML file"""
-    frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend', 'index.html')
     try:
-        with open(frontend_path, 'r') as f:
-            content = f.read()
-        return HttpResponse(content, content_type='text/html')
+        content, etag, _ = _frontend_index()
     except FileNotFoundError:
         return JsonResponse({
             'message': 'Frontend not found. Please run the React development server.',
             'instructions': 'cd frontend && npm install && npm start'
         })
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='text/html; charset=utf-8')
+    response['ETag'] = etag
+    # Always revalidate: the index points at the current hashed bundle
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'progress', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name', 'created_at')
+    search_fields = ('name', 'error')
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at', 'locked_by', 'locked_at')
@@ -0,0 +1,97 @@
+import logging
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from jobs.queue import claim_job, requeue_stale_jobs, run_job, worker_id
+
+logger = logging.getLogger(__name__)
+
+
+def work(sleep, burst):
+    """Claim and run jobs until stopped (or until the queue is empty in burst mode)"""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    worker = worker_id()
+    processed = 0
+    last_requeue = 0
+
+    while not stopping:
+        try:
+            if time.monotonic() - last_requeue > 60:
+                requeue_stale_jobs()
+                last_requeue = time.monotonic()
+            job = claim_job(worker)
+        except OperationalError:
+            # Another worker holds the database lock (SQLite); try again shortly
+            time.sleep(sleep)
+            continue
+        if job is None:
+            if burst:
+                break
+            time.sleep(sleep)
+            continue
+        try:
+            run_job(job)
+        except Exception:
+            # Recording the outcome failed (e.g. the database is locked); the job
+            # is taken back by requeue_stale_jobs and this worker carries on
+            logger.exception('Could not record the outcome of job %s', job.pk)
+        processed += 1
+
+    connections.close_all()
+    return processed
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Number of worker processes to start'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no more jobs are due'
+        )
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            try:
+                processed = work(options['sleep'], options['burst'])
+            except KeyboardInterrupt:
+                return
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s)'))
+            return
+
+        # Children must not share the parent's database connection
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=work, args=(options['sleep'], options['burst']))
+            for _ in range(options['processes'])
+        ]
+        for process in workers:
+            process.start()
+
+        def stop_workers(signum, frame):
+            # Each worker finishes its current job before exiting
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+        signal.signal(signal.SIGTERM, stop_workers)
+        try:
+            for process in workers:
+                process.join()
+        except KeyboardInterrupt:
+            for process in workers:
+                process.terminate()
+                process.join()
+        self.stdout.write(self.style.SUCCESS(f"Stopped {options['processes']} worker(s)"))
@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry; doubled on every further attempt
+RETRY_BACKOFF = getattr(settings, 'JOB_RETRY_BACKOFF', 10)
+# Seconds between the heartbeats a worker sends while running a job
+HEARTBEAT_INTERVAL = getattr(settings, 'JOB_HEARTBEAT_INTERVAL', 30)
+# Running jobs without a heartbeat for this many seconds are assumed orphaned
+LOCK_TIMEOUT = getattr(settings, 'JOB_LOCK_TIMEOUT', 10 * 60)
+# Longest error summary stored on a job (and shown by the API)
+MAX_ERROR_LENGTH = 1000
+
+_registry = {}
+
+
+def task(name=None):
+    """
+    Register a function as a job task.
+
+    The function is called as ``func(job, **payload)`` and its return value,
+    which must be JSON serializable, is stored as the job result.
+    """
+    def decorator(func):
+        _registry[name or f'{func.__module__}.{func.__name__}'] = func
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        return func
+    return decorator
+
+
+def registered_tasks():
+    return dict(_registry)
+
+
+def enqueue(name, payload=None, priority=0, run_at=None, max_attempts=3, created_by=None):
+    """Queue ``name`` to be run by a worker"""
+    if name not in _registry:
+        raise KeyError(f'Unknown task: {name}')
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+        created_by=created_by,
+    )
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _claim(worker, candidates):
+    now = timezone.now()
+    for job_id in candidates.values_list('id', flat=True)[:5]:
+        claimed = Job.objects.filter(id=job_id, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            started_at=now,
+            attempts=F('attempts') + 1,
+            updated_at=now
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def claim_job(worker):
+    """
+    Atomically take the next due job, or return None.
+
+    On backends with SKIP LOCKED the candidate rows are locked so concurrent
+    workers skip them. SQLite cannot upgrade a read transaction under
+    contention, so there the candidates are read in autocommit mode and the
+    conditional UPDATE on ``status`` alone decides which worker wins a job.
+    """
+    candidates = Job.objects.filter(
+        status=Job.STATUS_QUEUED,
+        run_at__lte=timezone.now()
+    ).order_by('-priority', 'run_at', 'id')
+    if not connection.features.has_select_for_update_skip_locked:
+        return _claim(worker, candidates)
+    with transaction.atomic():
+        return _claim(worker, candidates.select_for_update(skip_locked=True))
+
+
+class Heartbeat(threading.Thread):
+    """
+    Touches a running job's ``updated_at`` every ``HEARTBEAT_INTERVAL``
+    seconds, so ``requeue_stale_jobs`` only takes back jobs whose worker
+    stopped, however long they run.
+    """
+
+    def __init__(self, job):
+        super().__init__(name=f'job-{job.pk}-heartbeat', daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def beat(self):
+        """Renew the lease; False once the job was taken back from this worker"""
+        renewed = Job.objects.filter(
+            pk=self.job.pk, status=Job.STATUS_RUNNING, locked_by=self.job.locked_by
+        ).update(updated_at=timezone.now())
+        if not renewed:
+            logger.warning('Job %s is no longer held by %s', self.job.pk, self.job.locked_by)
+        return bool(renewed)
+
+    def run(self):
+        try:
+            while not self.stopped.wait(HEARTBEAT_INTERVAL):
+                try:
+                    if not self.beat():
+                        break
+                except DatabaseError:
+                    logger.exception('Heartbeat of job %s failed', self.job.pk)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def error_summary(exc):
+    return f'{type(exc).__name__}: {exc}'[:MAX_ERROR_LENGTH]
+
+
+def run_job(job):
+    """
+    Execute a claimed job and record its outcome. The traceback of a failure
+    goes to the log; the job only keeps a one-line summary. A result that
+    cannot be stored as JSON fails the job without a retry.
+    """
+    func = _registry.get(job.name)
+    # Outcomes are only recorded while this worker still holds the job
+    held = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        if func is None:
+            raise KeyError(f'Unknown task: {job.name}')
+        result = func(job, **job.payload)
+    except Exception as exc:
+        error = error_summary(exc)
+        logger.exception('Job %s failed', job.pk)
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            held.update(
+                status=Job.STATUS_QUEUED,
+                run_at=now + timedelta(seconds=RETRY_BACKOFF * 2 ** (job.attempts - 1)),
+                error=error,
+                locked_by='',
+                locked_at=None,
+                updated_at=now
+            )
+        else:
+            held.update(
+                status=Job.STATUS_FAILED,
+                error=error,
+                finished_at=now,
+                updated_at=now
+            )
+        return False
+    finally:
+        heartbeat.stop()
+
+    now = timezone.now()
+    try:
+        # Checked up front: a failing UPDATE would break an enclosing transaction
+        json.dumps(result, cls=Job._meta.get_field('result').encoder)
+    except (TypeError, ValueError) as exc:
+        # The task ran; running it again would not make its result storable
+        logger.exception('Result of job %s is not JSON serializable', job.pk)
+        held.update(
+            status=Job.STATUS_FAILED,
+            error=error_summary(exc),
+            finished_at=now,
+            updated_at=now
+        )
+        return False
+    held.update(
+        status=Job.STATUS_SUCCEEDED,
+        result=result,
+        progress=100,
+        finished_at=now,
+        updated_at=now
+    )
+    return True
+
+
+def requeue_stale_jobs():
+    """Put running jobs whose worker stopped sending heartbeats back in the queue"""
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.STATUS_RUNNING,
+        updated_at__lt=now - timedelta(seconds=LOCK_TIMEOUT)
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED,
+        error='Worker stopped while running the job',
+        finished_at=now,
+        updated_at=now
+    )
+    return stale.update(status=Job.STATUS_QUEUED, locked_by='', locked_at=None, updated_at=now)
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .models import Job
+from .management.commands.run_worker import work
+from .queue import LOCK_TIMEOUT, Heartbeat, claim_job, enqueue, requeue_stale_jobs, run_job, task
+
+
+@task('jobs.tests.add')
+def add(job, a, b):
+    return a + b
+
+
+@task('jobs.tests.unserializable')
+def unserializable(job):
+    return {'when': object()}
+
+
+@task('jobs.tests.fail')
+def fail(job):
+    raise ValueError('secret detail /srv/app/settings.py')
+
+
+class QueueTests(TestCase):
+    """Claiming, running, retrying and taking back jobs"""
+
+    def test_claim_and_run(self):
+        low = enqueue('jobs.tests.add', {'a': 1, 'b': 2})
+        high = enqueue('jobs.tests.add', {'a': 2, 'b': 3}, priority=5)
+        job = claim_job('worker-1')
+        self.assertEqual((job.pk, job.status, job.attempts), (high.pk, Job.STATUS_RUNNING, 1))
+        self.assertTrue(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress), (Job.STATUS_SUCCEEDED, 5, 100))
+        self.assertEqual(claim_job('worker-1').pk, low.pk)
+        self.assertIsNone(claim_job('worker-1'))
+
+    def test_failures_are_retried_and_store_a_summary(self):
+        created = enqueue('jobs.tests.fail', max_attempts=2)
+        with self.assertLogs('jobs.queue', 'ERROR') as logs:
+            self.assertFalse(run_job(claim_job('worker-1')))
+        job = Job.objects.get(pk=created.pk)
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(job.error, 'ValueError: secret detail /srv/app/settings.py')
+        self.assertIn('Traceback', logs.output[0])
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_job(claim_job('worker-1'))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.STATUS_FAILED)
+
+        user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        Job.objects.filter(pk=job.pk).update(created_by=user)
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertNotIn('Traceback', client.get(f'/api/jobs/{job.pk}/').data['error'])
+
+    def test_only_jobs_without_heartbeat_are_requeued(self):
+        enqueue('jobs.tests.add', {'a': 1, 'b': 1})
+        enqueue('jobs.tests.add', {'a': 1, 'b': 1})
+        beating, silent = claim_job('worker-1'), claim_job('worker-2')
+        long_ago = timezone.now() - timedelta(seconds=LOCK_TIMEOUT + 1)
+        Job.objects.update(updated_at=long_ago)
+
+        self.assertTrue(Heartbeat(beating).beat())
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get(pk=silent.pk).status, Job.STATUS_QUEUED)
+        self.assertEqual(Job.objects.get(pk=beating.pk).status, Job.STATUS_RUNNING)
+
+        # The silent worker lost its job: it can neither renew nor record it
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(Heartbeat(silent).beat())
+        claim_job('worker-3')
+        run_job(silent)
+        self.assertEqual(Job.objects.get(pk=silent.pk).status, Job.STATUS_RUNNING)
+
+    def test_unserializable_result_fails_the_job(self):
+        created = enqueue('jobs.tests.unserializable')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertFalse(run_job(claim_job('worker-1')))
+        job = Job.objects.get(pk=created.pk)
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertTrue(job.error.startswith('TypeError: '), job.error)
+
+    def test_worker_survives_a_job_it_cannot_record(self):
+        enqueue('jobs.tests.add', {'a': 1, 'b': 1})
+        enqueue('jobs.tests.add', {'a': 2, 'b': 2})
+        outcomes = iter([OperationalError('database is locked'), True])
+
+        def flaky(job):
+            outcome = next(outcomes)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return run_job(job)
+
+        with mock.patch('jobs.management.commands.run_worker.run_job', flaky), \
+                mock.patch('jobs.management.commands.run_worker.signal.signal'), \
+                mock.patch('jobs.management.commands.run_worker.connections.close_all'), \
+                self.assertLogs('jobs.management.commands.run_worker', 'ERROR'):
+            self.assertEqual(work(sleep=0, burst=True), 2)
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_SUCCEEDED).count(), 1)
@@ -0,0 +1,26 @@
+from rest_framework import generics, permissions, filters
+from django_filters.rest_framework import DjangoFilterBackend
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobListView(generics.ListAPIView):
+    """List the current user's background jobs"""
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['name', 'status']
+    ordering_fields = ['created_at', 'priority']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        return Job.objects.filter(created_by=self.request.user)
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """Status and progress of a background job"""
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(created_by=self.request.user)
@@ -0,0 +1,30 @@
+from django.contrib import admin
+from .models import QuerySample, QueryStat
+
+
+@admin.register(QueryStat)
+class QueryStatAdmin(admin.ModelAdmin):
+    list_display = ('fingerprint', 'view', 'location', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'last_seen')
+    list_filter = ('last_seen',)
+    search_fields = ('sql', 'view', 'location', 'fingerprint')
+    ordering = ('-total_ms',)
+    readonly_fields = ('key', 'fingerprint', 'sql', 'view', 'location', 'calls', 'total_ms', 'max_ms',
+                       'first_seen', 'last_seen')
+
+    @admin.display(description='Mean ms')
+    def mean_ms(self, obj):
+        return round(obj.mean_ms, 2)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(QuerySample)
+class QuerySampleAdmin(admin.ModelAdmin):
+    list_display = ('fingerprint', 'duration_ms', 'view', 'location', 'executed_at')
+    list_filter = ('executed_at',)
+    search_fields = ('sql', 'view', 'location', 'fingerprint')
+    readonly_fields = ('fingerprint', 'sql', 'params', 'duration_ms', 'view', 'location', 'executed_at')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class QuerylogConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'querylog'
+
+    def ready(self):
+        from . import recorder
+        if recorder.ENABLED:
+            recorder.install()
@@ -0,0 +1,31 @@
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import recorder
+
+
+class QueryLogMiddleware:
+    """
+    Attribute recorded queries to the view handling the request, and flush
+    the query log once a response is ready when the flush interval passed.
+
+    Only active when ``QUERYLOG_ENABLED`` is on.
+    """
+
+    def __init__(self, get_response):
+        if not recorder.ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = recorder.current_view.set(request.path)
+        try:
+            response = self.get_response(request)
+        finally:
+            recorder.current_view.reset(token)
+        if recorder.recorder.due():
+            recorder.recorder.flush_safely()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        recorder.current_view.set(f'{request.method} {match._func_path if match else request.path}')
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuerySample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(db_index=True, max_length=16)),
+                ('sql', models.TextField()),
+                ('params', models.TextField(blank=True, default='')),
+                ('duration_ms', models.FloatField()),
+                ('view', models.CharField(blank=True, default='', max_length=200)),
+                ('location', models.CharField(blank=True, default='', max_length=300)),
+                ('executed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-executed_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('fingerprint', models.CharField(db_index=True, max_length=16)),
+                ('sql', models.TextField()),
+                ('view', models.CharField(blank=True, default='', max_length=200)),
+                ('location', models.CharField(blank=True, default='', max_length=300)),
+                ('calls', models.PositiveBigIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-total_ms'],
+                'indexes': [models.Index(fields=['-total_ms'], name='querystat_total_idx')],
+            },
+        ),
+    ]
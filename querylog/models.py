@@ -0,0 +1,45 @@
+from django.db import models
+
+
+class QueryStat(models.Model):
+    """Aggregated timings of one query fingerprint from one view and code location"""
+    key = models.CharField(max_length=40, unique=True)  # Digest of fingerprint, view and location
+    fingerprint = models.CharField(max_length=16, db_index=True)
+    sql = models.TextField()  # Normalized, literals replaced by ?
+    view = models.CharField(max_length=200, blank=True, default='')
+    location = models.CharField(max_length=300, blank=True, default='')
+    calls = models.PositiveBigIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-total_ms']
+        indexes = [
+            models.Index(fields=['-total_ms'], name='querystat_total_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fingerprint} {self.view or '-'} ({self.calls} calls)"
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0
+
+
+class QuerySample(models.Model):
+    """A full query that ran longer than QUERYLOG_SLOW_MS; only the newest are kept"""
+    fingerprint = models.CharField(max_length=16, db_index=True)
+    sql = models.TextField()
+    params = models.TextField(blank=True, default='')
+    duration_ms = models.FloatField()
+    view = models.CharField(max_length=200, blank=True, default='')
+    location = models.CharField(max_length=300, blank=True, default='')
+    executed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-executed_at', '-id']
+
+    def __str__(self):
+        return f"{self.fingerprint} {self.duration_ms:.1f}ms"
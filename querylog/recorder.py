@@ -0,0 +1,236 @@
+"""
+Slow query log with fingerprint aggregation, in the spirit of
+``pg_stat_statements`` but backend independent.
+
+When ``QUERYLOG_ENABLED`` is on, an execute wrapper is installed on every
+database connection. Each query is normalized into a fingerprint (literals
+and parameters become ``?``, ``IN`` lists collapse) and its time is added
+to in-memory totals keyed by fingerprint, originating view (set by
+``QueryLogMiddleware``) and the first project frame that ran it. Queries
+slower than ``QUERYLOG_SLOW_MS`` are sampled in a bounded ring buffer with
+their duration, view and location; samples hold the normalized SQL and only
+the types of the parameters, as values may be passwords or tokens, unless
+``QUERYLOG_SAMPLE_PARAMS`` is on.
+
+Totals and samples are flushed to ``QueryStat`` and ``QuerySample`` every
+``QUERYLOG_FLUSH_INTERVAL`` seconds (outside transactions), when a request
+finishes and when the process exits. Queries issued by the flush itself are
+not recorded. A failed flush puts its totals and samples back for the next
+one.
+"""
+import atexit
+import contextvars
+import hashlib
+import logging
+import re
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'QUERYLOG_ENABLED', False)
+# Queries at least this slow are sampled in full
+SLOW_MS = getattr(settings, 'QUERYLOG_SLOW_MS', 100)
+# Size of the in-process sample ring buffer
+SAMPLE_BUFFER = getattr(settings, 'QUERYLOG_SAMPLE_BUFFER', 100)
+# Samples kept in the database; older ones are deleted on flush
+SAMPLE_LIMIT = getattr(settings, 'QUERYLOG_SAMPLE_LIMIT', 500)
+# Seconds between flushes of the aggregates
+FLUSH_INTERVAL = getattr(settings, 'QUERYLOG_FLUSH_INTERVAL', 60)
+# Store the parameter values of samples instead of their types; for development only
+SAMPLE_PARAMS = getattr(settings, 'QUERYLOG_SAMPLE_PARAMS', False)
+# max_length of the view and location columns
+VIEW_LENGTH = 200
+LOCATION_LENGTH = 300
+
+PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+_IGNORED = (str(Path(__file__).resolve()), str(Path(__file__).resolve().with_name('middleware.py')), 'site-packages')
+
+current_view = contextvars.ContextVar('querylog_view', default='')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_VALUES = re.compile(r'\bVALUES\s*(?:\((?:\s*\?\s*,?)+\)\s*,?\s*)+', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """SQL with literals and parameters replaced by ``?`` and lists collapsed"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES.sub('VALUES (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    """(normalized sql, 16 character digest)"""
+    normalized = normalize(sql)
+    return normalized, hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def redact(params):
+    """The types of query parameters, without their values"""
+    if params is None:
+        return ''
+    if isinstance(params, dict):
+        return repr({name: type(value).__name__ for name, value in params.items()})
+    return f"({', '.join(type(value).__name__ for value in params)})"
+
+
+def code_location():
+    """``path:line in function`` of the innermost project frame on the stack"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_DIR) and not any(part in filename for part in _IGNORED):
+            path = filename[len(PROJECT_DIR) + 1:]
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return ''
+
+
+class Recorder:
+    """Thread-safe in-memory totals, flushed to the database"""
+
+    def __init__(self, slow_ms=SLOW_MS, sample_buffer=SAMPLE_BUFFER, flush_interval=FLUSH_INTERVAL,
+                 sample_params=SAMPLE_PARAMS):
+        self.slow_ms = slow_ms
+        self.sample_params = sample_params
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stats = {}
+        self.samples = deque(maxlen=sample_buffer)
+        self.last_flush = time.monotonic()
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(self.local, 'paused', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, params, (time.perf_counter() - started) * 1000)
+            if self.due() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+                self.flush_safely()
+
+    def due(self):
+        return time.monotonic() - self.last_flush >= self.flush_interval
+
+    def record(self, sql, params, ms):
+        normalized, digest = fingerprint(sql)
+        # Unresolved URLs are recorded by path, which can be any length
+        view = current_view.get()[:VIEW_LENGTH]
+        location = code_location()[:LOCATION_LENGTH]
+        key = hashlib.sha1(f'{digest}|{view}|{location}'.encode()).hexdigest()
+        with self.lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                entry = self.stats[key] = {
+                    'fingerprint': digest, 'sql': normalized, 'view': view, 'location': location,
+                    'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                }
+            entry['calls'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            if ms >= self.slow_ms:
+                self.samples.append({
+                    'fingerprint': digest, 'sql': normalized,
+                    'params': (repr(params) if self.sample_params else redact(params))[:2000], 'duration_ms': ms,
+                    'view': view, 'location': location, 'executed_at': timezone.now(),
+                })
+
+    def take(self):
+        with self.lock:
+            stats, self.stats = self.stats, {}
+            samples = list(self.samples)
+            self.samples.clear()
+            self.last_flush = time.monotonic()
+        return stats, samples
+
+    def restore(self, stats, samples):
+        """Put back what ``take`` returned, for a flush that failed"""
+        with self.lock:
+            for key, entry in stats.items():
+                current = self.stats.get(key)
+                if current is None:
+                    self.stats[key] = entry
+                    continue
+                current['calls'] += entry['calls']
+                current['total_ms'] += entry['total_ms']
+                current['max_ms'] = max(current['max_ms'], entry['max_ms'])
+            # Older than anything recorded since; the newest fit in the buffer
+            newer = list(self.samples)
+            self.samples.clear()
+            self.samples.extend(samples + newer)
+
+    def flush(self):
+        """Add the pending totals to ``QueryStat`` and store the samples"""
+        from .models import QuerySample, QueryStat
+
+        stats, samples = self.take()
+        if not stats and not samples:
+            return 0
+        self.local.paused = True
+        try:
+            with transaction.atomic():
+                # Create missing rows first, so concurrent flushes only ever add
+                QueryStat.objects.bulk_create([
+                    QueryStat(key=key, **{name: entry[name] for name in ('fingerprint', 'sql', 'view', 'location')})
+                    for key, entry in stats.items()
+                ], ignore_conflicts=True)
+                for key, entry in stats.items():
+                    QueryStat.objects.filter(key=key).update(
+                        calls=F('calls') + entry['calls'],
+                        total_ms=F('total_ms') + entry['total_ms'],
+                        max_ms=Greatest(F('max_ms'), entry['max_ms']),
+                        last_seen=timezone.now(),
+                    )
+                if samples:
+                    QuerySample.objects.bulk_create([QuerySample(**sample) for sample in samples])
+                    newest = QuerySample.objects.aggregate(newest=Max('id'))['newest']
+                    QuerySample.objects.filter(id__lte=newest - SAMPLE_LIMIT).delete()
+        except Exception:
+            self.restore(stats, samples)
+            raise
+        finally:
+            self.local.paused = False
+        return len(stats)
+
+    def flush_safely(self):
+        # Never let the query log break the query that triggered the flush
+        try:
+            return self.flush()
+        except Exception:
+            logger.exception('Could not flush the query log')
+            return 0
+
+
+recorder = Recorder()
+
+
+def _install_on(connection, **kwargs):
+    if recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.append(recorder)
+
+
+def install():
+    """Record every query on every connection of this process"""
+    connection_created.connect(_install_on, dispatch_uid='querylog-install')
+    for connection in connections.all(initialized_only=True):
+        _install_on(connection)
+    atexit.register(recorder.flush_safely)
@@ -0,0 +1,21 @@
+from rest_framework import serializers
+from .models import QuerySample, QueryStat
+
+
+class QueryStatSerializer(serializers.ModelSerializer):
+    mean_ms = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = QueryStat
+        fields = (
+            'id', 'fingerprint', 'sql', 'view', 'location', 'calls',
+            'total_ms', 'mean_ms', 'max_ms', 'first_seen', 'last_seen'
+        )
+        read_only_fields = fields
+
+
+class QuerySampleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QuerySample
+        fields = ('id', 'fingerprint', 'sql', 'params', 'duration_ms', 'view', 'location', 'executed_at')
+        read_only_fields = fields
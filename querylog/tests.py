@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .models import QuerySample, QueryStat
+from .recorder import VIEW_LENGTH, Recorder, current_view, fingerprint
+
+
+class FingerprintTests(TestCase):
+    def test_literals_and_lists_collapse(self):
+        first = fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'bob' LIMIT 21")
+        second = fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'o''neil' LIMIT 5")
+        self.assertEqual(first, second)
+        self.assertEqual(first[0], 'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?')
+
+    def test_aliases_are_kept(self):
+        normalized, _ = fingerprint('SELECT U0."id" FROM "expenses_expense" U0 WHERE U0."amount" > 10.50')
+        self.assertEqual(normalized, 'SELECT U0."id" FROM "expenses_expense" U0 WHERE U0."amount" > ?')
+
+
+class RecorderTests(TestCase):
+    def test_flush_adds_to_totals(self):
+        recorder = Recorder(slow_ms=50, sample_buffer=2)
+
+        def run(ms):
+            recorder.record('SELECT 1 FROM t WHERE id = %s', (ms,), ms)
+
+        for ms in (10, 60, 70, 80):
+            run(ms)
+        recorder.flush()
+        run(5)
+        recorder.flush()
+
+        stat = QueryStat.objects.get()
+        self.assertEqual((stat.calls, stat.total_ms, stat.max_ms), (5, 225, 80))
+        self.assertEqual(stat.location.split(':')[0], 'querylog/tests.py')
+        # The ring buffer keeps the newest slow queries
+        self.assertEqual(sorted(QuerySample.objects.values_list('duration_ms', flat=True)), [70, 80])
+
+    def test_samples_hold_no_parameter_values(self):
+        recorder = Recorder(slow_ms=0)
+        token = current_view.set('/api/' + 'x' * 500)
+        try:
+            recorder.record("SELECT 1 FROM t WHERE token = %s AND name = 'secret'", ('s3cret', 1), 5)
+        finally:
+            current_view.reset(token)
+        recorder.flush()
+        sample = QuerySample.objects.get()
+        self.assertEqual(sample.sql, 'SELECT ? FROM t WHERE token = ? AND name = ?')
+        self.assertEqual(sample.params, '(str, int)')
+        self.assertEqual(len(sample.view), VIEW_LENGTH)
+
+    def test_failed_flush_keeps_the_batch(self):
+        recorder = Recorder(slow_ms=50)
+
+        def run(ms):
+            recorder.record('SELECT 1', None, ms)
+
+        run(60)
+        with mock.patch.object(QuerySample.objects, 'bulk_create', side_effect=RuntimeError('down')), \
+                self.assertLogs('querylog.recorder', 'ERROR'):
+            self.assertEqual(recorder.flush_safely(), 0)
+        self.assertFalse(QueryStat.objects.exists())
+
+        run(10)
+        recorder.flush()
+        stat = QueryStat.objects.get()
+        self.assertEqual((stat.calls, stat.total_ms, stat.max_ms), (2, 70, 60))
+        self.assertEqual(QuerySample.objects.get().duration_ms, 60)
+
+    def test_endpoint_is_admin_only(self):
+        recorder = Recorder()
+        recorder.record('SELECT 1', None, 2)
+        recorder.record('SELECT 2', None, 30)
+        recorder.flush()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='user', email='user@example.com', password='x'))
+        self.assertEqual(client.get('/api/querylog/').status_code, 403)
+
+        client.force_authenticate(User.objects.create_user(
+            username='staff', email='staff@example.com', password='x', is_staff=True
+        ))
+        response = client.get('/api/querylog/?ordering=-mean')
+        self.assertEqual([row['sql'] for row in response.data['results']], ['SELECT ?', 'SELECT ?'])
+        self.assertEqual([row['mean_ms'] for row in response.data['results']], [30, 2])
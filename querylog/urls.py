@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'querylog'
+
+urlpatterns = [
+    path('', views.QueryStatListView.as_view(), name='querystat-list'),
+    path('samples/', views.QuerySampleListView.as_view(), name='querysample-list'),
+]
@@ -0,0 +1,32 @@
+from django.db.models import ExpressionWrapper, F, FloatField
+from rest_framework import filters, generics, permissions
+from django_filters.rest_framework import DjangoFilterBackend
+from .models import QuerySample, QueryStat
+from .serializers import QuerySampleSerializer, QueryStatSerializer
+
+
+class QueryStatListView(generics.ListAPIView):
+    """Recorded query fingerprints, most total time first (``?ordering=-mean`` for slowest per call)"""
+    serializer_class = QueryStatSerializer
+    permission_classes = [permissions.IsAdminUser]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['fingerprint', 'view']
+    search_fields = ['sql', 'view', 'location']
+    ordering_fields = ['total_ms', 'mean', 'max_ms', 'calls', 'last_seen']
+    ordering = ['-total_ms']
+
+    def get_queryset(self):
+        return QueryStat.objects.annotate(
+            mean=ExpressionWrapper(F('total_ms') / F('calls'), output_field=FloatField())
+        )
+
+
+class QuerySampleListView(generics.ListAPIView):
+    """The newest queries slower than ``QUERYLOG_SLOW_MS``"""
+    serializer_class = QuerySampleSerializer
+    permission_classes = [permissions.IsAdminUser]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['fingerprint', 'view']
+    ordering_fields = ['executed_at', 'duration_ms']
+    ordering = ['-executed_at']
+    queryset = QuerySample.objects.all()
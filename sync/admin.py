@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Tombstone
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ('collection', 'object_id', 'family_id', 'user_id', 'deleted_at')
+    list_filter = ('collection', 'deleted_at')
+    search_fields = ('object_id',)
@@ -0,0 +1,278 @@
+"""
+Brokers fanning change events out to connected event stream clients.
+
+``publish`` is called from ordinary (synchronous) Django code after a commit;
+``subscribe`` is used by the ASGI event stream. The default ``LocalBroker``
+keeps everything in the current process, so it only reaches clients
+streaming from the process that made the write: it is enough when one ASGI
+process serves both, and refuses to start when ``WEB_CONCURRENCY`` (the
+worker count read by uvicorn and gunicorn) asks for more. Deployments with
+several processes set ``SYNC_EVENT_BROKER`` to a shared backend such as
+``sync.broker.RedisBroker``.
+"""
+import asyncio
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None
+    aioredis = None
+
+# Events kept per family so reconnecting clients can catch up
+HISTORY_SIZE = getattr(settings, 'SYNC_EVENT_HISTORY', 500)
+# Events buffered per connection before a slow client is disconnected
+QUEUE_SIZE = getattr(settings, 'SYNC_EVENT_QUEUE_SIZE', 100)
+
+
+class Event:
+    __slots__ = ('id', 'family_id', 'type', 'data')
+
+    def __init__(self, id, family_id, type, data):
+        self.id = id
+        self.family_id = family_id
+        self.type = type
+        self.data = data
+
+    def encode(self):
+        """Server-sent events wire format"""
+        return f'id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n'.encode()
+
+
+class ResyncRequired(Exception):
+    """Events after the client's Last-Event-ID are no longer available"""
+
+
+class SlowConsumer(Exception):
+    """The client fell more than QUEUE_SIZE events behind"""
+
+
+def encode_data(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+class _LocalSubscription:
+    def __init__(self, broker, family_ids, loop):
+        self.broker = broker
+        self.family_ids = set(family_ids)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event):
+        # Runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self):
+        event = await self.queue.get()
+        if self.overflowed:
+            raise SlowConsumer()
+        return event
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    In-process broker with a bounded history per family.
+
+    Event ids are ``<boot id>-<sequence>``; a Last-Event-ID from another
+    process lifetime, or older than the retained history, raises
+    ``ResyncRequired``. Each connection has a bounded queue: publishing
+    never blocks, and a client that lets its queue fill up is disconnected
+    with ``SlowConsumer`` so it reconnects and catches up from the history.
+    """
+
+    def __init__(self, history_size=HISTORY_SIZE):
+        if int(os.environ.get('WEB_CONCURRENCY') or 1) > 1:
+            raise ImproperlyConfigured(
+                'LocalBroker only reaches clients of the process that published the event; '
+                'set SYNC_EVENT_BROKER to sync.broker.RedisBroker when running several workers'
+            )
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.history_size = history_size
+        self.sequence = 0
+        self.history = {}
+        self.evicted = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def publish(self, family_id, event_type, data):
+        payload = encode_data(data)
+        with self.lock:
+            self.sequence += 1
+            event = Event(f'{self.boot_id}-{self.sequence}', family_id, event_type, payload)
+            history = self.history.setdefault(family_id, deque())
+            if len(history) >= self.history_size:
+                self.evicted[family_id] = self._sequence(history.popleft().id)
+            history.append(event)
+            subscribers = list(self.subscribers.get(family_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # The subscriber's loop has been closed
+                self._unsubscribe(subscription)
+        return event
+
+    def _sequence(self, event_id):
+        return int(event_id.rsplit('-', 1)[1])
+
+    def _replay(self, family_ids, last_event_id):
+        boot_id, _, sequence = last_event_id.rpartition('-')
+        if boot_id != self.boot_id or not sequence.isdigit():
+            raise ResyncRequired()
+        sequence = int(sequence)
+        events = []
+        for family_id in family_ids:
+            if self.evicted.get(family_id, 0) > sequence:
+                raise ResyncRequired()
+            events.extend(
+                event for event in self.history.get(family_id, ())
+                if self._sequence(event.id) > sequence
+            )
+        events.sort(key=lambda event: self._sequence(event.id))
+        return events
+
+    async def subscribe(self, family_ids, last_event_id=None):
+        subscription = _LocalSubscription(self, family_ids, asyncio.get_running_loop())
+        with self.lock:
+            # Registering and replaying under the lock means no event is
+            # both missed by the replay and published before registration
+            replay = self._replay(subscription.family_ids, last_event_id) if last_event_id else []
+            for family_id in subscription.family_ids:
+                self.subscribers.setdefault(family_id, set()).add(subscription)
+        for event in replay:
+            subscription.push(event)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self.lock:
+            for family_id in subscription.family_ids:
+                subscribers = self.subscribers.get(family_id)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscribers[family_id]
+
+
+class _RedisSubscription:
+    def __init__(self, broker, family_ids, cursor):
+        self.broker = broker
+        self.cursor = cursor
+        self.pending = deque()
+        self.client = aioredis.Redis.from_url(broker.url)
+
+    def _event_id(self):
+        return ','.join(f'{family_id}:{stream_id}' for family_id, stream_id in sorted(self.cursor.items()))
+
+    async def get(self):
+        while not self.pending:
+            streams = {self.broker.stream(family_id): stream_id for family_id, stream_id in self.cursor.items()}
+            response = await self.client.xread(streams, count=QUEUE_SIZE, block=self.broker.block_ms)
+            for stream, entries in response or ():
+                family_id = int(stream.decode().rsplit(':', 1)[1])
+                for stream_id, fields in entries:
+                    self.pending.append((family_id, stream_id.decode(), fields))
+        family_id, stream_id, fields = self.pending.popleft()
+        self.cursor[family_id] = stream_id
+        return Event(self._event_id(), family_id, fields[b'type'].decode(), fields[b'data'].decode())
+
+    def close(self):
+        asyncio.ensure_future(self.client.aclose())
+
+
+class RedisBroker:
+    """
+    Shared broker on Redis streams, one capped stream per family.
+
+    The event id sent to a client is its position in every stream it reads,
+    so a reconnect resumes exactly where it stopped. Slow clients simply
+    read further behind; once their position has been trimmed away they get
+    ``ResyncRequired``.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='family_budget:events',
+                 history_size=HISTORY_SIZE, block_ms=15000):
+        if redis is None:
+            raise ImportError('RedisBroker requires the redis package')
+        self.url = url
+        self.prefix = prefix
+        self.history_size = history_size
+        self.block_ms = block_ms
+        self.client = redis.Redis.from_url(url)
+
+    def stream(self, family_id):
+        return f'{self.prefix}:{family_id}'
+
+    def publish(self, family_id, event_type, data):
+        stream_id = self.client.xadd(
+            self.stream(family_id),
+            {'type': event_type, 'data': encode_data(data)},
+            maxlen=self.history_size,
+            approximate=True
+        )
+        return stream_id
+
+    async def subscribe(self, family_ids, last_event_id=None):
+        client = aioredis.Redis.from_url(self.url)
+        try:
+            cursor = {}
+            previous = {}
+            for part in (last_event_id or '').split(','):
+                family_id, _, stream_id = part.partition(':')
+                if family_id.isdigit() and stream_id:
+                    previous[int(family_id)] = stream_id
+            for family_id in family_ids:
+                stream = self.stream(family_id)
+                if family_id in previous:
+                    first = await client.xrange(stream, count=1)
+                    info = await client.xinfo_stream(stream) if first else {}
+                    trimmed = info.get('max-deleted-entry-id', b'0-0')
+                    if _stream_id_key(trimmed) > _stream_id_key(previous[family_id]):
+                        raise ResyncRequired()
+                    cursor[family_id] = previous[family_id]
+                elif last_event_id:
+                    # A family the client did not follow before
+                    raise ResyncRequired()
+                else:
+                    cursor[family_id] = '$'
+            # '$' only means "from now" for the first read; pin it so
+            # entries published in between are not skipped
+            for family_id, stream_id in cursor.items():
+                if stream_id == '$':
+                    last = await client.xrevrange(self.stream(family_id), count=1)
+                    cursor[family_id] = last[0][0].decode() if last else '0-0'
+        finally:
+            await client.aclose()
+        return _RedisSubscription(self, family_ids, cursor)
+
+
+def _stream_id_key(stream_id):
+    if isinstance(stream_id, bytes):
+        stream_id = stream_id.decode()
+    milliseconds, _, sequence = stream_id.partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    broker_class = import_string(getattr(settings, 'SYNC_EVENT_BROKER', 'sync.broker.LocalBroker'))
+    return broker_class(**getattr(settings, 'SYNC_EVENT_BROKER_OPTIONS', {}))
@@ -0,0 +1,213 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import FamilyMember
+from .models import Tombstone
+
+# Seconds subtracted from a client cursor, so rows committed by a
+# transaction that started before the previous sync are not missed
+CURSOR_OVERLAP = getattr(settings, 'SYNC_CURSOR_OVERLAP', 5)
+# Tombstones older than this are pruned; older cursors get a full resync
+TOMBSTONE_RETENTION_DAYS = getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90)
+# Rows per page of a full sync
+PAGE_SIZE = getattr(settings, 'SYNC_PAGE_SIZE', 1000)
+
+# collection -> (model label, field telling created from updated rows, extra values)
+COLLECTIONS = {
+    'categories': ('budgets.Category', 'created_at', {}),
+    'budgets': ('budgets.Budget', 'created_at', {}),
+    'expenses': ('expenses.Expense', 'created_at', {}),
+    'recurring_expenses': ('expenses.RecurringExpense', 'created_at', {}),
+    'memberships': ('accounts.FamilyMember', 'joined_at', {
+        'family_name': F('family__name'),
+        'user_email': F('user__email'),
+        'user_first_name': F('user__first_name'),
+        'user_last_name': F('user__last_name'),
+    }),
+}
+
+_MODEL_COLLECTIONS = {label: name for name, (label, _, _) in COLLECTIONS.items()}
+
+
+def collection_for(model):
+    return _MODEL_COLLECTIONS.get(model._meta.label)
+
+
+def _file_url(field):
+    return lambda name: field.storage.url(name) if name else None
+
+
+def _decimal_string(field):
+    # Same representation as DRF's DecimalField
+    return lambda value: None if value is None else f'{value:.{field.decimal_places}f}'
+
+
+def _columns(model):
+    """Concrete columns by attname, plus converters for files and decimals"""
+    columns, converters = [], []
+    for field in model._meta.concrete_fields:
+        columns.append(field.attname)
+        if isinstance(field, models.FileField):
+            converters.append((field.attname, _file_url(field)))
+        elif isinstance(field, models.DecimalField):
+            converters.append((field.attname, _decimal_string(field)))
+    return columns, converters
+
+
+def _rows(model, queryset, extra, limit=None):
+    columns, converters = _columns(model)
+    rows = list(queryset.values(*columns, **extra)[:limit])
+    for attname, convert in converters:
+        for row in rows:
+            row[attname] = convert(row[attname])
+    return rows
+
+
+def member_family_ids(user):
+    return list(FamilyMember.objects.filter(user=user, is_active=True).values_list('family_id', flat=True))
+
+
+def is_expired(since, now=None):
+    now = now or timezone.now()
+    return since < now - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+
+
+def page_token(cursor, collection, after):
+    """Signed token of the full sync page starting after row ``after`` of ``collection``"""
+    return signing.dumps([cursor.isoformat(), collection, after], salt='sync.page', compress=True)
+
+
+def read_page_token(token):
+    """(cursor, collection, after) of a ``page_token``; ValueError when it is not one"""
+    try:
+        cursor, collection, after = signing.loads(token, salt='sync.page')
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ValueError('Invalid page token')
+    cursor = parse_datetime(cursor)
+    if cursor is None or collection not in COLLECTIONS or not (after is None or isinstance(after, int)):
+        raise ValueError('Invalid page token')
+    return cursor, collection, after
+
+
+def _scope(model, user, family_ids, now):
+    scope = Q(family_id__in=family_ids)
+    if model is FamilyMember:
+        # Members always see their own memberships, including ones that
+        # were deactivated and no longer grant access to the family
+        scope |= Q(user=user)
+    return model._default_manager.filter(scope, updated_at__lte=now).order_by()
+
+
+def _full_page(result, user, family_ids, now, start, after):
+    """
+    Fill ``result`` with up to ``PAGE_SIZE`` rows, from the row after
+    ``after`` in collection ``start`` onwards. Returns the token of the next
+    page, or None when this one is the last.
+    """
+    names = list(COLLECTIONS)
+    remaining = PAGE_SIZE
+    for name in names[names.index(start):]:
+        if remaining == 0:
+            return page_token(now, name, None)
+        label, _, extra = COLLECTIONS[name]
+        model = apps.get_model(label)
+        queryset = _scope(model, user, family_ids, now).order_by('pk')
+        if after is not None:
+            queryset, after = queryset.filter(pk__gt=after), None
+        rows = _rows(model, queryset, extra, remaining + 1)
+        if len(rows) > remaining:
+            del rows[remaining:]
+            result[name]['created'] = rows
+            return page_token(now, name, rows[-1]['id'])
+        result[name]['created'] = rows
+        remaining -= len(rows)
+    return None
+
+
+def collect_changes(user, since=None, page=None):
+    """
+    Return everything in the user's families changed after ``since``.
+
+    Each collection comes back as ``created``/``updated`` rows and ``deleted``
+    ids, read through the ``(family, updated_at)`` indexes and the tombstone
+    table, so a refresh costs one query per collection plus one for
+    deletions. The returned ``cursor`` is passed back as ``since`` next time.
+
+    Without ``since``, or with one older than tombstone retention, every
+    row is returned and ``full`` is set: the client should replace its
+    local copy. A full sync is split into pages of ``PAGE_SIZE`` rows
+    ordered by collection and id; while ``next`` is set it is passed back
+    as ``page`` for the following page, which reads the same snapshot
+    (rows changed since are left to the next delta sync).
+    """
+    if page is not None:
+        now, start, after = read_page_token(page)
+        full = True
+    else:
+        now = timezone.now()
+        full = since is None or is_expired(since, now)
+        start, after = next(iter(COLLECTIONS)), None
+    family_ids = member_family_ids(user)
+    if not full:
+        since = since - timedelta(seconds=CURSOR_OVERLAP)
+
+    result = {'cursor': now, 'full': full}
+    for name in COLLECTIONS:
+        result[name] = {'created': [], 'updated': [], 'deleted': []}
+    if full:
+        result['next'] = _full_page(result, user, family_ids, now, start, after)
+        return result
+
+    for name, (label, created_field, extra) in COLLECTIONS.items():
+        model = apps.get_model(label)
+        queryset = _scope(model, user, family_ids, now).filter(updated_at__gt=since)
+        for row in _rows(model, queryset, extra):
+            result[name]['created' if row[created_field] > since else 'updated'].append(row)
+
+    tombstones = Tombstone.objects.filter(
+        Q(family_id__in=family_ids) | Q(collection='memberships', user=user),
+        deleted_at__gt=since,
+        deleted_at__lte=now
+    ).values_list('collection', 'object_id')
+    for collection, object_id in tombstones:
+        if collection in result:
+            result[collection]['deleted'].append(object_id)
+
+    return result
+
+
+def record_deletions(model, rows):
+    """
+    Write tombstones for deleted ``rows`` of ``model`` in one insert.
+
+    ``rows`` are instances or dicts with ``id``, ``family_id`` and, for
+    memberships, ``user_id``. Used by code that deletes without signals.
+    """
+    collection = collection_for(model)
+    if collection is None:
+        return 0
+    tombstones = []
+    for row in rows:
+        get = row.get if isinstance(row, dict) else lambda name, row=row: getattr(row, name, None)
+        tombstones.append(Tombstone(
+            collection=collection,
+            object_id=get('id'),
+            family_id=get('family_id'),
+            user_id=get('user_id') if collection == 'memberships' else None,
+        ))
+    Tombstone.objects.bulk_create(tombstones)
+    return len(tombstones)
+
+
+def prune_tombstones(days=None):
+    days = TOMBSTONE_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,67 @@
+"""Change events published to the event stream after each commit"""
+import logging
+from functools import partial
+
+from django.db import transaction
+
+from .broker import get_broker
+
+logger = logging.getLogger(__name__)
+
+
+def _publish(family_id, event_type, data):
+    try:
+        get_broker().publish(family_id, event_type, data)
+    except Exception:
+        # The write has committed and must not turn into an error response;
+        # clients that miss the event pick the change up from /api/sync/
+        logger.exception('Could not publish %s event for family %s', event_type, family_id)
+
+
+def publish(family_id, event_type, data):
+    """Publish once the current transaction commits (immediately in autocommit)"""
+    transaction.on_commit(partial(_publish, family_id, event_type, data))
+
+
+def expense_data(expense):
+    return {
+        'id': expense.pk,
+        'family_id': expense.family_id,
+        'category_id': expense.category_id,
+        'paid_by_id': expense.paid_by_id,
+        'title': expense.title,
+        'amount': expense.amount,
+        'date': expense.date,
+        'updated_at': expense.updated_at,
+    }
+
+
+def expense_saved(sender, instance, created, **kwargs):
+    event_type = 'expense.created' if created else 'expense.updated'
+    publish(instance.family_id, event_type, expense_data(instance))
+    previous = getattr(instance, '_loaded_values', None) or {}
+    moved_from = previous.get('family_id')
+    if moved_from and moved_from != instance.family_id:
+        publish(moved_from, 'expense.deleted', {'id': instance.pk, 'family_id': moved_from})
+
+
+def expenses_created(sender, instances, **kwargs):
+    for expense in instances:
+        publish(expense.family_id, 'expense.created', expense_data(expense))
+
+
+def expense_deleted(sender, instance, **kwargs):
+    publish(instance.family_id, 'expense.deleted', {'id': instance.pk, 'family_id': instance.family_id})
+
+
+def budget_alerts_raised(sender, alerts, **kwargs):
+    for alert in alerts:
+        publish(alert.family_id, 'budget.threshold_crossed', {
+            'id': alert.pk,
+            'budget_id': alert.budget_id,
+            'budget_name': alert.budget.name,
+            'expense_id': alert.expense_id,
+            'threshold': alert.threshold,
+            'spent_amount': alert.spent_amount,
+            'budget_amount': alert.budget_amount,
+        })
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from sync.changes import TOMBSTONE_RETENTION_DAYS, prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=TOMBSTONE_RETENTION_DAYS,
+            help='Keep tombstones from the last N days'
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstone(s)'))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import models
+from accounts.models import Family
+
+
+class Tombstone(models.Model):
+    """Record of a deleted row, so delta sync clients learn about deletions"""
+    collection = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    # No database constraints: tombstones are written while a family or user
+    # is being deleted and must outlive the row they point at
+    family = models.ForeignKey(
+        Family, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    # Owner of a deleted membership, who can no longer see the family
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+        blank=True, null=True, related_name='+'
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['family', 'deleted_at'], name='tombstone_family_idx'),
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.collection} #{self.object_id} deleted at {self.deleted_at}"
@@ -0,0 +1,32 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from budgets.alerts import alerts_raised
+from expenses.imports import bulk_created
+from family_budget.deletion import bulk_deleted
+from . import events
+from .changes import COLLECTIONS, collection_for, record_deletions
+
+
+def write_tombstone(sender, instance, **kwargs):
+    record_deletions(sender, [instance])
+
+
+def write_bulk_tombstones(sender, rows, family_ids=(), **kwargs):
+    # Members of a deleted family only need their membership tombstone
+    if collection_for(sender) != 'memberships':
+        rows = [row for row in rows if row['family_id'] not in family_ids]
+    record_deletions(sender, rows)
+
+
+def connect_signals():
+    for label, _, _ in COLLECTIONS.values():
+        model = apps.get_model(label)
+        post_delete.connect(write_tombstone, sender=model, dispatch_uid=f'sync-{label}')
+        bulk_deleted.connect(write_bulk_tombstones, sender=model, dispatch_uid=f'sync-bulk-{label}')
+
+    expense = apps.get_model('expenses.Expense')
+    post_save.connect(events.expense_saved, sender=expense, dispatch_uid='sync-events-expense-saved')
+    post_delete.connect(events.expense_deleted, sender=expense, dispatch_uid='sync-events-expense-deleted')
+    bulk_created.connect(events.expenses_created, sender=expense, dispatch_uid='sync-events-expenses-created')
+    alerts_raised.connect(events.budget_alerts_raised, dispatch_uid='sync-events-budget-alerts')
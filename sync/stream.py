@@ -0,0 +1,176 @@
+"""
+ASGI endpoint streaming family change events as server-sent events.
+
+Mounted in ``family_budget.asgi`` at ``/api/events/``. Clients authenticate
+with their API token (``Authorization: Token <key>`` or ``?token=<key>``,
+since ``EventSource`` cannot set headers) or the session cookie, and may
+narrow the stream to one family with ``?family_id=``. On reconnect the
+browser sends ``Last-Event-ID`` and missed events are replayed; when they are
+no longer available a ``resync`` event tells the client to catch up through
+``/api/sync/`` instead.
+"""
+import asyncio
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http import HttpRequest
+
+from .broker import ResyncRequired, SlowConsumer, get_broker
+from .changes import member_family_ids
+
+# Seconds between keep-alive comments; membership is re-checked as often
+HEARTBEAT = getattr(settings, 'SYNC_EVENT_HEARTBEAT', 15)
+# Reconnection delay suggested to EventSource, in milliseconds
+RETRY_MS = getattr(settings, 'SYNC_EVENT_RETRY_MS', 3000)
+
+
+def _authenticate(headers, query):
+    close_old_connections()
+    try:
+        token = query.get('token', [None])[0]
+        authorization = headers.get(b'authorization', b'').decode('latin-1')
+        if authorization.lower().startswith('token '):
+            token = authorization[6:].strip()
+        if token:
+            from rest_framework.authtoken.models import Token
+            token = Token.objects.select_related('user').filter(key=token).first()
+            return token.user if token and token.user.is_active else None
+
+        cookie = SimpleCookie()
+        cookie.load(headers.get(b'cookie', b'').decode('latin-1'))
+        session_key = cookie.get(settings.SESSION_COOKIE_NAME)
+        if session_key is None:
+            return None
+        request = HttpRequest()
+        engine = import_module(settings.SESSION_ENGINE)
+        request.session = engine.SessionStore(session_key.value)
+        user = get_user(request)
+        return user if user.is_authenticated else None
+    finally:
+        close_old_connections()
+
+
+def _family_ids(user, family_id):
+    close_old_connections()
+    try:
+        family_ids = set(member_family_ids(user))
+    finally:
+        close_old_connections()
+    if family_id is not None:
+        family_ids &= {family_id}
+    return family_ids
+
+
+def _cors_headers(headers):
+    origin = headers.get(b'origin')
+    if origin and origin.decode('latin-1') in getattr(settings, 'CORS_ALLOWED_ORIGINS', ()):
+        return [
+            (b'access-control-allow-origin', origin),
+            (b'access-control-allow-credentials', b'true'),
+            (b'vary', b'Origin'),
+        ]
+    return []
+
+
+async def _send_error(send, status, message, extra_headers=()):
+    body = ('{"error": "%s"}' % message).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            *extra_headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def event_stream(scope, receive, send):
+    headers = dict(scope['headers'])
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    cors = _cors_headers(headers)
+
+    if scope['method'] != 'GET':
+        await _send_error(send, 405, 'Method not allowed', cors)
+        return
+
+    user = await sync_to_async(_authenticate)(headers, query)
+    if user is None:
+        await _send_error(send, 401, 'Authentication credentials were not provided', cors)
+        return
+
+    family_id = query.get('family_id', [None])[0]
+    if family_id is not None and not family_id.isdigit():
+        await _send_error(send, 400, 'family_id must be an integer', cors)
+        return
+    family_id = int(family_id) if family_id else None
+    family_ids = await sync_to_async(_family_ids)(user, family_id)
+    if not family_ids:
+        await _send_error(send, 404, 'Family not found', cors)
+        return
+
+    last_event_id = headers.get(b'last-event-id', b'').decode('latin-1') or query.get('last_event_id', [None])[0]
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            *cors,
+        ],
+    })
+
+    async def write(data):
+        await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+    broker = get_broker()
+    try:
+        subscription = await broker.subscribe(family_ids, last_event_id)
+    except ResyncRequired:
+        await write(f'retry: {RETRY_MS}\nevent: resync\ndata: {{}}\n\n'.encode())
+        subscription = await broker.subscribe(family_ids)
+    else:
+        await write(f'retry: {RETRY_MS}\n\n'.encode())
+
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        while True:
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected}, timeout=HEARTBEAT, return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                next_event.cancel()
+                break
+            if next_event in done:
+                try:
+                    event = next_event.result()
+                except SlowConsumer:
+                    # Closing makes the client reconnect with its Last-Event-ID
+                    break
+                await write(event.encode())
+                continue
+
+            next_event.cancel()
+            if await sync_to_async(_family_ids)(user, family_id) != family_ids:
+                # Membership changed; the client reconnects with the new scope
+                break
+            await write(b': keep-alive\n\n')
+    finally:
+        disconnected.cancel()
+        subscription.close()
+    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
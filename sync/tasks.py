@@ -0,0 +1,8 @@
+from jobs.queue import task
+
+from .changes import prune_tombstones
+
+
+@task('sync.prune_tombstones')
+def prune_tombstones_task(job, days=None):
+    return {'deleted': prune_tombstones(days)}
@@ -0,0 +1,133 @@
+from datetime import date
+import os
+from decimal import Decimal
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Family, FamilyMember, User
+from budgets.models import Budget, Category
+from budgets.snapshots import close_budgets
+from expenses.models import Expense
+from .broker import LocalBroker
+
+
+class SyncChangesTests(TestCase):
+    """Full sync pages and delta sync of the user's families"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        FamilyMember.objects.create(family=cls.family, user=cls.user, role='admin')
+        cls.categories = [
+            Category.objects.create(name=name, family=cls.family, created_by=cls.user)
+            for name in ('Food', 'Rent', 'Fun')
+        ]
+        cls.budget = Budget.objects.create(
+            name='Food', family=cls.family, category=cls.categories[0], amount=Decimal('100'),
+            start_date=date(2024, 1, 1), end_date=date(2024, 1, 31), created_by=cls.user
+        )
+        cls.expense = Expense.objects.create(
+            title='Shop', amount=Decimal('10'), category=cls.categories[0], family=cls.family,
+            paid_by=cls.user, date=date(2024, 1, 5)
+        )
+        other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        Category.objects.create(name='Hidden', family=Family.objects.create(name='Other', created_by=other),
+                                created_by=other)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ids(self, data, collection, key='created'):
+        return [row['id'] for row in data[collection][key]]
+
+    def test_full_sync_is_paged_over_one_snapshot(self):
+        pages, seen = [], {}
+        with mock.patch('sync.changes.PAGE_SIZE', 2):
+            data = self.client.get('/api/sync/').data
+            cursor = data['cursor']
+            while True:
+                pages.append(data)
+                self.assertTrue(data['full'])
+                self.assertEqual(data['cursor'], cursor)
+                for collection in ('categories', 'budgets', 'expenses', 'memberships'):
+                    seen.setdefault(collection, []).extend(self.ids(data, collection))
+                if data['next'] is None:
+                    break
+                # Rows created while paging are left to the next delta sync
+                Category.objects.create(name=f'Late {len(pages)}', family=self.family, created_by=self.user)
+                data = self.client.get('/api/sync/', {'page': data['next']}).data
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(seen['categories'], [category.pk for category in self.categories])
+        self.assertEqual(seen['budgets'], [self.budget.pk])
+        self.assertEqual(seen['expenses'], [self.expense.pk])
+        self.assertEqual(len(seen['memberships']), 1)
+
+        response = self.client.get('/api/sync/', {'page': 'forged'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_delta_sync_returns_changes_and_deletions(self):
+        cursor = timezone.now()
+        self.expense.title = 'Groceries'
+        self.expense.save()
+        deleted = self.categories[2].pk
+        Category.objects.get(pk=deleted).delete()
+        # Snapshot writes bump updated_at, so clients see the stored spend
+        close_budgets(today=date(2024, 2, 1))
+        with mock.patch('sync.changes.CURSOR_OVERLAP', 0):
+            data = self.client.get('/api/sync/', {'since': cursor.isoformat()}).data
+        self.assertFalse(data['full'])
+        self.assertEqual(self.ids(data, 'expenses', 'updated'), [self.expense.pk])
+        self.assertEqual(data['categories']['deleted'], [deleted])
+        self.assertEqual(self.ids(data, 'budgets', 'updated'), [self.budget.pk])
+        self.assertEqual(data['budgets']['updated'][0]['spent_snapshot'], '10.00')
+
+
+class EventTests(TestCase):
+    """Publishing change events after commit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.family = Family.objects.create(name='Family', created_by=cls.user)
+        cls.category = Category.objects.create(name='Food', family=cls.family, created_by=cls.user)
+
+    def create_expense(self):
+        return Expense.objects.create(
+            title='Shop', amount=Decimal('10'), category=self.category, family=self.family,
+            paid_by=self.user, date=date(2024, 1, 5)
+        )
+
+    def test_events_are_published_once_committed(self):
+        broker = LocalBroker()
+        with mock.patch('sync.events.get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks() as callbacks:
+                expense = self.create_expense()
+            self.assertNotIn(self.family.pk, broker.history)
+            for callback in callbacks:
+                callback()
+        event = broker.history[self.family.pk][-1]
+        self.assertEqual(event.type, 'expense.created')
+        self.assertIn(f'"id":{expense.pk}', event.data)
+
+    def test_broker_errors_do_not_fail_the_write(self):
+        broker = mock.Mock()
+        broker.publish.side_effect = ConnectionError('broker unavailable')
+        with mock.patch('sync.events.get_broker', return_value=broker):
+            with self.assertLogs('sync.events', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    expense = self.create_expense()
+        self.assertTrue(Expense.objects.filter(pk=expense.pk).exists())
+
+    def test_local_broker_refuses_several_workers(self):
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '4'}):
+            with self.assertRaises(ImproperlyConfigured):
+                LocalBroker()
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '1'}):
+            LocalBroker()
@@ -0,0 +1,33 @@
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.utils.dateparse import parse_datetime
+
+from .changes import collect_changes
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_changes(request):
+    """Rows created, updated or deleted since the client's cursor"""
+    page = request.query_params.get('page')
+    if page:
+        try:
+            return Response(collect_changes(request.user, page=page))
+        except ValueError:
+            return Response(
+                {'error': 'page must be the next token returned by a previous sync'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    since = request.query_params.get('since')
+    if since:
+        try:
+            since = parse_datetime(since)
+        except ValueError:
+            since = None
+        if since is None or since.tzinfo is None:
+            return Response(
+                {'error': 'since must be the cursor returned by a previous sync'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    return Response(collect_changes(request.user, since))